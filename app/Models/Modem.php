@@ -67,16 +67,18 @@ class Modem
     {
         $db = Database::getInstance();
         
-        // Trouver le modem actif avec la plus haute priorité et le moins utilisé récemment
+        // Trouver le modem actif avec la plus haute priorité et le moins utilisé récemment,
+        // en repoussant ceux en erreur récente (last_error_at, remis à NULL au prochain envoi réussi)
         return $db->selectOne("
             SELECT * FROM modems 
             WHERE is_active = 1 
             ORDER BY 
+                (last_error_at IS NOT NULL AND last_error_at > DATE_SUB(NOW(), INTERVAL ? SECOND)) ASC,
                 priority DESC,
                 COALESCE(last_used, '1970-01-01') ASC,
                 sms_sent ASC
             LIMIT 1
-        ");
+        ", [MODEM_ERROR_COOLDOWN]);
     }
     
     public static function recordError($id, $errorMessage)
@@ -75,13 +75,23 @@ class Sms
         return self::update($id, $data);
     }
     
-    public static function markAsSent($id)
+    public static function markAsSent($id, $result = null)
     {
         $db = Database::getInstance();
-        return self::update($id, [
+        $data = [
             'status' => 'sent',
             'sent_at' => date('Y-m-d H:i:s')
-        ]);
+        ];
+        
+        // Durées par phase de l'envoi (ms), telles que retournées par send_sms_mmcli.py
+        if (!empty($result['timings'])) {
+            $data['send_timings'] = json_encode($result['timings']);
+        }
+        if (isset($result['send_duration'])) {
+            $data['send_duration_ms'] = (int) round($result['send_duration'] * 1000);
+        }
+        
+        return self::update($id, $data);
     }
     
     public static function markAsFailed($id, $errorCode = null, $errorMessage = null)
@@ -95,6 +105,21 @@ class Sms
         ]);
     }
     
+    /**
+     * Échec après transmission au démon d'envoi (délai dépassé, connexion coupée):
+     * le SMS a pu partir, il est exclu des réenvois automatiques
+     */
+    public static function markAsDeliveryUnknown($id, $errorMessage = null)
+    {
+        return self::update($id, [
+            'status' => 'failed',
+            'error_code' => 'delivery_unknown',
+            'error_message' => $errorMessage,
+            'retry_count' => SMS_RETRY_ATTEMPTS,
+            'failed_at' => date('Y-m-d H:i:s')
+        ]);
+    }
+    
     public static function incrementRetryCount($id)
     {
         $db = Database::getInstance();
@@ -0,0 +1,94 @@
+<?php
+/**
+ * Normalisation des numéros de téléphone au format E.164
+ * Mêmes règles que tools/phone_numbers.py (utilisé par le script d'envoi)
+ */
+class PhoneNumber
+{
+    // Longueur (min, max) du numéro national, sans indicatif ni 0 initial
+    const COUNTRY_CODES = [
+        '1' => [10, 10], '7' => [10, 10], '20' => [10, 10], '27' => [9, 9], '30' => [10, 10],
+        '31' => [9, 9], '32' => [8, 9], '33' => [9, 9], '34' => [9, 9], '39' => [6, 11],
+        '40' => [9, 9], '41' => [9, 9], '43' => [4, 13], '44' => [10, 10], '45' => [8, 8],
+        '46' => [7, 13], '47' => [8, 8], '48' => [9, 9], '49' => [6, 13], '90' => [10, 10],
+        '212' => [9, 9], '213' => [9, 9], '216' => [8, 8], '218' => [8, 9], '221' => [9, 9],
+        '222' => [8, 8], '223' => [8, 8], '225' => [10, 10], '226' => [8, 8], '227' => [8, 8],
+        '228' => [8, 8], '229' => [8, 10], '237' => [9, 9], '241' => [7, 8], '242' => [9, 9],
+        '243' => [9, 9], '261' => [9, 9], '351' => [9, 9], '352' => [4, 11], '961' => [7, 8],
+        '966' => [9, 9], '971' => [8, 9], '974' => [8, 8]
+    ];
+
+    private static $cache = [];
+
+    /**
+     * Retourne le numéro au format E.164 ('06 12 34 56 78' -> '+212612345678'), ou null s'il est invalide
+     */
+    public static function normalize($raw, $defaultCountry = null)
+    {
+        $raw = trim((string) $raw);
+        $defaultCountry = ltrim($defaultCountry ?: SMS_DEFAULT_COUNTRY_CODE, '+');
+        $key = $defaultCountry . '|' . $raw;
+
+        if (array_key_exists($key, self::$cache)) {
+            return self::$cache[$key];
+        }
+
+        $number = self::parse($raw, $defaultCountry);
+
+        // Cache borné: vidé d'un coup quand il est plein
+        if (count(self::$cache) >= 65536) {
+            self::$cache = [];
+        }
+        self::$cache[$key] = $number;
+
+        return $number;
+    }
+
+    public static function isValid($raw, $defaultCountry = null)
+    {
+        return self::normalize($raw, $defaultCountry) !== null;
+    }
+
+    public static function countryCode($number)
+    {
+        $digits = ltrim($number, '+');
+        foreach ([1, 2, 3] as $length) {
+            $code = substr($digits, 0, $length);
+            if (isset(self::COUNTRY_CODES[$code])) {
+                return $code;
+            }
+        }
+        return null;
+    }
+
+    private static function parse($raw, $defaultCountry)
+    {
+        $number = preg_replace('/[\s\-\.\(\)\/]/', '', $raw);
+        if ($number === '' || !preg_match('/^\+?\d+$/', $number)) {
+            return null;
+        }
+
+        if (strpos($number, '00') === 0) {
+            $number = '+' . substr($number, 2);
+        } elseif ($number[0] === '0') {
+            $number = '+' . $defaultCountry . substr($number, 1);
+        } elseif ($number[0] !== '+') {
+            $number = '+' . $number;
+        }
+
+        if (!preg_match('/^\+[1-9]\d{6,14}$/', $number)) {
+            return null;
+        }
+
+        $code = self::countryCode($number);
+        if ($code !== null) {
+            [$min, $max] = self::COUNTRY_CODES[$code];
+            $length = strlen($number) - 1 - strlen($code);
+            if ($length < $min || $length > $max) {
+                return null;
+            }
+        }
+
+        return $number;
+    }
+}
\ No newline at end of file
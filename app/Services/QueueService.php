@@ -6,10 +6,12 @@ class QueueService
 {
     private $pythonScript;
     private $maxConcurrent = 5;
+    private $daemon;
     
     public function __construct()
     {
         $this->pythonScript = SMS_PYTHON_SCRIPT;
+        $this->daemon = new SmsDaemonClient();
     }
     
     public function processQueue()
@@ -55,7 +57,7 @@ class QueueService
             $result = $this->sendSmsViaPython($sms, $modem);
             
             if ($result['success']) {
-                Sms::markAsSent($sms['id']);
+                Sms::markAsSent($sms['id'], $result);
                 Modem::updateLastUsed($modem['id']);
                 
                 Logger::info("SMS sent successfully", [
@@ -63,7 +65,15 @@ class QueueService
                     'recipient' => $sms['recipient'],
                     'modem_id' => $modem['id']
                 ]);
+            } elseif (!empty($result['delivery_unknown'])) {
+                // Requête transmise au démon sans réponse: pas de réenvoi, risque de doublon
+                $this->handleDeliveryUnknown($sms, $result['error']);
             } else {
+                // Échec sans lien avec le modem (numéro, message): ne pas le compter
+                // dans les erreurs du modem (trigger update_modem_stats)
+                if (isset($result['modem_error']) && !$result['modem_error']) {
+                    Sms::update($sms['id'], ['modem_id' => null]);
+                }
                 throw new Exception($result['error'] ?? 'Erreur inconnue');
             }
             
@@ -74,8 +84,17 @@ class QueueService
     
     private function sendSmsViaPython($sms, $modem)
     {
+        // Utiliser le démon d'envoi résident s'il tourne
+        if ($this->daemon->isAvailable()) {
+            try {
+                return $this->daemon->send($sms['recipient'], $sms['message'], $modem['device_path']);
+            } catch (SmsDaemonUnavailableException $e) {
+                Logger::warning('SMS daemon unavailable, falling back to process: ' . $e->getMessage());
+            }
+        }
+        
         $command = sprintf(
-            'python3 %s --device %s --recipient %s --message %s',
+            'python3 %s --device %s --recipient %s --message %s --json-output',
             escapeshellarg($this->pythonScript),
             escapeshellarg($modem['device_path']),
             escapeshellarg($sms['recipient']),
@@ -107,11 +126,36 @@ class QueueService
         
         $returnCode = proc_close($process);
         
-        if ($returnCode === 0) {
-            return ['success' => true, 'output' => $output];
-        } else {
-            return ['success' => false, 'error' => $error ?: $output];
+        // Parser la sortie JSON (timings, send_duration pour markAsSent)
+        $result = json_decode($output, true);
+        
+        if (!is_array($result)) {
+            // Pas de JSON valide, utiliser la sortie brute
+            if ($returnCode === 0) {
+                return ['success' => true, 'output' => $output];
+            } else {
+                return ['success' => false, 'error' => $error ?: $output];
+            }
         }
+        
+        return $result;
+    }
+    
+    private function handleDeliveryUnknown($sms, $errorMessage)
+    {
+        Sms::markAsDeliveryUnknown($sms['id'], $errorMessage);
+        
+        NotificationService::createSmsFailedNotification(
+            $sms['id'],
+            $sms['recipient'],
+            $errorMessage
+        );
+        
+        Logger::error("SMS delivery unknown, not retried", [
+            'sms_id' => $sms['id'],
+            'recipient' => $sms['recipient'],
+            'error' => $errorMessage
+        ]);
     }
     
     private function handleSmsError($sms, $errorMessage)
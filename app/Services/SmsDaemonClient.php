@@ -0,0 +1,135 @@
+<?php
+/**
+ * Client du démon d'envoi SMS (send_sms_mmcli.py --serve)
+ * Évite de lancer un processus Python pour chaque SMS
+ */
+class SmsDaemonClient
+{
+    private $socketPath;
+    private $timeout;
+    private $socket = null;
+    
+    public function __construct($socketPath = null, $timeout = null)
+    {
+        $this->socketPath = $socketPath ?: SMS_SEND_SOCKET;
+        $this->timeout = $timeout ?: SMS_SEND_TIMEOUT;
+    }
+    
+    public function __destruct()
+    {
+        $this->close();
+    }
+    
+    /**
+     * Indique si le socket du démon existe
+     */
+    public function isAvailable()
+    {
+        return !empty($this->socketPath) && file_exists($this->socketPath);
+    }
+    
+    /**
+     * Envoie un SMS via le démon et retourne le même tableau que --json-output
+     * 
+     * Lève SmsDaemonUnavailableException si la requête n'a pas pu être
+     * transmise. Une fois transmise, le démon a pu envoyer le SMS: un délai
+     * dépassé ou une connexion coupée donnent un échec marqué delivery_unknown,
+     * qui ne doit pas être renvoyé.
+     */
+    public function send($recipient, $message, $devicePath = null)
+    {
+        $request = [
+            'action' => 'send',
+            'recipient' => $recipient,
+            'message' => $message
+        ];
+        
+        if ($devicePath) {
+            $request['device'] = $devicePath;
+        }
+        
+        try {
+            return $this->request($request);
+        } catch (SmsDaemonUnavailableException $e) {
+            throw $e;
+        } catch (Exception $e) {
+            return [
+                'success' => false,
+                'error' => $e->getMessage() . ' (SMS peut-être envoyé)',
+                'delivery_unknown' => true
+            ];
+        }
+    }
+    
+    public function listModems()
+    {
+        return $this->request(['action' => 'list_modems']);
+    }
+    
+    public function ping()
+    {
+        try {
+            $response = $this->request(['action' => 'ping']);
+            return !empty($response['success']);
+        } catch (Exception $e) {
+            return false;
+        }
+    }
+    
+    /**
+     * Envoie une requête JSON (une ligne) et lit la réponse (une ligne)
+     */
+    public function request(array $payload)
+    {
+        $socket = $this->connect();
+        
+        $line = json_encode($payload) . "\n";
+        if (fwrite($socket, $line) === false) {
+            $this->close();
+            throw new SmsDaemonUnavailableException('Impossible d\'écrire sur le socket du démon SMS');
+        }
+        
+        $response = fgets($socket);
+        $meta = stream_get_meta_data($socket);
+        
+        if ($response === false) {
+            $this->close();
+            if ($meta['timed_out']) {
+                throw new Exception('Timeout en attendant la réponse du démon SMS');
+            }
+            throw new Exception('Connexion au démon SMS interrompue');
+        }
+        
+        $result = json_decode($response, true);
+        if (!is_array($result)) {
+            throw new Exception('Réponse invalide du démon SMS');
+        }
+        
+        return $result;
+    }
+    
+    public function close()
+    {
+        if ($this->socket) {
+            fclose($this->socket);
+            $this->socket = null;
+        }
+    }
+    
+    private function connect()
+    {
+        if ($this->socket) {
+            return $this->socket;
+        }
+        
+        $socket = @stream_socket_client('unix://' . $this->socketPath, $errno, $errstr, 5);
+        if (!$socket) {
+            throw new SmsDaemonUnavailableException("Démon SMS injoignable ({$this->socketPath}): {$errstr}");
+        }
+        
+        stream_set_timeout($socket, $this->timeout);
+        $this->socket = $socket;
+        
+        return $socket;
+    }
+}
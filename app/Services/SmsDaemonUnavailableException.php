@@ -0,0 +1,8 @@
+<?php
+/**
+ * Démon SMS injoignable: la requête ne lui a pas été transmise,
+ * le SMS peut donc être envoyé par un autre moyen sans risque de doublon
+ */
+class SmsDaemonUnavailableException extends Exception
+{
+}
\ No newline at end of file
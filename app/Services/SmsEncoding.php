@@ -0,0 +1,110 @@
+<?php
+/**
+ * Encodage des SMS: GSM 03.38 (7 bits) ou UCS-2, et nombre de segments
+ * Mêmes tables et mêmes règles que tools/sms_encoding.py
+ */
+class SmsEncoding
+{
+    // Alphabet GSM 03.38 de base (sans ESC) et table d'extension (2 septets par caractère)
+    const GSM_BASIC = "@£\$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+        . "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà";
+    const GSM_EXTENSION = "\f^{}\\[~]|€";
+
+    const GSM7_SINGLE = 160;
+    const GSM7_SEGMENT = 153;
+    const UCS2_SINGLE = 70;
+    const UCS2_SEGMENT = 67;
+
+    private static $gsmPattern = null;
+    private static $extensionPattern = null;
+
+    /**
+     * Retourne encoding, is_unicode, units (septets ou unités UTF-16) et parts_count
+     */
+    public static function analyze($text)
+    {
+        $text = (string) $text;
+        $length = mb_strlen($text, 'UTF-8');
+
+        if (self::isGsm7($text)) {
+            $encoding = 'GSM-7';
+            $units = $length + preg_match_all(self::extensionPattern(), $text);
+            $single = self::GSM7_SINGLE;
+            $capacity = self::GSM7_SEGMENT;
+        } else {
+            $encoding = 'UCS-2';
+            $units = intdiv(strlen(mb_convert_encoding($text, 'UTF-16LE', 'UTF-8')), 2);
+            $single = self::UCS2_SINGLE;
+            $capacity = self::UCS2_SEGMENT;
+        }
+
+        if ($units <= $single) {
+            $parts = 1;
+        } elseif ($units !== $length) {
+            // Caractères de 2 unités: jamais coupés entre deux segments
+            $parts = self::countSplitParts($text, $encoding, $capacity);
+        } else {
+            $parts = (int) ceil($units / $capacity);
+        }
+
+        return [
+            'encoding' => $encoding,
+            'is_unicode' => $encoding === 'UCS-2',
+            'units' => $units,
+            'parts_count' => $parts
+        ];
+    }
+
+    public static function isGsm7($text)
+    {
+        return (bool) preg_match(self::gsmPattern(), $text);
+    }
+
+    public static function isUnicode($text)
+    {
+        return !self::isGsm7($text);
+    }
+
+    public static function countParts($text)
+    {
+        return self::analyze($text)['parts_count'];
+    }
+
+    private static function countSplitParts($text, $encoding, $capacity)
+    {
+        $parts = 1;
+        $used = 0;
+
+        foreach (mb_str_split($text, 1, 'UTF-8') as $char) {
+            if ($encoding === 'GSM-7') {
+                $cost = mb_strpos(self::GSM_EXTENSION, $char, 0, 'UTF-8') !== false ? 2 : 1;
+            } else {
+                $cost = strlen($char) === 4 ? 2 : 1; // hors BMP: paire de substitution
+            }
+
+            if ($used + $cost > $capacity) {
+                $parts++;
+                $used = 0;
+            }
+            $used += $cost;
+        }
+
+        return $parts;
+    }
+
+    private static function gsmPattern()
+    {
+        if (self::$gsmPattern === null) {
+            self::$gsmPattern = '/^[' . preg_quote(self::GSM_BASIC . self::GSM_EXTENSION, '/') . ']*$/u';
+        }
+        return self::$gsmPattern;
+    }
+
+    private static function extensionPattern()
+    {
+        if (self::$extensionPattern === null) {
+            self::$extensionPattern = '/[' . preg_quote(self::GSM_EXTENSION, '/') . ']/u';
+        }
+        return self::$extensionPattern;
+    }
+}
\ No newline at end of file
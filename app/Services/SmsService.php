@@ -12,9 +12,10 @@ class SmsService
             throw new Exception('Numéro de téléphone invalide');
         }
         
-        // Vérifier la longueur du message
-        if (strlen($message) > SMS_MAX_LENGTH) {
-            throw new Exception('Message trop long (max ' . SMS_MAX_LENGTH . ' caractères)');
+        // Vérifier la longueur du message: segments réels (153 septets GSM / 67 caractères UCS-2)
+        $encoding = SmsEncoding::analyze($message);
+        if ($encoding['parts_count'] > SMS_MAX_SEGMENTS) {
+            throw new Exception('Message trop long (max ' . SMS_MAX_SEGMENTS . ' SMS)');
         }
         
         // Vérifier les limites utilisateur
@@ -29,7 +30,8 @@ class SmsService
             'status' => $scheduledAt ? SMS_STATUS_SCHEDULED : SMS_STATUS_PENDING,
             'priority' => $priority,
             'scheduled_at' => $scheduledAt,
-            'is_unicode' => $this->containsUnicode($message)
+            'is_unicode' => $encoding['is_unicode'] ? 1 : 0,
+            'parts_count' => $encoding['parts_count']
         ];
         
         $smsId = Sms::create($data);
@@ -97,23 +99,15 @@ class SmsService
     
     private function cleanPhoneNumber($phone)
     {
-        // Supprimer tous les caractères non numériques sauf +
-        $phone = preg_replace('/[^\d+]/', '', $phone);
-        
-        // Ajouter l'indicatif pays si manquant
-        if (substr($phone, 0, 1) === '0') {
-            $phone = '+33' . substr($phone, 1);
-        } elseif (substr($phone, 0, 1) !== '+') {
-            $phone = '+' . $phone;
-        }
-        
-        return $phone;
+        // Format E.164, avec l'indicatif par défaut pour les numéros nationaux;
+        // un numéro invalide est rendu tel quel et rejeté par isValidPhoneNumber()
+        return PhoneNumber::normalize($phone) ?? trim((string) $phone);
     }
     
     private function isValidPhoneNumber($phone)
     {
-        // Vérification basique d'un numéro international
-        return preg_match('/^\+[1-9]\d{6,14}$/', $phone);
+        // Mêmes règles que le script d'envoi (tools/phone_numbers.py)
+        return PhoneNumber::isValid($phone);
     }
     
     private function checkUserLimits($userId)
@@ -131,11 +125,6 @@ class SmsService
         return $recentCount['count'] < SMS_MAX_PER_MINUTE;
     }
     
-    private function containsUnicode($text)
-    {
-        return mb_strlen($text, 'UTF-8') !== strlen($text);
-    }
-    
     private function parseCsvFile($filePath)
     {
         $recipients = [];
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: analyse de la sortie mmcli
+
+Compare, sur les sorties enregistrées dans fixtures/mmcli/, l'ancienne
+analyse du texte lisible (tests 'in' et re.search ligne par ligne, copiée
+ci-dessous telle qu'elle était dans MmcliBackend) et tools/mmcli_parser.py
+sur les sorties -J et -K. Affiche le temps par appel et les champs
+retrouvés par chaque méthode.
+
+    python3 benchmarks/bench_mmcli_parser.py [--iterations 20000] [--json]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures', 'mmcli')
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'tools'))
+
+import mmcli_parser
+
+MM_SMS_PREFIX = '/org/freedesktop/ModemManager1/SMS/'
+
+# --- Ancienne analyse du texte lisible de mmcli ---
+
+def legacy_modem_info(stdout, modem_id):
+    info = {'id': modem_id}
+    
+    for line in stdout.split('\n'):
+        line = line.strip()
+        
+        if 'Status |' in line and 'state:' in line:
+            if 'registered' in line or 'connected' in line:
+                info['status'] = 'ready'
+            else:
+                info['status'] = 'not_ready'
+        
+        elif '3GPP |' in line and 'imei:' in line:
+            match = re.search(r'imei:\s*(\w+)', line)
+            if match:
+                info['imei'] = match.group(1)
+        
+        elif '3GPP |' in line and 'operator name:' in line:
+            match = re.search(r'operator name:\s*(.+)', line)
+            if match:
+                info['operator'] = match.group(1).strip()
+        
+        elif 'Signal |' in line and 'quality:' in line:
+            match = re.search(r'quality:\s*(\d+)%', line)
+            if match:
+                info['signal_quality'] = int(match.group(1))
+        
+        elif 'Primary port:' in line:
+            match = re.search(r'Primary port:\s*(.+)', line)
+            if match:
+                info['device_path'] = match.group(1).strip()
+    
+    return info
+
+def legacy_sms_list(stdout):
+    sms_ids = []
+    for line in stdout.split('\n'):
+        if MM_SMS_PREFIX in line:
+            match = re.search(r'/SMS/(\d+)', line)
+            if match:
+                sms_ids.append(match.group(1))
+    return sms_ids
+
+def legacy_sms(stdout, sms_id):
+    sms_info = {'id': sms_id}
+    
+    for line in stdout.split('\n'):
+        line = line.strip()
+        
+        if 'Number:' in line:
+            match = re.search(r'Number:\s*(.+)', line)
+            if match:
+                sms_info['sender'] = match.group(1).strip()
+        
+        elif 'Text:' in line:
+            match = re.search(r'Text:\s*(.+)', line)
+            if match:
+                sms_info['message'] = match.group(1).strip()
+        
+        elif 'Timestamp:' in line:
+            match = re.search(r'Timestamp:\s*(.+)', line)
+            if match:
+                sms_info['timestamp'] = match.group(1).strip()
+        
+        match = re.search(r"pdu type:\s*'?([\w-]+)", line, re.IGNORECASE)
+        if match:
+            sms_info['pdu_type'] = match.group(1).lower()
+        
+        match = re.search(r"(?:^|\|)\s*state:\s*'?([\w-]+)", line, re.IGNORECASE)
+        if match:
+            sms_info['state'] = match.group(1).lower()
+    
+    return sms_info
+
+def legacy_messaging_status(stdout):
+    capabilities = {'supported_storages': [], 'default_storage': None}
+    
+    for line in stdout.split('\n'):
+        match = re.search(r"supported storages:\s*'?([^']*)", line, re.IGNORECASE)
+        if match:
+            capabilities['supported_storages'] = [
+                storage.strip() for storage in match.group(1).split(',')
+                if storage.strip() and storage.strip() != 'none'
+            ]
+        
+        match = re.search(r"default storage:\s*'?([\w-]+)", line, re.IGNORECASE)
+        if match:
+            capabilities['default_storage'] = match.group(1).lower()
+    
+    capabilities['messaging_ready'] = bool(capabilities['supported_storages'])
+    return capabilities
+
+# --- Cas mesurés: (nom, fixture, fonction) par méthode ---
+
+def load(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def cases():
+    return {
+        'modem': [
+            ('texte', 'modem.txt', lambda out: legacy_modem_info(out, '0')),
+            ('json', 'modem.json', lambda out: mmcli_parser.modem_record(mmcli_parser.parse_json(out), '0')),
+            ('keyvalue', 'modem.kv', lambda out: mmcli_parser.modem_record(mmcli_parser.parse_keyvalue(out), '0'))
+        ],
+        'sms': [
+            ('texte', 'sms.txt', lambda out: legacy_sms(out, '3')),
+            ('json', 'sms.json', lambda out: mmcli_parser.sms_record(mmcli_parser.parse_json(out), '3')),
+            ('keyvalue', 'sms.kv', lambda out: mmcli_parser.sms_record(mmcli_parser.parse_keyvalue(out), '3'))
+        ],
+        'sms_list': [
+            ('texte', 'sms_list.txt', legacy_sms_list),
+            ('json', 'sms_list.json', lambda out: mmcli_parser.sms_ids(mmcli_parser.parse_json(out)))
+        ],
+        'messaging_status': [
+            ('texte', 'messaging_status.txt', legacy_messaging_status),
+            ('json', 'messaging_status.json',
+             lambda out: mmcli_parser.messaging_capabilities(mmcli_parser.parse_json(out)))
+        ]
+    }
+
+def run(iterations):
+    report = {'iterations': iterations, 'results': {}}
+    
+    for operation, methods in cases().items():
+        results = report['results'][operation] = {}
+        for method, fixture, parse in methods:
+            output = load(fixture)
+            record = parse(output)
+            seconds = min(timeit.repeat(lambda: parse(output), number=iterations, repeat=3))
+            results[method] = {
+                'us_per_call': round(seconds / iterations * 1e6, 2),
+                'fields': len(record),
+                'record': record
+            }
+    
+    return report
+
+def print_report(report):
+    print(f"{report['iterations']} appels par mesure (meilleur de 3)\n")
+    for operation, results in report['results'].items():
+        print(operation)
+        for method, result in results.items():
+            print(f"  {method:<9} {result['us_per_call']:>8.2f} µs/appel  {result['fields']:>3} champs")
+        
+        reference = results.get('json', {}).get('record')
+        legacy = results.get('texte', {}).get('record')
+        if isinstance(reference, dict) and isinstance(legacy, dict):
+            for key, value in reference.items():
+                if legacy.get(key) != value:
+                    print(f"    texte: {key} = {legacy.get(key)!r}, attendu {value!r}")
+        print()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark analyse texte vs sortie machine de mmcli')
+    parser.add_argument('--iterations', type=int, default=20000, help='Appels par mesure (défaut: 20000)')
+    parser.add_argument('--json', action='store_true', help='Sortie JSON')
+    args = parser.parse_args()
+    
+    report = run(args.iterations)
+    
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
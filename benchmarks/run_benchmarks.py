@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de bout en bout de l'envoi et de la réception sur modems simulés
+
+Scénarios (chacun dans un processus séparé, pour un pic mémoire propre):
+- send: SMSSender.send() appelé en boucle
+- batch: run_batch() séquentiel (--batch)
+- pipeline: run_batch() avec une voie par modem (--batch --parallel)
+- receive: SMSReceiver.run_receive_cycle() jusqu'à vider les modems
+
+Les modems sont ceux du simulateur (tools/mm_simulator), en processus
+(--backend simulator), via le faux mmcli (--backend mmcli) ou via le faux
+service D-Bus déjà lancé (--backend dbus). La réception écrit dans SQLite
+(--db sqlite, remplaçant de mysql.connector) ou dans une vraie base MySQL
+(--db mysql, configuration de config/.env ou options --db-*).
+
+Résultat JSON: débit (SMS/s), latences p50/p95/p99 par phase (appels au
+modem, écriture en base, total par SMS) et pic de mémoire (RSS).
+
+    python3 benchmarks/run_benchmarks.py --messages 500 --modems 4 --output result.json
+    python3 benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python3 benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import resource
+import shutil
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TOOLS_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'tools')
+sys.path.insert(0, TOOLS_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+SCENARIOS = ('send', 'batch', 'pipeline', 'receive')
+
+# En dessous, un écart de p95 avec la référence n'est pas compté comme régression
+MIN_PHASE_SAMPLES = 20
+MIN_DELTA_MS = 1.0
+
+# Latences courtes: le benchmark mesure le coût des scripts, pas celui d'un vrai réseau
+SIMULATOR_CONFIG = {
+    'storage_capacity': 1000000,
+    'incoming_rate': 0,
+    'seed': 1,
+    'timeout_seconds': 5,
+    'latency': {
+        'list': 0.001,
+        'info': 0.001,
+        'get': 0.001,
+        'create': 0.005,
+        'send': {'distribution': 'lognormal', 'median': 0.02, 'sigma': 0.3},
+        'delete': 0.002
+    }
+}
+
+MESSAGES = [
+    'Votre code de confirmation est {n}.',
+    'Rappel: rendez-vous demain à 10h. Répondez STOP pour ne plus recevoir de messages.',
+    'مرحبا، طلبك رقم {n} جاهز',
+    'Promo -20% ce week-end sur tout le magasin, code {n}. ' * 3
+]
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile par interpolation linéaire (values triées)"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+class PhaseRecorder:
+    """Durées de chaque phase (appel au modem, écriture en base, total par SMS)"""
+    
+    def __init__(self):
+        self._durations = {}
+        self._lock = threading.Lock()
+    
+    def record(self, phase: str, duration: float):
+        with self._lock:
+            self._durations.setdefault(phase, []).append(duration)
+    
+    @contextmanager
+    def time(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+    
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        phases = {}
+        with self._lock:
+            for phase, durations in self._durations.items():
+                values = sorted(durations)
+                phases[phase] = {
+                    'count': len(values),
+                    'mean_ms': round(sum(values) / len(values) * 1000, 3),
+                    'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+                    'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+                    'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+                    'max_ms': round(values[-1] * 1000, 3)
+                }
+        return phases
+
+def instrument(backend, recorder: PhaseRecorder):
+    """Chronomètre chaque appel au backend sous le nom de la méthode"""
+    for method in ('list_modems', 'get_modem_info', 'get_messaging_capabilities', 'create_sms',
+                   'send_sms', 'delete_sms', 'list_sms', 'get_sms'):
+        original = getattr(backend, method)
+        
+        def timed(*args, _original=original, _phase=method, **kwargs):
+            with recorder.time(_phase):
+                return _original(*args, **kwargs)
+        
+        setattr(backend, method, timed)
+    return backend
+
+# --- Mise en place (processus enfant) ---
+
+def make_backend(kind: str, simulator):
+    from mm_backend import MmcliBackend, DBusBackend
+    from mm_simulator.backend import SimulatorBackend
+    
+    if kind == 'mmcli':
+        return MmcliBackend(os.path.join(TOOLS_DIR, 'mm_simulator', 'bin', 'mmcli'))
+    if kind == 'dbus':
+        return DBusBackend()
+    return SimulatorBackend(simulator)
+
+def make_sender(args, simulator, recorder):
+    from send_sms_mmcli import SMSSender
+    
+    sender = SMSSender(backend=instrument(make_backend(args.backend, simulator), recorder))
+    send = sender.send
+    
+    def timed_send(*send_args, **kwargs):
+        with recorder.time('total'):
+            return send(*send_args, **kwargs)
+    
+    sender.send = timed_send
+    return sender
+
+def make_jobs(count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(7)
+    return [{
+        'id': index,
+        'recipient': '+2126' + ''.join(str(rng.randint(0, 9)) for _ in range(8)),
+        'message': rng.choice(MESSAGES).format(n=rng.randint(1000, 9999))
+    } for index in range(count)]
+
+class CountingSink:
+    """Sortie de run_batch: compte les lignes sans les garder"""
+    
+    def __init__(self):
+        self.lines = 0
+    
+    def write(self, text: str):
+        self.lines += text.count('\n')
+    
+    def flush(self):
+        pass
+
+# --- Scénarios ---
+
+def scenario_send(args, simulator, recorder) -> Dict[str, Any]:
+    from send_sms_mmcli import SMSError
+    
+    sender = make_sender(args, simulator, recorder)
+    sent = failed = 0
+    
+    start = time.perf_counter()
+    for job in make_jobs(args.messages):
+        try:
+            sender.send(job['recipient'], job['message'])
+            sent += 1
+        except SMSError:
+            failed += 1
+    elapsed = time.perf_counter() - start
+    
+    sender.close()
+    return {'messages': sent + failed, 'sent': sent, 'failed': failed, 'seconds': elapsed}
+
+def _run_batch(args, simulator, recorder, parallel: bool) -> Dict[str, Any]:
+    from send_sms_mmcli import run_batch
+    
+    sender = make_sender(args, simulator, recorder)
+    source = io.StringIO(''.join(json.dumps(job) + '\n' for job in make_jobs(args.messages)))
+    
+    start = time.perf_counter()
+    stats = run_batch(sender, source, CountingSink(), parallel=parallel)
+    elapsed = time.perf_counter() - start
+    
+    sender.close()
+    result = {'messages': stats['total'], 'sent': stats['sent'], 'failed': stats['failed'], 'seconds': elapsed}
+    if 'lanes' in stats:
+        result['lanes'] = stats['lanes']
+    return result
+
+def scenario_batch(args, simulator, recorder) -> Dict[str, Any]:
+    return _run_batch(args, simulator, recorder, parallel=False)
+
+def scenario_pipeline(args, simulator, recorder) -> Dict[str, Any]:
+    return _run_batch(args, simulator, recorder, parallel=True)
+
+def scenario_receive(args, simulator, recorder) -> Dict[str, Any]:
+    db_config = receive_db_config(args, simulator)
+    
+    from receive_sms_mmcli import SMSReceiver
+    
+    # SMS déjà présents sur les modems au démarrage du cycle
+    modem_ids = simulator.modem_ids()
+    for job in make_jobs(args.messages):
+        simulator.deliver(modem_ids[job['id'] % len(modem_ids)], job['recipient'], job['message'])
+    
+    # Journal local neuf dans le répertoire de travail du benchmark
+    spool_dir = os.path.join(args.workdir, 'receive-spool')
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    receiver = SMSReceiver(db_config, instrument(make_backend(args.backend, simulator), recorder),
+                           spool_dir=spool_dir)
+    store = receiver.db.store_received_sms
+    
+    def timed_store(*store_args, **kwargs):
+        with recorder.time('store'):
+            return store(*store_args, **kwargs)
+    
+    receiver.db.store_received_sms = timed_store
+    
+    processed = cycles = 0
+    start = time.perf_counter()
+    while cycles < args.max_cycles:
+        with recorder.time('cycle'):
+            result = receiver.run_receive_cycle()
+        cycles += 1
+        processed += result.get('processed', 0)
+        if not result.get('success') or not any(simulator.list_sms(modem_id) for modem_id in modem_ids):
+            break
+    elapsed = time.perf_counter() - start
+    
+    receiver.db.close()
+    return {'messages': args.messages, 'stored': processed, 'cycles': cycles, 'seconds': elapsed}
+
+def receive_db_config(args, simulator) -> Dict[str, Any]:
+    """Base SQLite neuve (modems déclarés) ou configuration MySQL"""
+    if args.db == 'mysql':
+        from receive_sms_mmcli import load_config
+        config = load_config()
+        for key in ('host', 'port', 'user', 'password', 'database'):
+            if getattr(args, f'db_{key}') is not None:
+                config[key] = getattr(args, f'db_{key}')
+        return config
+    
+    import sqlite_standin
+    sqlite_standin.install()
+    
+    database = os.path.join(args.workdir, 'receive.sqlite')
+    if os.path.exists(database):
+        os.remove(database)
+    sqlite_standin.create_schema(database, [simulator.modem(modem_id)['primary_port']
+                                            for modem_id in simulator.modem_ids()])
+    return {'host': None, 'port': None, 'user': None, 'password': None, 'database': database}
+
+def run_scenario(args) -> Dict[str, Any]:
+    """Exécute un scénario dans le processus courant (processus enfant)"""
+    from mm_simulator.world import Simulator, load_config
+    
+    logging.getLogger().setLevel(getattr(logging, args.log_level))
+    
+    simulator = Simulator(load_config(os.environ['SMS_SIM_CONFIG']), os.environ['SMS_SIM_STATE'])
+    simulator.reset()
+    
+    recorder = PhaseRecorder()
+    result = globals()[f'scenario_{args.scenario}'](args, simulator, recorder)
+    
+    result['throughput'] = round(result['messages'] / result['seconds'], 2) if result['seconds'] else 0.0
+    result['seconds'] = round(result['seconds'], 3)
+    result['phases'] = recorder.summary()
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if children_rss:
+        result['peak_children_rss_mb'] = round(children_rss / 1024, 1)
+    result['simulator'] = simulator.snapshot()['stats']
+    return result
+
+# --- Processus parent: lancement, rapport, comparaison ---
+
+def simulator_config(args) -> Dict[str, Any]:
+    config = json.loads(json.dumps(SIMULATOR_CONFIG))
+    if args.sim_config:
+        with open(args.sim_config, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        config['latency'].update(overrides.pop('latency', {}))
+        config.update(overrides)
+    config['modems'] = args.modems
+    config['failure_rate'] = args.failure_rate if args.failure_rate is not None else config.get('failure_rate', 0.0)
+    return config
+
+def launch(args, scenario: str, env: Dict[str, str]) -> Dict[str, Any]:
+    command = [sys.executable, os.path.abspath(__file__), '--scenario', scenario,
+               '--messages', str(args.messages), '--modems', str(args.modems),
+               '--backend', args.backend, '--db', args.db, '--workdir', args.workdir,
+               '--max-cycles', str(args.max_cycles), '--log-level', args.log_level]
+    for key in ('host', 'port', 'user', 'password', 'database'):
+        value = getattr(args, f'db_{key}')
+        if value is not None:
+            command += [f'--db-{key}', str(value)]
+    
+    process = subprocess.run(command, env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        return {'error': process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'échec'}
+    return json.loads(process.stdout)
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """Écarts avec la référence; régression si le débit baisse ou un p95 monte de plus de tolerance"""
+    comparison = {'tolerance': tolerance, 'regressions': [], 'scenarios': {}}
+    
+    for name, result in report['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if not reference or 'error' in result or 'error' in reference:
+            continue
+        
+        entry = comparison['scenarios'][name] = {}
+        if reference.get('throughput'):
+            change = result['throughput'] / reference['throughput'] - 1
+            entry['throughput_change'] = round(change, 3)
+            if change < -tolerance:
+                comparison['regressions'].append(f"{name}: débit {change:+.1%}")
+        
+        for phase, stats in result.get('phases', {}).items():
+            reference_phase = reference.get('phases', {}).get(phase)
+            if not reference_phase or not reference_phase.get('p95_ms'):
+                continue
+            change = stats['p95_ms'] / reference_phase['p95_ms'] - 1
+            entry[f'{phase}_p95_change'] = round(change, 3)
+            # Phases trop rares ou écarts de moins d'une milliseconde: bruit de mesure
+            significant = (stats['count'] >= MIN_PHASE_SAMPLES
+                           and stats['p95_ms'] - reference_phase['p95_ms'] >= MIN_DELTA_MS)
+            if change > tolerance and significant:
+                comparison['regressions'].append(f"{name}/{phase}: p95 {change:+.1%}")
+    
+    return comparison
+
+def print_summary(report: Dict[str, Any]):
+    for name, result in report['scenarios'].items():
+        if 'error' in result:
+            print(f"{name:<9} ERREUR {result['error']}", file=sys.stderr)
+            continue
+        total = result['phases'].get('total') or result['phases'].get('cycle') or {}
+        print(f"{name:<9} {result['throughput']:>9.2f} SMS/s  p50 {total.get('p50_ms', 0):>8.2f} ms  "
+              f"p95 {total.get('p95_ms', 0):>8.2f} ms  p99 {total.get('p99_ms', 0):>8.2f} ms  "
+              f"RSS {result['peak_rss_mb']} Mo", file=sys.stderr)
+    
+    for regression in report.get('comparison', {}).get('regressions', []):
+        print(f"RÉGRESSION {regression}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks envoi/réception SMS sur modems simulés')
+    parser.add_argument('--scenario', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--only', nargs='+', choices=SCENARIOS, help='Scénarios à lancer (défaut: tous)')
+    parser.add_argument('--messages', type=int, default=200, help='SMS par scénario (défaut: 200)')
+    parser.add_argument('--modems', type=int, default=4, help='Modems simulés (défaut: 4)')
+    parser.add_argument('--backend', choices=['simulator', 'mmcli', 'dbus'], default='simulator',
+                        help='Accès aux modems simulés (défaut: simulator, en processus)')
+    parser.add_argument('--sim-config', help='Configuration JSON du simulateur (latences, échecs...)')
+    parser.add_argument('--failure-rate', type=float, help="Taux d'échec des envois simulés")
+    parser.add_argument('--db', choices=['sqlite', 'mysql'], default='sqlite', help='Base de la réception')
+    parser.add_argument('--db-host')
+    parser.add_argument('--db-port', type=int)
+    parser.add_argument('--db-user')
+    parser.add_argument('--db-password')
+    parser.add_argument('--db-database')
+    parser.add_argument('--max-cycles', type=int, default=50, help='Cycles de réception au plus (défaut: 50)')
+    parser.add_argument('--workdir', help='Dossier des fichiers temporaires')
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument('--output', '-o', help='Écrire le rapport JSON dans ce fichier')
+    parser.add_argument('--baseline', help='Rapport de référence à comparer')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Écart toléré (défaut: 0.10)')
+    parser.add_argument('--save-baseline', help='Enregistrer ce rapport comme référence')
+    args = parser.parse_args()
+    
+    if args.scenario:
+        print(json.dumps(run_scenario(args)))
+        return
+    
+    with tempfile.TemporaryDirectory(prefix='sms-bench-') as workdir:
+        args.workdir = args.workdir or workdir
+        config_path = os.path.join(args.workdir, 'simulator.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(simulator_config(args), f)
+        
+        env = dict(os.environ, SMS_SIM_CONFIG=config_path,
+                   SMS_SIM_STATE=os.path.join(args.workdir, 'simulator-state.json'))
+        
+        report = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'backend': args.backend,
+                'db': args.db,
+                'messages': args.messages,
+                'modems': args.modems
+            },
+            'scenarios': {}
+        }
+        
+        for scenario in args.only or SCENARIOS:
+            report['scenarios'][scenario] = launch(args, scenario, env)
+    
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['comparison'] = compare(report, json.load(f), args.tolerance)
+    
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+    
+    print_summary(report)
+    
+    failed = any('error' in result for result in report['scenarios'].values())
+    regressed = bool(report.get('comparison', {}).get('regressions'))
+    sys.exit(1 if failed or regressed else 0)
+
+if __name__ == '__main__':
+    main()
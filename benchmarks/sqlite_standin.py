@@ -0,0 +1,181 @@
+"""
+Remplaçant SQLite de mysql.connector pour les benchmarks
+
+Même interface que le sous-ensemble utilisé par les scripts (connect,
+cursor(dictionary=...), execute/executemany avec %s, lastrowid, Error);
+les tournures MySQL des requêtes (INSERT IGNORE, NOW(), ON DUPLICATE KEY UPDATE,
+LAST_INSERT_ID(id)) sont traduites.
+install() l'enregistre sous le nom mysql.connector pour que
+receive_sms_mmcli.py l'utilise sans modification.
+"""
+
+import re
+import sys
+import types
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS modems (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) NOT NULL,
+    device_path VARCHAR(255) NOT NULL UNIQUE,
+    is_active BOOLEAN DEFAULT 1,
+    priority TINYINT DEFAULT 1,
+    sms_sent INT DEFAULT 0,
+    error_count INT DEFAULT 0,
+    imei VARCHAR(20) NULL,
+    operator VARCHAR(50) NULL,
+    signal_strength TINYINT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS received_sms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender VARCHAR(20) NOT NULL,
+    message TEXT NOT NULL,
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    modem_id INT NULL REFERENCES modems(id) ON DELETE SET NULL,
+    is_unicode BOOLEAN DEFAULT 0,
+    parts_count TINYINT DEFAULT 1,
+    is_incomplete BOOLEAN DEFAULT 0,
+    message_hash VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (sender, message_hash, received_at)
+);
+CREATE INDEX IF NOT EXISTS idx_received_sms_sender ON received_sms (sender);
+CREATE INDEX IF NOT EXISTS idx_received_sms_received ON received_sms (received_at);
+CREATE INDEX IF NOT EXISTS idx_received_sms_hash ON received_sms (message_hash);
+"""
+
+_TRANSLATIONS = [
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.IGNORECASE), 'INSERT OR IGNORE'),
+    (re.compile(r'\bNOW\(\)', re.IGNORECASE), "datetime('now', 'localtime')"),
+    # Mise à jour sans effet: comme MySQL sans CLIENT_FOUND_ROWS, le doublon ne compte pas dans rowcount
+    (re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\s+id\s*=\s*id\b', re.IGNORECASE), 'ON CONFLICT DO NOTHING'),
+    (re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.IGNORECASE), 'ON CONFLICT DO UPDATE SET'),
+    (re.compile(r'\bVALUES\((\w+)\)', re.IGNORECASE), r'excluded.\1'),
+    (re.compile(r'\bLAST_INSERT_ID\((\w+)\)', re.IGNORECASE), r'\1'),
+    (re.compile(r'%s'), '?')
+]
+
+# id = LAST_INSERT_ID(id) dans un upsert: lastrowid désigne aussi la ligne mise à jour
+_LAST_INSERT_ID = re.compile(r'\bLAST_INSERT_ID\((\w+)\)', re.IGNORECASE)
+
+class Error(Exception):
+    pass
+
+class ClientFlag:
+    FOUND_ROWS = 1 << 1
+
+def _translate(query: str) -> str:
+    for pattern, replacement in _TRANSLATIONS:
+        query = pattern.sub(replacement, query)
+    return query
+
+def _param(value):
+    # Même représentation que MySQL pour que BETWEEN sur les dates reste correct
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+class Cursor:
+    def __init__(self, connection: 'Connection', dictionary: bool = False):
+        self._cursor = connection._db.cursor()
+        self._dictionary = dictionary
+        self._connection = connection
+        self._lastrowid = None
+    
+    def execute(self, query: str, params=()):
+        self._lastrowid = None
+        returning = _LAST_INSERT_ID.search(query)
+        translated = _translate(query)
+        if returning:
+            translated += f" RETURNING {returning.group(1)}"
+        try:
+            self._cursor.execute(translated, tuple(_param(p) for p in params or ()))
+            if returning:
+                self._lastrowid = self._cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            raise Error(str(e))
+        self._connection._maybe_commit()
+    
+    def executemany(self, query: str, rows):
+        try:
+            self._cursor.executemany(_translate(query), [tuple(_param(p) for p in row) for row in rows])
+        except sqlite3.Error as e:
+            raise Error(str(e))
+        self._connection._maybe_commit()
+    
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+    
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+    
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+    
+    @property
+    def lastrowid(self):
+        if self._lastrowid is not None:
+            return self._lastrowid
+        return self._cursor.lastrowid
+    
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+    
+    def close(self):
+        self._cursor.close()
+
+class Connection:
+    def __init__(self, database: str, autocommit: bool = True):
+        self._db = sqlite3.connect(database, check_same_thread=False)
+        self.autocommit = autocommit
+    
+    def _maybe_commit(self):
+        if self.autocommit:
+            self._db.commit()
+    
+    def cursor(self, dictionary: bool = False, **kwargs) -> Cursor:
+        return Cursor(self, dictionary)
+    
+    def commit(self):
+        self._db.commit()
+    
+    def rollback(self):
+        self._db.rollback()
+    
+    def is_connected(self) -> bool:
+        return True
+    
+    def ping(self, reconnect: bool = False, attempts: int = 1, delay: int = 0):
+        pass
+    
+    def close(self):
+        self._db.close()
+
+def connect(host=None, port=None, user=None, password=None, database=':memory:',
+            autocommit=True, **kwargs) -> Connection:
+    return Connection(database, autocommit)
+
+def create_schema(database: str, device_paths=()):
+    """Crée les tables et déclare un modem par chemin de périphérique"""
+    db = sqlite3.connect(database)
+    db.executescript(SCHEMA)
+    for index, device_path in enumerate(device_paths):
+        db.execute("INSERT OR IGNORE INTO modems (name, device_path) VALUES (?, ?)",
+                   (f'Modem {index}', device_path))
+    db.commit()
+    db.close()
+
+def install():
+    """Enregistre ce module sous mysql.connector (si le vrai n'est pas déjà importé)"""
+    module = sys.modules[__name__]
+    package = sys.modules.get('mysql') or types.ModuleType('mysql')
+    package.connector = module
+    sys.modules['mysql'] = package
+    sys.modules['mysql.connector'] = module
@@ -30,8 +30,15 @@ define('DB_CHARSET', 'utf8mb4');
 
 // Configuration des SMS
 define('SMS_PYTHON_SCRIPT', ROOT_PATH . '/tools/send_sms_mmcli.py');
+define('SMS_SEND_SOCKET', $_ENV['SMS_SEND_SOCKET'] ?? '/run/sms-gateway/send.sock');
+// Journal local des SMS reçus, commun au démon systemd et à la tâche cron
+define('SMS_RECEIVE_SPOOL_DIR', $_ENV['SMS_RECEIVE_SPOOL_DIR'] ?? '/var/lib/sms-gateway/receive-spool');
+// Attente maximale (s) de la réponse du démon: création (30 s) + envoi (60 s) + attentes de verrou et de débit
+define('SMS_SEND_TIMEOUT', (int) ($_ENV['SMS_SEND_TIMEOUT'] ?? 300));
 define('SMS_MAX_LENGTH', 160);
 define('SMS_UNICODE_MAX_LENGTH', 70);
+define('SMS_DEFAULT_COUNTRY_CODE', $_ENV['SMS_DEFAULT_COUNTRY_CODE'] ?? '212'); // numéros nationaux 0...
+define('SMS_MAX_SEGMENTS', (int) ($_ENV['SMS_MAX_SEGMENTS'] ?? 10)); // segments par SMS long
 define('SMS_MAX_PER_MINUTE', $_ENV['SMS_MAX_PER_MINUTE'] ?? 60);
 define('SMS_RETRY_ATTEMPTS', 3);
 define('SMS_RETRY_DELAY', 300); // 5 minutes
@@ -40,6 +47,7 @@ define('SMS_RETRY_DELAY', 300); // 5 minutes
 define('MODEM_CHECK_INTERVAL', 30); // secondes
 define('MODEM_TIMEOUT', 30); // secondes pour l'envoi
 define('DEFAULT_MODEM_PATH', '/dev/ttyUSB0');
+define('MODEM_ERROR_COOLDOWN', $_ENV['MODEM_ERROR_COOLDOWN'] ?? 300); // secondes en retrait après une erreur
 
 // Configuration de sécurité
 define('SESSION_LIFETIME', 3600); // 1 heure
@@ -119,6 +127,8 @@ return [
     ],
     'sms' => [
         'python_script' => SMS_PYTHON_SCRIPT,
+        'send_socket' => SMS_SEND_SOCKET,
+        'send_timeout' => SMS_SEND_TIMEOUT,
         'max_length' => SMS_MAX_LENGTH,
         'unicode_max_length' => SMS_UNICODE_MAX_LENGTH,
         'max_per_minute' => SMS_MAX_PER_MINUTE,
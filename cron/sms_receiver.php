@@ -58,7 +58,11 @@ try {
     
     // Exécuter le script Python de réception
     $pythonScript = ROOT_PATH . '/tools/receive_sms_mmcli.py';
-    $command = "python3 {$pythonScript} --check-once --json-output";
+    $command = sprintf(
+        'python3 %s --check-once --json-output --spool-dir %s',
+        escapeshellarg($pythonScript),
+        escapeshellarg(SMS_RECEIVE_SPOOL_DIR)
+    );
     
     Logger::debug("Executing SMS receive command: " . $command);
     
@@ -0,0 +1,22 @@
+/*
+# Add Per-Phase Send Timings to SMS Table
+
+1. New Columns
+   - `send_timings` (json) - Duration of each send phase in milliseconds,
+     as reported by send_sms_mmcli.py (discovery, selection, queue,
+     create, send). Deleting the sent SMS from the modem happens later in
+     the background and is not part of it: its duration is tracked per
+     modem by the sms_gateway_reaper_delete_seconds histogram
+   - `send_duration_ms` (int) - Total send duration in milliseconds
+
+2. Features
+   - Tell apart slow modem discovery, ModemManager calls and radio sends
+   - Index on send duration to find slow sends
+*/
+
+-- Add send timing columns to sms table
+ALTER TABLE sms
+    ADD COLUMN send_timings JSON NULL AFTER parts_count,
+    ADD COLUMN send_duration_ms INT NULL AFTER send_timings;
+
+CREATE INDEX idx_sms_send_duration ON sms (send_duration_ms);
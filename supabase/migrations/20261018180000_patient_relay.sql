@@ -0,0 +1,19 @@
+/*
+# Flag Incomplete Received SMS
+
+1. New Columns
+   - `is_incomplete` (boolean) - Long SMS stored without all of its parts:
+     the last part never reached the modem within
+     SMS_RECEIVE_INCOMPLETE_TIMEOUT seconds, the text holds the parts
+     received so far
+
+2. Features
+   - Incomplete long SMS no longer stay in the modem memory forever
+   - Index to list the incomplete SMS
+*/
+
+-- Add incomplete flag to received SMS
+ALTER TABLE received_sms
+    ADD COLUMN is_incomplete BOOLEAN NOT NULL DEFAULT FALSE AFTER parts_count;
+
+CREATE INDEX idx_received_sms_incomplete ON received_sms (is_incomplete);
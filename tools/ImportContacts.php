@@ -43,7 +43,7 @@ class ContactImporter
             throw new Exception("Impossible d'ouvrir le fichier: {$filePath}");
         }
         
-        $contacts = [];
+        $contacts = []; // numéro E.164 => true, pour dédoublonner en O(1)
         $lineNumber = 0;
         $errors = [];
         
@@ -55,28 +55,27 @@ class ContactImporter
                 continue; // Ignorer les lignes vides
             }
             
-            $phone = $this->cleanPhoneNumber($data[0]);
+            $phone = PhoneNumber::normalize($data[0]);
             
             // Vérifier si c'est probablement un en-tête
-            if ($lineNumber === 1 && !$this->isValidPhoneNumber($phone)) {
+            if ($lineNumber === 1 && $phone === null) {
                 if ($this->verbose) {
                     echo "Ligne 1 ignorée (probablement un en-tête): {$data[0]}\n";
                 }
                 continue;
             }
             
-            if (!$this->isValidPhoneNumber($phone)) {
+            if ($phone === null) {
                 $errors[] = "Ligne {$lineNumber}: Numéro invalide '{$data[0]}'";
                 continue;
             }
             
             // Éviter les doublons
-            if (!in_array($phone, $contacts)) {
-                $contacts[] = $phone;
-            }
+            $contacts[$phone] = true;
         }
         
         fclose($handle);
+        $contacts = array_keys($contacts);
         
         if ($this->verbose) {
             echo "Fichier analysé: {$lineNumber} lignes, " . count($contacts) . " contacts valides\n";
@@ -124,27 +123,6 @@ class ContactImporter
         
         return ['created' => $created, 'errors' => count($errors)];
     }
-    
-    private function cleanPhoneNumber($phone)
-    {
-        // Supprimer tous les caractères non numériques sauf +
-        $phone = preg_replace('/[^\d+]/', '', $phone);
-        
-        // Ajouter l'indicatif pays si manquant
-        if (substr($phone, 0, 1) === '0') {
-            $phone = '+33' . substr($phone, 1);
-        } elseif (substr($phone, 0, 1) !== '+') {
-            $phone = '+' . $phone;
-        }
-        
-        return $phone;
-    }
-    
-    private function isValidPhoneNumber($phone)
-    {
-        // Vérification basique d'un numéro international
-        return preg_match('/^\+[1-9]\d{6,14}$/', $phone);
-    }
 }
 
 // Fonction principale
@@ -164,7 +142,8 @@ function main()
         echo "\n";
         echo "Format du fichier CSV:\n";
         echo "  - Une colonne avec les numéros de téléphone\n";
-        echo "  - Format international recommandé (+33...)\n";
+        echo "  - Format international recommandé (+212...), les numéros nationaux (06...)\n";
+        echo "    reçoivent l'indicatif SMS_DEFAULT_COUNTRY_CODE\n";
         echo "  - La première ligne peut être un en-tête\n";
         exit(0);
     }
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Pool de connexions MySQL du démon de réception
+Utilisé par receive_sms_mmcli.py
+
+Chaque appel emprunte une connexion (Session) au pool. Une connexion
+inutilisée depuis plus de ping_interval secondes est vérifiée (ping) avant
+d'être prêtée. Une connexion coupée (wait_timeout, redémarrage du serveur)
+est remplacée et l'appel rejoué une fois, de façon transparente. Si la base
+reste injoignable, les appels échouent aussitôt (DatabaseUnavailable) pendant
+un délai qui double à chaque échec (backoff), sans bloquer les appelants.
+Les requêtes passent par des instructions préparées, gardées par connexion
+et réutilisées d'un cycle à l'autre.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, List
+
+import mysql.connector
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Connexions ouvertes au plus, et délai (s) de connexion
+DEFAULT_POOL_SIZE = int(os.environ.get('SMS_DB_POOL_SIZE', 2))
+DEFAULT_CONNECT_TIMEOUT = int(os.environ.get('SMS_DB_CONNECT_TIMEOUT', 5))
+# Inactivité (s) au-delà de laquelle une connexion est vérifiée avant d'être prêtée
+DEFAULT_PING_INTERVAL = float(os.environ.get('SMS_DB_PING_INTERVAL', 60))
+# Attente (s) entre deux tentatives de connexion: INITIAL_BACKOFF, doublée jusqu'à DEFAULT_MAX_BACKOFF
+INITIAL_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = float(os.environ.get('SMS_DB_MAX_BACKOFF', 30))
+# Instructions préparées gardées par connexion
+MAX_STATEMENTS = 16
+
+# Erreurs client signalant une connexion perdue (CR_CONN_HOST_ERROR, CR_SERVER_GONE_ERROR,
+# CR_SERVER_LOST, CR_SERVER_LOST_EXTENDED, ER_CLIENT_INTERACTION_TIMEOUT)
+CONNECTION_ERRNOS = {2003, 2006, 2013, 2055, 4031}
+# Clé étrangère vers une ligne absente (ER_NO_REFERENCED_ROW_2)
+ER_NO_REFERENCED_ROW = 1452
+
+class DatabaseError(Exception):
+    """Erreur de base de données remontée par le pool (errno MySQL si connu)"""
+    
+    def __init__(self, message: str, errno: int = None):
+        super().__init__(message)
+        self.errno = errno
+
+class DatabaseUnavailable(DatabaseError):
+    """Base injoignable: connexion impossible ou attente avant la prochaine tentative"""
+    pass
+
+def is_connection_error(error: Exception) -> bool:
+    if getattr(error, 'errno', None) in CONNECTION_ERRNOS:
+        return True
+    interface_error = getattr(mysql.connector, 'InterfaceError', None)
+    return interface_error is not None and isinstance(error, interface_error)
+
+class Session:
+    """Connexion empruntée au pool, avec ses instructions préparées"""
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.last_used = time.monotonic()
+        self._statements = OrderedDict()   # requête -> curseur préparé (LRU)
+    
+    def _cursor(self, query: str):
+        cursor = self._statements.get(query)
+        if cursor is not None:
+            self._statements.move_to_end(query)
+            return cursor
+        
+        cursor = self.connection.cursor(prepared=True)
+        self._statements[query] = cursor
+        if len(self._statements) > MAX_STATEMENTS:
+            _, evicted = self._statements.popitem(last=False)
+            self._close_cursor(evicted)
+        return cursor
+    
+    def execute(self, query: str, params=()) -> int:
+        """Exécute une requête sans résultat; retourne le nombre de lignes affectées"""
+        cursor = self._cursor(query)
+        cursor.execute(query, tuple(params))
+        return cursor.rowcount
+    
+    def insert(self, query: str, params=()) -> Optional[int]:
+        """Exécute un INSERT; retourne l'ID inséré, ou celui désigné par LAST_INSERT_ID(id)"""
+        cursor = self._cursor(query)
+        cursor.execute(query, tuple(params))
+        return cursor.lastrowid or None
+    
+    def fetch_all(self, query: str, params=()) -> List[tuple]:
+        cursor = self._cursor(query)
+        cursor.execute(query, tuple(params))
+        return cursor.fetchall()
+    
+    def fetch_one(self, query: str, params=()) -> Optional[tuple]:
+        rows = self.fetch_all(query, params)
+        return rows[0] if rows else None
+    
+    def ping(self):
+        self.connection.ping(reconnect=False)
+    
+    @staticmethod
+    def _close_cursor(cursor):
+        try:
+            cursor.close()
+        except Exception:
+            pass
+    
+    def close(self):
+        for cursor in self._statements.values():
+            self._close_cursor(cursor)
+        self._statements.clear()
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+class ConnectionPool:
+    """Pool borné de connexions mysql.connector, avec vérification et reconnexion"""
+    
+    def __init__(self, config: Dict[str, Any], size: int = None, ping_interval: float = None,
+                 max_backoff: float = None, connect_timeout: int = None):
+        self.config = config
+        self.size = size or DEFAULT_POOL_SIZE
+        self.ping_interval = DEFAULT_PING_INTERVAL if ping_interval is None else ping_interval
+        self.max_backoff = max_backoff or DEFAULT_MAX_BACKOFF
+        self.connect_timeout = connect_timeout or DEFAULT_CONNECT_TIMEOUT
+        self.stats = {'connects': 0, 'connect_failures': 0, 'reconnects': 0, 'pings': 0}
+        self._idle = []                 # sessions libres, la plus récente en dernier
+        self._open = 0                  # sessions ouvertes (libres ou prêtées)
+        self._failures = 0              # échecs de connexion consécutifs
+        self._retry_at = 0.0            # pas de tentative de connexion avant cet instant (monotone)
+        self._closed = False
+        self._cond = threading.Condition()
+    
+    def _connect(self) -> Session:
+        with self._cond:
+            if time.monotonic() < self._retry_at:
+                raise DatabaseUnavailable(f"Database unavailable, next attempt in "
+                                          f"{self._retry_at - time.monotonic():.1f}s")
+        
+        try:
+            connection = mysql.connector.connect(
+                host=self.config['host'],
+                port=self.config['port'],
+                user=self.config['user'],
+                password=self.config['password'],
+                database=self.config['database'],
+                charset='utf8mb4',
+                autocommit=True,
+                # Valeur tronquée ou invalide: erreur plutôt qu'avertissement, la ligne n'est pas écrite
+                sql_mode='STRICT_ALL_TABLES,NO_ENGINE_SUBSTITUTION',
+                # rowcount d'un ON DUPLICATE KEY UPDATE sans changement: 0 (doublon), pas 1
+                client_flags=[-mysql.connector.ClientFlag.FOUND_ROWS],
+                connection_timeout=self.connect_timeout
+            )
+        except mysql.connector.Error as e:
+            with self._cond:
+                self._failures += 1
+                delay = min(self.max_backoff, INITIAL_BACKOFF * 2 ** (self._failures - 1))
+                self._retry_at = time.monotonic() + delay
+                self.stats['connect_failures'] += 1
+            metrics.DB_CONNECTS.inc(result='failed')
+            logger.warning(f"Database connection failed ({e}), next attempt in {delay:g}s")
+            raise DatabaseUnavailable(f"Database connection failed: {e}")
+        
+        with self._cond:
+            if self._failures:
+                logger.info(f"Database connection restored after {self._failures} failed attempts")
+            self._failures = 0
+            self._retry_at = 0.0
+            self.stats['connects'] += 1
+        metrics.DB_CONNECTS.inc(result='ok')
+        logger.debug("Database connection established")
+        return Session(connection)
+    
+    def available(self) -> bool:
+        """Faux pendant l'attente qui suit un échec de connexion"""
+        with self._cond:
+            return time.monotonic() >= self._retry_at
+    
+    def _acquire(self) -> Session:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise DatabaseUnavailable("Connection pool closed")
+                if self._idle:
+                    session = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    session = None
+                    break
+                self._cond.wait()
+        
+        if session is not None and time.monotonic() - session.last_used >= self.ping_interval:
+            self.stats['pings'] += 1
+            try:
+                session.ping()
+            except mysql.connector.Error as e:
+                logger.info(f"Idle database connection lost ({e}), reconnecting")
+                self.stats['reconnects'] += 1
+                session.close()
+                session = None
+        
+        if session is None:
+            try:
+                session = self._connect()
+            except DatabaseError:
+                self._discard()
+                raise
+        return session
+    
+    def _release(self, session: Session):
+        session.last_used = time.monotonic()
+        with self._cond:
+            if self._closed:
+                session.close()
+                self._open -= 1
+            else:
+                self._idle.append(session)
+            self._cond.notify()
+    
+    def _discard(self, session: Session = None):
+        if session is not None:
+            session.close()
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+    
+    @contextmanager
+    def session(self):
+        """Emprunte une session; elle est écartée si la connexion s'est coupée entre-temps"""
+        session = self._acquire()
+        try:
+            yield session
+        except mysql.connector.Error as e:
+            if is_connection_error(e):
+                self._discard(session)
+            else:
+                self._release(session)
+            raise
+        except BaseException:
+            self._release(session)
+            raise
+        self._release(session)
+    
+    def run(self, operation: str, fn: Callable[[Session], Any]) -> Any:
+        """Exécute fn(session); rejoué une fois sur une nouvelle connexion si la connexion est perdue
+        
+        fn doit pouvoir être rejoué (requête idempotente): la première
+        exécution a pu aboutir côté serveur avant la coupure.
+        """
+        with metrics.DB_CALL_SECONDS.time(operation=operation):
+            for attempt in (1, 2):
+                try:
+                    with self.session() as session:
+                        return fn(session)
+                except mysql.connector.Error as e:
+                    metrics.DB_ERRORS.inc(operation=operation)
+                    if not is_connection_error(e):
+                        raise DatabaseError(str(e), getattr(e, 'errno', None)) from e
+                    if attempt == 2:
+                        raise DatabaseUnavailable(f"Database connection lost: {e}") from e
+                    logger.info(f"Database connection lost during {operation} ({e}), reconnecting")
+                    self.stats['reconnects'] += 1
+    
+    def check(self):
+        """Vérifie que la base répond (au démarrage); lève DatabaseUnavailable sinon"""
+        self.run('ping', lambda session: session.ping())
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self.stats, size=self.size, open=self._open, idle=len(self._idle),
+                        available=time.monotonic() >= self._retry_at)
+    
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for session in idle:
+            session.close()
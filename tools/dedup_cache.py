@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Cache de déduplication des SMS reçus, borné en taille et en durée
+Utilisé par receive_sms_mmcli.py
+
+Un SMS déjà vu pendant la fenêtre (même expéditeur, même texte, même
+horodatage) est reconnu en mémoire, sans requête en base. La clé est une
+empreinte du contenu et non l'ID du SMS sur le modem, que ModemManager
+réattribue après suppression. Les entrées expirent après la fenêtre et les
+plus anciennes sont évincées au-delà de max_entries: la mémoire reste
+constante quelle que soit la durée de fonctionnement du démon.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any
+
+# Durée (s) pendant laquelle un SMS déjà traité est reconnu, et nombre maximal d'empreintes
+DEFAULT_WINDOW = float(os.environ.get('SMS_RECEIVE_DEDUP_WINDOW', 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('SMS_RECEIVE_DEDUP_MAX', 50000))
+
+def content_key(sender: str, message: str, received_at: datetime) -> bytes:
+    """Empreinte de 16 octets d'un SMS (mêmes critères que la clé unique_sms)"""
+    content = f"{sender}|{received_at.isoformat()}|{message}"
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+class DedupCache:
+    """Ensemble d'empreintes à expiration (LRU dans l'ordre d'insertion)"""
+    
+    def __init__(self, window: float = None, max_entries: int = None):
+        self.window = DEFAULT_WINDOW if window is None else window
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+        self._entries = OrderedDict()   # empreinte -> instant d'expiration (monotone)
+        self._lock = threading.Lock()
+    
+    def seen(self, key: bytes) -> bool:
+        """Indique si la clé a déjà été vue pendant la fenêtre, et l'enregistre sinon"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            
+            if key in self._entries:
+                self.stats['hits'] += 1
+                return True
+            
+            self.stats['misses'] += 1
+            self._entries[key] = now + self.window
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evicted'] += 1
+            return False
+    
+    def forget(self, key: bytes):
+        """Oublie une clé (SMS finalement laissé sur le modem, à retraiter)"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def _expire(self, now: float):
+        # Fenêtre fixe: l'ordre d'insertion est aussi l'ordre d'expiration
+        while self._entries:
+            key, expires_at = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+            self.stats['expired'] += 1
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, size=len(self._entries), max_entries=self.max_entries, window=self.window)
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Métriques Prometheus des démons SMS (format texte d'exposition 0.0.4)
+Utilisé par send_sms_mmcli.py et receive_sms_mmcli.py
+
+Les compteurs, jauges et histogrammes sont tenus en mémoire par le
+processus; ils sont exposés sur un point HTTP /metrics (--metrics-listen)
+ou écrits périodiquement dans un fichier pour le textfile collector de
+node_exporter (--metrics-textfile). Aucune dépendance hors bibliothèque
+standard.
+
+Taux de doublons à la réception (mémoire puis base pour les SMS passés en base):
+    sum(rate(sms_gateway_dedup_total{result="hit"}[5m]))
+      / sum(rate(sms_gateway_dedup_total{stage="memory"}[5m]))
+"""
+
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, List, Callable
+
+from mm_backend import ModemBackend, ModemBackendError
+
+logger = logging.getLogger(__name__)
+
+# Adresse d'écoute HTTP ([hôte:]port) et fichier du textfile collector, désactivés par défaut
+DEFAULT_LISTEN = os.environ.get('SMS_METRICS_LISTEN')
+DEFAULT_TEXTFILE = os.environ.get('SMS_METRICS_TEXTFILE')
+# Intervalle (s) d'écriture du fichier de métriques
+DEFAULT_TEXTFILE_INTERVAL = float(os.environ.get('SMS_METRICS_TEXTFILE_INTERVAL', 15))
+
+# Bornes (s) des histogrammes: des appels D-Bus (ms) aux envois radio (dizaines de s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Série de valeurs indexées par les valeurs de labels"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, Any]) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: labels attendus {self.labelnames}, reçus {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def clear(self):
+        """Oublie toutes les séries (ex: modems débranchés)"""
+        with self._lock:
+            self._values.clear()
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                    for key, value in self._values.items()]
+    
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    kind = 'counter'
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    kind = 'gauge'
+    
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def replace(self, values: Dict[tuple, float]):
+        """Remplace toutes les séries d'un coup (clés: tuples de valeurs de labels)"""
+        with self._lock:
+            self._values = {tuple(str(v) for v in key): value for key, value in values.items()}
+
+class Histogram(Metric):
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets or DEFAULT_BUCKETS))
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Compte par intervalle (cumulé au rendu), somme, nombre
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def time(self, **labels) -> 'HistogramTimer':
+        """with histogram.time(operation='store'): ..."""
+        return HistogramTimer(self, labels)
+    
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_value(float(bound))}"'
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+                lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class HistogramTimer:
+    """Mesure la durée d'un bloc (perf_counter) et l'ajoute à l'histogramme"""
+    
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Registry:
+    """Ensemble des métriques d'un processus et des fonctions qui les mettent à jour au rendu"""
+    
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+    
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+    
+    def add_collector(self, collector: Callable[[], None]):
+        """collector() est appelé avant chaque rendu (jauges lues à la demande)"""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Collecte des métriques impossible: {e}")
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+REGISTRY = Registry()
+
+# Métriques communes aux deux démons
+SMS_SENT = REGISTRY.register(Counter(
+    'sms_gateway_sms_sent_total', 'SMS envoyés par modem et résultat (sent, failed, timeout)',
+    ('modem', 'outcome')))
+SMS_RECEIVED = REGISTRY.register(Counter(
+    'sms_gateway_sms_received_total', 'SMS lus sur les modems par modem et résultat (stored: journalisé pour l\'écriture en base, '
+    'incomplete: SMS long journalisé sans sa partie manquante, duplicate: déjà vu en mémoire, invalid, error)',
+    ('modem', 'outcome')))
+SEND_PHASE_SECONDS = REGISTRY.register(Histogram(
+    'sms_gateway_send_phase_seconds', 'Durée de chaque phase d\'un envoi', ('phase',)))
+REAPER_DELETE_SECONDS = REGISTRY.register(Histogram(
+    'sms_gateway_reaper_delete_seconds', 'Durée des suppressions en arrière-plan des SMS envoyés, par modem',
+    ('modem',)))
+MODEM_OPERATION_SECONDS = REGISTRY.register(Histogram(
+    'sms_gateway_modem_operation_seconds', 'Durée des appels ModemManager (mmcli ou D-Bus) par opération',
+    ('operation',)))
+MODEM_OPERATION_ERRORS = REGISTRY.register(Counter(
+    'sms_gateway_modem_operation_errors_total', 'Appels ModemManager en erreur par opération et type d\'erreur',
+    ('operation', 'error')))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'sms_gateway_queue_depth', 'Profondeur des files par modem (send: envois en cours ou en attente, '
+    'delete: suppressions en attente, inbox: SMS stockés sur le modem au dernier cycle)',
+    ('queue', 'modem')))
+MODEM_SIGNAL = REGISTRY.register(Gauge(
+    'sms_gateway_modem_signal_quality', 'Qualité du signal du modem (%)', ('modem',)))
+MODEM_STATE = REGISTRY.register(Gauge(
+    'sms_gateway_modem_state', 'État ModemManager du modem (1 pour l\'état courant)', ('modem', 'state')))
+MODEM_INFO = REGISTRY.register(Gauge(
+    'sms_gateway_modem_info', 'Périphérique, IMEI et opérateur de chaque modem', ('modem', 'device', 'imei', 'operator')))
+MODEM_BREAKER_OPEN = REGISTRY.register(Gauge(
+    'sms_gateway_modem_breaker_open', 'Modem écarté par son disjoncteur (1) ou disponible (0)', ('modem',)))
+DB_WRITE_SECONDS = REGISTRY.register(Histogram(
+    'sms_gateway_db_write_seconds', 'Durée des écritures en base par opération', ('operation',)))
+DB_CALL_SECONDS = REGISTRY.register(Histogram(
+    'sms_gateway_db_call_seconds', 'Durée des appels à la base par opération (reconnexion éventuelle comprise)',
+    ('operation',)))
+DB_CONNECTS = REGISTRY.register(Counter(
+    'sms_gateway_db_connects_total', 'Ouvertures de connexion à la base par résultat (ok, failed)', ('result',)))
+DB_ERRORS = REGISTRY.register(Counter(
+    'sms_gateway_db_errors_total', 'Erreurs de base de données par opération', ('operation',)))
+DEDUP = REGISTRY.register(Counter(
+    'sms_gateway_dedup_total', 'Contrôles de doublons à la réception par étape (memory, database) '
+    'et résultat (hit: doublon ignoré)', ('stage', 'result')))
+RECEIVE_CYCLE_SECONDS = REGISTRY.register(Histogram(
+    'sms_gateway_receive_cycle_seconds', 'Durée d\'un cycle de réception (tous modems)'))
+RECEIVE_MODEM_CYCLE_SECONDS = REGISTRY.register(Histogram(
+    'sms_gateway_receive_modem_cycle_seconds', 'Durée du traitement d\'un modem dans un cycle de réception',
+    ('modem',)))
+
+def record_modems(modems: List[Dict[str, Any]]):
+    """Met à jour signal, état et identité des modems (les modems disparus sont oubliés)"""
+    MODEM_SIGNAL.replace({(m['id'],): m['signal_quality'] for m in modems
+                          if m.get('signal_quality') is not None})
+    MODEM_STATE.replace({(m['id'], m.get('state') or 'unknown'): 1 for m in modems})
+    MODEM_INFO.replace({(m['id'], m.get('device_path') or '', m.get('imei') or '', m.get('operator') or ''): 1
+                        for m in modems})
+
+def record_send_timings(timings: Dict[str, Optional[float]]):
+    """Ajoute les durées de phase d'un envoi (ms, voir PhaseTimer) aux histogrammes"""
+    for phase, duration_ms in timings.items():
+        if duration_ms is not None:
+            SEND_PHASE_SECONDS.observe(duration_ms / 1000, phase=phase)
+
+class InstrumentedBackend(ModemBackend):
+    """Backend qui mesure chaque appel ModemManager d'un autre backend"""
+    
+    def __init__(self, backend: ModemBackend):
+        self.backend = backend
+        self.name = backend.name
+    
+    def _timed(self, operation: str, method: Callable, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except ModemBackendError as e:
+            MODEM_OPERATION_ERRORS.inc(operation=operation, error=type(e).__name__)
+            raise
+        finally:
+            MODEM_OPERATION_SECONDS.observe(time.perf_counter() - start, operation=operation)
+    
+    def list_modems(self) -> List[str]:
+        return self._timed('list_modems', self.backend.list_modems)
+    
+    def get_modem_info(self, modem_id: str) -> Optional[Dict[str, Any]]:
+        return self._timed('get_modem_info', self.backend.get_modem_info, modem_id)
+    
+    def get_messaging_capabilities(self, modem_id: str) -> Dict[str, Any]:
+        return self._timed('get_messaging_capabilities', self.backend.get_messaging_capabilities, modem_id)
+    
+    def create_sms(self, modem_id: str, number: str, text: str, timeout: int = 30) -> str:
+        return self._timed('create_sms', self.backend.create_sms, modem_id, number, text, timeout=timeout)
+    
+    def send_sms(self, sms_id: str, timeout: int = 60):
+        return self._timed('send_sms', self.backend.send_sms, sms_id, timeout=timeout)
+    
+    def delete_sms(self, modem_id: str, sms_id: str, timeout: int = 10) -> bool:
+        return self._timed('delete_sms', self.backend.delete_sms, modem_id, sms_id, timeout=timeout)
+    
+    def list_sms(self, modem_id: str, timeout: int = 15) -> List[str]:
+        return self._timed('list_sms', self.backend.list_sms, modem_id, timeout=timeout)
+    
+    def get_sms(self, sms_id: str, timeout: int = 10) -> Optional[Dict[str, Any]]:
+        return self._timed('get_sms', self.backend.get_sms, sms_id, timeout=timeout)
+    
+    def watch_sms(self, callback: Callable[[str, str], None]) -> bool:
+        return self.backend.watch_sms(callback)
+    
+    def stop_watch(self):
+        self.backend.stop_watch()
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        logger.debug(f"metrics: {format % args}")
+
+def parse_listen(value: str) -> tuple:
+    """'9101' -> ('', 9101), '127.0.0.1:9101' -> ('127.0.0.1', 9101)"""
+    host, _, port = str(value).rpartition(':')
+    return host.strip('[]'), int(port)
+
+def write_textfile(path: str, registry: Registry = None):
+    """Écrit les métriques de façon atomique (fichier temporaire puis renommage)"""
+    registry = registry or REGISTRY
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(temporary, path)
+
+class MetricsExporter:
+    """Expose le registre en HTTP et/ou l'écrit périodiquement dans un fichier"""
+    
+    def __init__(self, listen: str = None, textfile: str = None, interval: float = None,
+                 registry: Registry = None):
+        self.listen = listen if listen is not None else DEFAULT_LISTEN
+        self.textfile = textfile if textfile is not None else DEFAULT_TEXTFILE
+        self.interval = interval or DEFAULT_TEXTFILE_INTERVAL
+        self.registry = registry or REGISTRY
+        self._server = None
+        self._threads = []
+        self._stopping = threading.Event()
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.listen or self.textfile)
+    
+    def start(self) -> 'MetricsExporter':
+        if self.listen:
+            self._server = ThreadingHTTPServer(parse_listen(self.listen), MetricsHandler)
+            self._server.daemon_threads = True
+            self._server.registry = self.registry
+            self._spawn('metrics-http', self._server.serve_forever)
+            logger.info(f"Métriques exposées sur http://{self.listen}/metrics")
+        
+        if self.textfile:
+            self._spawn('metrics-textfile', self._write_loop)
+            logger.info(f"Métriques écrites dans {self.textfile} toutes les {self.interval:.0f}s")
+        return self
+    
+    def _spawn(self, name: str, target: Callable):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+    
+    def _write_loop(self):
+        while not self._stopping.wait(self.interval):
+            self.write()
+    
+    def write(self):
+        if not self.textfile:
+            return
+        try:
+            write_textfile(self.textfile, self.registry)
+        except OSError as e:
+            logger.warning(f"Écriture des métriques dans {self.textfile} impossible: {e}")
+    
+    def stop(self):
+        """Arrête l'exposition; le fichier reçoit une dernière écriture"""
+        self._stopping.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.write()
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Backends d'accès à ModemManager pour les scripts SMS Gateway
+Partagé par send_sms_mmcli.py et receive_sms_mmcli.py
+
+- MmcliBackend: appelle l'exécutable mmcli (repli historique)
+- DBusBackend: parle directement à org.freedesktop.ModemManager1, sans fork
+"""
+
+import os
+import logging
+import threading
+import subprocess
+from typing import Dict, Any, Optional, List, Callable
+
+import mmcli_parser
+
+try:
+    import dbus
+except ImportError:  # python3-dbus absent: seul le backend mmcli est disponible
+    dbus = None
+
+logger = logging.getLogger(__name__)
+
+MM_SERVICE = 'org.freedesktop.ModemManager1'
+MM_PATH = '/org/freedesktop/ModemManager1'
+MM_MODEM_PREFIX = MM_PATH + '/Modem/'
+MM_SMS_PREFIX = MM_PATH + '/SMS/'
+
+IFACE_PROPERTIES = 'org.freedesktop.DBus.Properties'
+IFACE_OBJECT_MANAGER = 'org.freedesktop.DBus.ObjectManager'
+IFACE_MODEM = 'org.freedesktop.ModemManager1.Modem'
+IFACE_MODEM_3GPP = 'org.freedesktop.ModemManager1.Modem.Modem3gpp'
+IFACE_MESSAGING = 'org.freedesktop.ModemManager1.Modem.Messaging'
+IFACE_SMS = 'org.freedesktop.ModemManager1.Sms'
+
+# MMModemState: registered (8) et connected (11), comme le texte de mmcli
+MM_MODEM_READY_STATES = (8, 11)
+
+MM_MODEM_STATES = {
+    -1: 'failed', 0: 'unknown', 1: 'initializing', 2: 'locked', 3: 'disabled',
+    4: 'disabling', 5: 'enabling', 6: 'enabled', 7: 'searching', 8: 'registered',
+    9: 'disconnecting', 10: 'connecting', 11: 'connected'
+}
+
+MM_SMS_STATES = {
+    0: 'unknown', 1: 'stored', 2: 'receiving', 3: 'received', 4: 'sending', 5: 'sent'
+}
+
+MM_SMS_PDU_TYPES = {
+    0: 'unknown', 1: 'deliver', 2: 'submit', 3: 'status-report'
+}
+
+MM_SMS_STORAGES = {
+    0: 'unknown', 1: 'sm', 2: 'me', 3: 'mt', 4: 'sr', 5: 'bm', 6: 'ta'
+}
+
+class ModemBackendError(Exception):
+    """Erreur remontée par un backend ModemManager"""
+    pass
+
+class ModemBackendTimeout(ModemBackendError):
+    """Opération ModemManager expirée"""
+    pass
+
+class ModemNotFoundError(ModemBackendError):
+    """Modem ou SMS inconnu de ModemManager (débranché, renuméroté...)"""
+    pass
+
+class ModemStateError(ModemBackendError):
+    """Modem dans un état qui ne permet pas l'opération (WrongState)"""
+    pass
+
+# Marqueurs d'erreurs dans les messages D-Bus/mmcli
+NOT_FOUND_MARKERS = ('UnknownObject', 'UnknownMethod', 'ServiceUnknown', "couldn't find", 'not found')
+WRONG_STATE_MARKERS = ('WrongState', 'Error.Core.Retry', 'not enabled', 'not registered')
+
+def backend_error(message: str) -> ModemBackendError:
+    """Construit l'exception adaptée au message d'erreur de ModemManager"""
+    if any(marker in message for marker in WRONG_STATE_MARKERS):
+        return ModemStateError(message)
+    if any(marker in message for marker in NOT_FOUND_MARKERS):
+        return ModemNotFoundError(message)
+    return ModemBackendError(message)
+
+def modem_id_from_path(path: str) -> str:
+    """/org/freedesktop/ModemManager1/Modem/3 -> '3'"""
+    return str(path).rsplit('/', 1)[-1]
+
+class ModemBackend:
+    """Interface commune des backends ModemManager"""
+    
+    name = 'base'
+    
+    def list_modems(self) -> List[str]:
+        """Retourne les IDs des modems connus de ModemManager"""
+        raise NotImplementedError
+    
+    def get_modem_info(self, modem_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne id, status, imei, operator, signal_quality et device_path"""
+        raise NotImplementedError
+    
+    def get_messaging_capabilities(self, modem_id: str) -> Dict[str, Any]:
+        """Retourne supported_storages, default_storage et messaging_ready"""
+        raise NotImplementedError
+    
+    def create_sms(self, modem_id: str, number: str, text: str, timeout: int = 30) -> str:
+        """Crée un SMS sortant et retourne son ID"""
+        raise NotImplementedError
+    
+    def send_sms(self, sms_id: str, timeout: int = 60):
+        """Envoie un SMS déjà créé"""
+        raise NotImplementedError
+    
+    def delete_sms(self, modem_id: str, sms_id: str, timeout: int = 10) -> bool:
+        """Supprime un SMS de la mémoire du modem"""
+        raise NotImplementedError
+    
+    def list_sms(self, modem_id: str, timeout: int = 15) -> List[str]:
+        """Retourne les IDs des SMS stockés sur le modem"""
+        raise NotImplementedError
+    
+    def get_sms(self, sms_id: str, timeout: int = 10) -> Optional[Dict[str, Any]]:
+        """Retourne id, sender, message, timestamp (texte brut), state et pdu_type d'un SMS"""
+        raise NotImplementedError
+    
+    def watch_sms(self, callback: Callable[[str, str], None]) -> bool:
+        """Appelle callback(modem_id, sms_id) à chaque SMS reçu, depuis un thread du backend
+        
+        Retourne False si le backend ne sait pas notifier les SMS reçus
+        (l'appelant doit alors interroger les modems).
+        """
+        return False
+    
+    def stop_watch(self):
+        """Arrête les notifications démarrées par watch_sms()"""
+        pass
+
+class MmcliBackend(ModemBackend):
+    """Backend historique: un appel mmcli par opération
+    
+    La sortie machine de mmcli (-J, ou -K avec output_format='keyvalue') est
+    analysée par mmcli_parser; nécessite mmcli >= 1.12.
+    """
+    
+    name = 'mmcli'
+    
+    def __init__(self, mmcli_path: str = 'mmcli', output_format: str = None):
+        self.mmcli_path = mmcli_path
+        self.output_format = output_format or os.environ.get('SMS_MMCLI_OUTPUT', mmcli_parser.JSON)
+        if self.output_format not in mmcli_parser.OUTPUT_OPTIONS:
+            raise ModemBackendError(f"Format de sortie mmcli inconnu: {self.output_format}")
+    
+    def _run(self, args: List[str], timeout: int) -> subprocess.CompletedProcess:
+        try:
+            return subprocess.run(
+                [self.mmcli_path] + args,
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            raise ModemBackendTimeout(f"Timeout mmcli {' '.join(args)}")
+        except OSError as e:
+            raise ModemBackendError(f"Impossible d'exécuter mmcli: {e}")
+    
+    def _query(self, args: List[str], timeout: int) -> Dict[str, Any]:
+        """Lance mmcli en sortie machine et retourne le dictionnaire plat analysé"""
+        result = self._run([mmcli_parser.OUTPUT_OPTIONS[self.output_format]] + args, timeout=timeout)
+        
+        if result.returncode != 0:
+            raise backend_error(result.stderr.strip())
+        
+        try:
+            return mmcli_parser.parse(result.stdout, self.output_format)
+        except ValueError as e:
+            raise ModemBackendError(f"Sortie mmcli illisible ({' '.join(args)}): {e}")
+    
+    def list_modems(self) -> List[str]:
+        return mmcli_parser.modem_ids(self._query(['-L'], timeout=10))
+    
+    def get_modem_info(self, modem_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            output = self._query(['-m', modem_id], timeout=10)
+        except ModemBackendTimeout:
+            raise
+        except ModemBackendError as e:
+            logger.warning(f"Impossible d'obtenir les infos du modem {modem_id}: {e}")
+            return None
+        
+        return mmcli_parser.modem_record(output, modem_id)
+    
+    def get_messaging_capabilities(self, modem_id: str) -> Dict[str, Any]:
+        output = self._query(['-m', modem_id, '--messaging-status'], timeout=10)
+        return mmcli_parser.messaging_capabilities(output)
+    
+    def create_sms(self, modem_id: str, number: str, text: str, timeout: int = 30) -> str:
+        result = self._run([
+            '-m', modem_id,
+            '--messaging-create-sms',
+            f'--messaging-create-sms-text={text}',
+            f'--messaging-create-sms-number={number}'
+        ], timeout=timeout)
+        
+        if result.returncode != 0:
+            raise backend_error(result.stderr.strip())
+        
+        sms_id = mmcli_parser.created_sms_id(result.stdout)
+        if not sms_id:
+            raise ModemBackendError("Impossible d'obtenir l'ID du SMS créé")
+        
+        return sms_id
+    
+    def send_sms(self, sms_id: str, timeout: int = 60):
+        result = self._run(['-s', sms_id, '--send'], timeout=timeout)
+        
+        if result.returncode != 0:
+            raise backend_error(result.stderr.strip())
+    
+    def delete_sms(self, modem_id: str, sms_id: str, timeout: int = 10) -> bool:
+        result = self._run(['-m', modem_id, '--messaging-delete-sms', sms_id], timeout=timeout)
+        return result.returncode == 0
+    
+    def list_sms(self, modem_id: str, timeout: int = 15) -> List[str]:
+        try:
+            return mmcli_parser.sms_ids(self._query(['-m', modem_id, '--messaging-list-sms'], timeout=timeout))
+        except ModemBackendTimeout:
+            raise
+        except ModemBackendError:
+            return []
+    
+    def get_sms(self, sms_id: str, timeout: int = 10) -> Optional[Dict[str, Any]]:
+        try:
+            output = self._query(['-s', sms_id], timeout=timeout)
+        except ModemBackendTimeout:
+            raise
+        except ModemBackendError:
+            return None
+        
+        return mmcli_parser.sms_record(output, sms_id)
+
+class DBusBackend(ModemBackend):
+    """Backend natif: appels D-Bus vers ModemManager, aucun processus lancé
+    
+    bus_address permet de viser un bus privé (ex: faux service de test lancé
+    avec dbus-run-session); sinon le bus système est utilisé.
+    """
+    
+    name = 'dbus'
+    
+    def __init__(self, bus_address: str = None):
+        if dbus is None:
+            raise ModemBackendError("Module python3-dbus non disponible")
+        
+        self.bus_address = bus_address or os.environ.get('SMS_GATEWAY_DBUS_ADDRESS')
+        self._watch_loop = None
+        self._watch_bus = None
+        
+        try:
+            self.bus = self._connect()
+            
+            # Vérifie que ModemManager est joignable dès la construction
+            self._object(MM_PATH).GetManagedObjects(
+                dbus_interface=IFACE_OBJECT_MANAGER, timeout=10
+            )
+        except dbus.exceptions.DBusException as e:
+            raise ModemBackendError(f"ModemManager injoignable sur D-Bus: {e.get_dbus_message()}")
+    
+    def _connect(self, mainloop=None):
+        if self.bus_address == 'session':
+            return dbus.SessionBus(private=True, mainloop=mainloop)
+        if self.bus_address:
+            return dbus.bus.BusConnection(self.bus_address, mainloop=mainloop)
+        return dbus.SystemBus(private=True, mainloop=mainloop)
+    
+    def _object(self, path: str):
+        return self.bus.get_object(MM_SERVICE, path, introspect=False)
+    
+    def _call(self, path: str, interface: str, method: str, *args, timeout: int = 10):
+        try:
+            return getattr(self._object(path), method)(
+                *args, dbus_interface=interface, timeout=timeout
+            )
+        except dbus.exceptions.DBusException as e:
+            if e.get_dbus_name() in ('org.freedesktop.DBus.Error.NoReply',
+                                     'org.freedesktop.DBus.Error.Timeout',
+                                     'org.freedesktop.DBus.Error.TimedOut'):
+                raise ModemBackendTimeout(f"Timeout D-Bus {interface}.{method}")
+            raise backend_error(f"{e.get_dbus_name()}: {e.get_dbus_message() or ''}")
+    
+    def _properties(self, path: str, interface: str, timeout: int = 10) -> Dict[str, Any]:
+        return self._call(path, IFACE_PROPERTIES, 'GetAll', interface, timeout=timeout)
+    
+    def list_modems(self) -> List[str]:
+        objects = self._call(MM_PATH, IFACE_OBJECT_MANAGER, 'GetManagedObjects')
+        return [modem_id_from_path(path) for path in objects
+                if str(path).startswith(MM_MODEM_PREFIX)]
+    
+    def get_modem_info(self, modem_id: str) -> Optional[Dict[str, Any]]:
+        path = MM_MODEM_PREFIX + modem_id
+        
+        try:
+            modem = self._properties(path, IFACE_MODEM)
+        except ModemBackendTimeout:
+            raise
+        except ModemBackendError as e:
+            logger.warning(f"Impossible d'obtenir les infos du modem {modem_id}: {e}")
+            return None
+        
+        state = int(modem.get('State', 0))
+        info = {
+            'id': modem_id,
+            'status': 'ready' if state in MM_MODEM_READY_STATES else 'not_ready',
+            'state': MM_MODEM_STATES.get(state, 'unknown')
+        }
+        
+        if modem.get('PrimaryPort'):
+            info['device_path'] = str(modem['PrimaryPort'])
+        
+        if modem.get('EquipmentIdentifier'):
+            info['imei'] = str(modem['EquipmentIdentifier'])
+        
+        signal = modem.get('SignalQuality')
+        if signal:
+            info['signal_quality'] = int(signal[0])
+        
+        try:
+            gpp = self._properties(path, IFACE_MODEM_3GPP)
+            if gpp.get('Imei'):
+                info['imei'] = str(gpp['Imei'])
+            if gpp.get('OperatorName'):
+                info['operator'] = str(gpp['OperatorName'])
+        except ModemBackendError:
+            pass  # Modem non 3GPP ou interface pas encore exposée
+        
+        return info
+    
+    def get_messaging_capabilities(self, modem_id: str) -> Dict[str, Any]:
+        props = self._properties(MM_MODEM_PREFIX + modem_id, IFACE_MESSAGING)
+        
+        storages = [MM_SMS_STORAGES.get(int(storage), 'unknown')
+                    for storage in props.get('SupportedStorages', [])]
+        default = props.get('DefaultStorage')
+        
+        return {
+            'supported_storages': storages,
+            'default_storage': MM_SMS_STORAGES.get(int(default), 'unknown') if default is not None else None,
+            'messaging_ready': bool(storages)
+        }
+    
+    def create_sms(self, modem_id: str, number: str, text: str, timeout: int = 30) -> str:
+        properties = dbus.Dictionary({
+            'number': dbus.String(number),
+            'text': dbus.String(text)
+        }, signature='sv')
+        
+        path = self._call(MM_MODEM_PREFIX + modem_id, IFACE_MESSAGING, 'Create',
+                          properties, timeout=timeout)
+        return modem_id_from_path(path)
+    
+    def send_sms(self, sms_id: str, timeout: int = 60):
+        self._call(MM_SMS_PREFIX + sms_id, IFACE_SMS, 'Send', timeout=timeout)
+    
+    def delete_sms(self, modem_id: str, sms_id: str, timeout: int = 10) -> bool:
+        try:
+            self._call(MM_MODEM_PREFIX + modem_id, IFACE_MESSAGING, 'Delete',
+                       dbus.ObjectPath(MM_SMS_PREFIX + sms_id), timeout=timeout)
+            return True
+        except ModemBackendError as e:
+            logger.debug(f"Suppression du SMS {sms_id} impossible: {e}")
+            return False
+    
+    def list_sms(self, modem_id: str, timeout: int = 15) -> List[str]:
+        try:
+            paths = self._call(MM_MODEM_PREFIX + modem_id, IFACE_MESSAGING, 'List',
+                               timeout=timeout)
+        except ModemBackendTimeout:
+            raise
+        except ModemBackendError:
+            return []
+        return [modem_id_from_path(path) for path in paths]
+    
+    def get_sms(self, sms_id: str, timeout: int = 10) -> Optional[Dict[str, Any]]:
+        try:
+            props = self._properties(MM_SMS_PREFIX + sms_id, IFACE_SMS, timeout=timeout)
+        except ModemBackendTimeout:
+            raise
+        except ModemBackendError:
+            return None
+        
+        sms_info = {
+            'id': sms_id,
+            'state': MM_SMS_STATES.get(int(props.get('State', 0)), 'unknown'),
+            'pdu_type': MM_SMS_PDU_TYPES.get(int(props.get('PduType', 0)), 'unknown')
+        }
+        
+        if props.get('Number'):
+            sms_info['sender'] = str(props['Number'])
+        if props.get('Text'):
+            sms_info['message'] = str(props['Text'])
+        if props.get('Timestamp'):
+            sms_info['timestamp'] = str(props['Timestamp'])
+        
+        return sms_info
+    
+    def watch_sms(self, callback: Callable[[str, str], None]) -> bool:
+        """Signal Messaging.Added de ModemManager, sur une connexion dédiée et une boucle GLib"""
+        try:
+            from dbus.mainloop.glib import DBusGMainLoop, threads_init
+            from gi.repository import GLib
+        except ImportError:
+            logger.warning("python3-gi absent: pas de notification D-Bus des SMS reçus")
+            return False
+        
+        def added(path, received, modem_path=None):
+            # received=False: SMS créé localement (envoi en cours), pas un SMS entrant
+            if received:
+                callback(modem_id_from_path(modem_path), modem_id_from_path(path))
+        
+        threads_init()
+        try:
+            # Connexion gardée (et fermée par stop_watch): le ramasse-miettes ne doit pas couper l'abonnement
+            self._watch_bus = self._connect(mainloop=DBusGMainLoop())
+            self._watch_bus.add_signal_receiver(added, signal_name='Added', dbus_interface=IFACE_MESSAGING,
+                                                bus_name=MM_SERVICE, path_keyword='modem_path')
+        except dbus.exceptions.DBusException as e:
+            logger.warning(f"Abonnement au signal Messaging.Added impossible: {e.get_dbus_message()}")
+            self._close_watch_bus()
+            return False
+        
+        self._watch_loop = GLib.MainLoop()
+        threading.Thread(target=self._watch_loop.run, name='mm-sms-watch', daemon=True).start()
+        return True
+    
+    def stop_watch(self):
+        if self._watch_loop is not None:
+            self._watch_loop.quit()
+            self._watch_loop = None
+        self._close_watch_bus()
+    
+    def _close_watch_bus(self):
+        if self._watch_bus is not None:
+            try:
+                self._watch_bus.close()
+            except dbus.exceptions.DBusException as e:
+                logger.debug(f"Fermeture de la connexion D-Bus de notification: {e.get_dbus_message()}")
+            self._watch_bus = None
+
+def get_backend(name: str = None) -> ModemBackend:
+    """Instancie le backend demandé: 'dbus', 'mmcli' ou 'auto' (D-Bus puis mmcli)"""
+    name = name or os.environ.get('SMS_MODEM_BACKEND', 'auto')
+    
+    if name == 'mmcli':
+        return MmcliBackend()
+    
+    if name == 'dbus':
+        return DBusBackend()
+    
+    if name != 'auto':
+        raise ModemBackendError(f"Backend inconnu: {name}")
+    
+    try:
+        return DBusBackend()
+    except ModemBackendError as e:
+        logger.debug(f"Backend D-Bus indisponible ({e}), repli sur mmcli")
+        return MmcliBackend()
@@ -0,0 +1,16 @@
+"""
+Simulateur ModemManager pour faire tourner les scripts sans modem
+
+- mm_simulator/bin/mmcli: faux exécutable mmcli (mettre ce dossier en tête du PATH)
+- python3 -m mm_simulator dbus: faux service org.freedesktop.ModemManager1
+- mm_simulator.backend.SimulatorBackend: backend en processus (benchmarks)
+
+Les deux partagent le même état (fichier SMS_SIM_STATE) et la même
+configuration (fichier JSON SMS_SIM_CONFIG, voir config.example.json):
+nombre de modems, signal, latences par opération, taux d'échec et de
+timeout, capacité de stockage et débit de SMS entrants.
+"""
+
+from mm_simulator.world import Simulator, SimulatorError, load_config, DEFAULT_CONFIG
+
+__all__ = ['Simulator', 'SimulatorError', 'load_config', 'DEFAULT_CONFIG']
@@ -0,0 +1,63 @@
+"""
+Pilotage du simulateur (depuis tools/):
+
+    python3 -m mm_simulator reset                 # état neuf
+    python3 -m mm_simulator show                  # modems, SMS stockés, compteurs
+    python3 -m mm_simulator inject 0 +212612345678 "Bonjour"
+    python3 -m mm_simulator dbus [--bus ADRESSE]  # faux service D-Bus
+    python3 -m mm_simulator mmcli -J -L           # même chose que bin/mmcli
+"""
+
+import sys
+import json
+import logging
+import argparse
+
+from mm_simulator.world import Simulator, load_config
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'mmcli':
+        from mm_simulator.mmcli import main as mmcli_main
+        sys.exit(mmcli_main(sys.argv[2:]))
+    
+    parser = argparse.ArgumentParser(prog='mm_simulator', description='Simulateur ModemManager')
+    parser.add_argument('--config', help='Configuration JSON (défaut: SMS_SIM_CONFIG)')
+    parser.add_argument('--state', help="Fichier d'état (défaut: SMS_SIM_STATE)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    commands.add_parser('reset', help='Repartir d\'un état neuf')
+    commands.add_parser('show', help='Afficher modems et compteurs')
+    
+    inject = commands.add_parser('inject', help='Faire arriver un SMS sur un modem')
+    inject.add_argument('modem')
+    inject.add_argument('number')
+    inject.add_argument('text')
+    
+    service = commands.add_parser('dbus', help='Publier le faux ModemManager sur D-Bus')
+    service.add_argument('--bus', default='session', help="'session', 'system' ou adresse D-Bus")
+    
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    simulator = Simulator(load_config(args.config), args.state)
+    
+    if args.command == 'reset':
+        simulator.reset()
+        print(json.dumps(simulator.snapshot(), indent=2))
+    
+    elif args.command == 'show':
+        print(json.dumps(simulator.snapshot(), indent=2))
+    
+    elif args.command == 'inject':
+        sms_id = simulator.deliver(args.modem, args.number, args.text)
+        if sms_id is None:
+            print('Mémoire du modem pleine, SMS perdu', file=sys.stderr)
+            sys.exit(1)
+        print(sms_id)
+    
+    elif args.command == 'dbus':
+        from mm_simulator.dbus_service import serve
+        serve(simulator, args.bus)
+
+if __name__ == '__main__':
+    main()
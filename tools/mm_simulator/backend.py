@@ -0,0 +1,110 @@
+"""
+Backend ModemManager en processus sur l'état simulé (ni fork de mmcli, ni D-Bus)
+
+Mêmes latences et mêmes erreurs que les deux faux services: sert aux
+benchmarks pour mesurer le coût propre des scripts, sans celui du transport.
+
+    backend = SimulatorBackend()
+    sender = SMSSender(backend=backend)
+"""
+
+import time
+from typing import Dict, Any, Optional, List
+
+from mm_backend import ModemBackend, ModemBackendTimeout, backend_error
+from mm_simulator.world import Simulator, SimulatorError
+
+# Mêmes noms d'erreurs que ModemManager, classés ensuite par backend_error()
+ERROR_NAMES = {
+    'not_found': 'org.freedesktop.DBus.Error.UnknownObject',
+    'wrong_state': 'org.freedesktop.ModemManager1.Error.Core.WrongState',
+    'memory_full': 'org.freedesktop.ModemManager1.Error.Message.MemoryFull',
+    'failed': 'org.freedesktop.ModemManager1.Error.Core.Failed'
+}
+
+class SimulatorBackend(ModemBackend):
+    """Backend branché directement sur un Simulator"""
+    
+    name = 'simulator'
+    
+    def __init__(self, simulator: Simulator = None):
+        self.simulator = simulator or Simulator()
+    
+    def _wait(self, delay: float, timeout: float, operation: str):
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise ModemBackendTimeout(f"Timeout simulateur {operation}")
+        time.sleep(delay)
+    
+    def _call(self, operation, *args):
+        try:
+            return operation(*args)
+        except SimulatorError as e:
+            raise backend_error(f"{ERROR_NAMES.get(e.kind, ERROR_NAMES['failed'])}: {e.message}")
+    
+    def list_modems(self) -> List[str]:
+        self._wait(self.simulator.latency('list'), None, 'list')
+        return self.simulator.modem_ids()
+    
+    def get_modem_info(self, modem_id: str) -> Optional[Dict[str, Any]]:
+        self._wait(self.simulator.latency('info', modem_id), None, 'info')
+        try:
+            modem = self.simulator.modem(modem_id)
+        except SimulatorError:
+            return None
+        
+        return {
+            'id': modem_id,
+            'status': 'ready' if modem['state'] in ('registered', 'connected') else 'not_ready',
+            'state': modem['state'],
+            'device_path': modem['primary_port'],
+            'imei': modem['imei'],
+            'operator': modem['operator'],
+            'signal_quality': modem['signal']
+        }
+    
+    def get_messaging_capabilities(self, modem_id: str) -> Dict[str, Any]:
+        self._wait(self.simulator.latency('info', modem_id), None, 'messaging-status')
+        storages = self._call(self.simulator.modem, modem_id)['storages']
+        return {
+            'supported_storages': list(storages),
+            'default_storage': storages[-1] if storages else None,
+            'messaging_ready': bool(storages)
+        }
+    
+    def create_sms(self, modem_id: str, number: str, text: str, timeout: int = 30) -> str:
+        self._wait(self.simulator.latency('create', modem_id), timeout, 'create')
+        return self._call(self.simulator.create_sms, modem_id, number, text)
+    
+    def send_sms(self, sms_id: str, timeout: int = 60):
+        delay, outcome = self._call(self.simulator.plan_send, sms_id)
+        self._wait(delay, timeout, 'send')
+        self._call(self.simulator.finish_send, sms_id, outcome)
+    
+    def delete_sms(self, modem_id: str, sms_id: str, timeout: int = 10) -> bool:
+        self._wait(self.simulator.latency('delete', modem_id), timeout, 'delete')
+        try:
+            self.simulator.delete_sms(modem_id, sms_id)
+            return True
+        except SimulatorError:
+            return False
+    
+    def list_sms(self, modem_id: str, timeout: int = 15) -> List[str]:
+        self._wait(self.simulator.latency('list', modem_id), timeout, 'list-sms')
+        try:
+            return self.simulator.list_sms(modem_id)
+        except SimulatorError:
+            return []
+    
+    def get_sms(self, sms_id: str, timeout: int = 10) -> Optional[Dict[str, Any]]:
+        self._wait(self.simulator.latency('get'), timeout, 'get-sms')
+        try:
+            sms = self.simulator.get_sms(sms_id)
+        except SimulatorError:
+            return None
+        
+        sms_info = {'id': sms_id, 'state': sms['state'], 'pdu_type': sms['pdu_type'],
+                    'sender': sms['number'], 'message': sms['text']}
+        if sms.get('timestamp'):
+            sms_info['timestamp'] = sms['timestamp']
+        return sms_info
@@ -0,0 +1,235 @@
+"""
+Faux service org.freedesktop.ModemManager1 sur D-Bus, sur l'état simulé
+
+Expose ce qu'utilise DBusBackend: ObjectManager.GetManagedObjects,
+Properties.GetAll (Modem, Modem3gpp, Messaging, Sms), Messaging.List/
+Create/Delete, Sms.Send, et le signal Messaging.Added pour les SMS reçus.
+Les réponses sont différées de la latence simulée sans bloquer la boucle
+GLib; un envoi tiré en timeout ne reçoit jamais de réponse.
+
+Nécessite python3-dbus et python3-gi. À lancer sur un bus de session privé:
+
+    dbus-run-session -- sh -c 'python3 -m mm_simulator dbus & sleep 1; \
+        SMS_GATEWAY_DBUS_ADDRESS=session python3 send_sms_mmcli.py --list-modems'
+"""
+
+import logging
+
+import dbus
+import dbus.service
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+from mm_backend import (MM_SERVICE, MM_PATH, MM_MODEM_PREFIX, MM_SMS_PREFIX,
+                        IFACE_PROPERTIES, IFACE_OBJECT_MANAGER, IFACE_MODEM, IFACE_MODEM_3GPP,
+                        IFACE_MESSAGING, IFACE_SMS, MM_MODEM_STATES, MM_SMS_STATES,
+                        MM_SMS_PDU_TYPES, MM_SMS_STORAGES)
+from mm_simulator.world import Simulator, SimulatorError
+
+logger = logging.getLogger(__name__)
+
+ERROR_NAMES = {
+    'not_found': 'org.freedesktop.DBus.Error.UnknownObject',
+    'wrong_state': 'org.freedesktop.ModemManager1.Error.Core.WrongState',
+    'memory_full': 'org.freedesktop.ModemManager1.Error.Message.MemoryFull',
+    'failed': 'org.freedesktop.ModemManager1.Error.Core.Failed'
+}
+
+def _codes(names):
+    return {name: code for code, name in names.items()}
+
+MODEM_STATE_CODES = _codes(MM_MODEM_STATES)
+SMS_STATE_CODES = _codes(MM_SMS_STATES)
+PDU_TYPE_CODES = _codes(MM_SMS_PDU_TYPES)
+STORAGE_CODES = _codes(MM_SMS_STORAGES)
+
+def dbus_error(error: SimulatorError) -> dbus.DBusException:
+    return dbus.DBusException(error.message, name=ERROR_NAMES.get(error.kind, ERROR_NAMES['failed']))
+
+class FakeModemManager(dbus.service.FallbackObject):
+    """Tous les objets sous /org/freedesktop/ModemManager1 (modems et SMS)"""
+    
+    def __init__(self, bus, simulator: Simulator, tick_interval: int = 1):
+        super().__init__(bus, MM_PATH)
+        self.simulator = simulator
+        GLib.timeout_add_seconds(tick_interval, self._tick)
+    
+    # --- Utilitaires ---
+    
+    def _later(self, delay: float, operation, reply, error):
+        """Exécute l'opération après delay secondes et répond (ou transmet l'erreur)"""
+        def run():
+            try:
+                result = operation()
+            except SimulatorError as e:
+                error(dbus_error(e))
+            else:
+                if result is None:
+                    reply()
+                else:
+                    reply(result)
+            self._announce_arrivals()
+            return False
+        
+        GLib.timeout_add(max(0, int(delay * 1000)), run)
+    
+    def _tick(self):
+        self.simulator.modem_ids()  # fait avancer le temps simulé
+        self._announce_arrivals()
+        return True
+    
+    def _announce_arrivals(self):
+        for modem_id, sms_id in self.simulator.drain_arrivals():
+            self.Added(dbus.ObjectPath(MM_SMS_PREFIX + sms_id), True, rel_path=f'/Modem/{modem_id}')
+    
+    @staticmethod
+    def _target(rel_path: str, kind: str) -> str:
+        parts = rel_path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != kind or not parts[1].isdigit():
+            raise SimulatorError('not_found', f'No such object: {MM_PATH}{rel_path}')
+        return parts[1]
+    
+    def _modem_properties(self, modem: dict, interface: str) -> dict:
+        if interface == IFACE_MODEM:
+            return {
+                'State': dbus.Int32(MODEM_STATE_CODES.get(modem['state'], 0)),
+                'PrimaryPort': dbus.String(modem['primary_port']),
+                'EquipmentIdentifier': dbus.String(modem['imei']),
+                'Manufacturer': dbus.String('Simulator'),
+                'Model': dbus.String('SIM-EC25'),
+                'SignalQuality': dbus.Struct((dbus.UInt32(modem['signal']), dbus.Boolean(True)),
+                                             signature='ub')
+            }
+        if interface == IFACE_MODEM_3GPP:
+            return {
+                'Imei': dbus.String(modem['imei']),
+                'OperatorName': dbus.String(modem['operator'])
+            }
+        if interface == IFACE_MESSAGING:
+            storages = [STORAGE_CODES.get(storage, 0) for storage in modem['storages']]
+            return {
+                'Messages': dbus.Array([dbus.ObjectPath(MM_SMS_PREFIX + sms_id) for sms_id in modem['messages']],
+                                       signature='o'),
+                'SupportedStorages': dbus.Array([dbus.UInt32(code) for code in storages], signature='u'),
+                'DefaultStorage': dbus.UInt32(storages[-1] if storages else 0)
+            }
+        raise SimulatorError('not_found', f'No such interface: {interface}')
+    
+    def _sms_properties(self, sms: dict) -> dict:
+        return {
+            'State': dbus.UInt32(SMS_STATE_CODES.get(sms['state'], 0)),
+            'PduType': dbus.UInt32(PDU_TYPE_CODES.get(sms['pdu_type'], 0)),
+            'Storage': dbus.UInt32(STORAGE_CODES.get(sms['storage'], 0)),
+            'Number': dbus.String(sms['number']),
+            'Text': dbus.String(sms['text']),
+            'Timestamp': dbus.String(sms.get('timestamp', ''))
+        }
+    
+    # --- org.freedesktop.DBus.ObjectManager ---
+    
+    @dbus.service.method(IFACE_OBJECT_MANAGER, in_signature='', out_signature='a{oa{sa{sv}}}',
+                         rel_path_keyword='rel_path', async_callbacks=('reply', 'error'))
+    def GetManagedObjects(self, rel_path, reply, error):
+        def operation():
+            objects = {}
+            for modem_id in self.simulator.modem_ids():
+                modem = self.simulator.modem(modem_id)
+                objects[dbus.ObjectPath(MM_MODEM_PREFIX + modem_id)] = {
+                    interface: self._modem_properties(modem, interface)
+                    for interface in (IFACE_MODEM, IFACE_MODEM_3GPP, IFACE_MESSAGING)
+                }
+            return objects
+        
+        self._later(self.simulator.latency('list'), operation, reply, error)
+    
+    # --- org.freedesktop.DBus.Properties ---
+    
+    @dbus.service.method(IFACE_PROPERTIES, in_signature='s', out_signature='a{sv}',
+                         rel_path_keyword='rel_path', async_callbacks=('reply', 'error'))
+    def GetAll(self, interface, rel_path, reply, error):
+        def operation():
+            if rel_path.startswith('/SMS/'):
+                if interface != IFACE_SMS:
+                    raise SimulatorError('not_found', f'No such interface: {interface}')
+                return self._sms_properties(self.simulator.get_sms(self._target(rel_path, 'SMS')))
+            return self._modem_properties(self.simulator.modem(self._target(rel_path, 'Modem')), interface)
+        
+        operation_name = 'get' if rel_path.startswith('/SMS/') else 'info'
+        self._later(self.simulator.latency(operation_name), operation, reply, error)
+    
+    # --- org.freedesktop.ModemManager1.Modem.Messaging ---
+    
+    @dbus.service.method(IFACE_MESSAGING, in_signature='', out_signature='ao',
+                         rel_path_keyword='rel_path', async_callbacks=('reply', 'error'))
+    def List(self, rel_path, reply, error):
+        def operation():
+            modem_id = self._target(rel_path, 'Modem')
+            return dbus.Array([dbus.ObjectPath(MM_SMS_PREFIX + sms_id)
+                               for sms_id in self.simulator.list_sms(modem_id)], signature='o')
+        
+        self._later(self.simulator.latency('list'), operation, reply, error)
+    
+    @dbus.service.method(IFACE_MESSAGING, in_signature='a{sv}', out_signature='o',
+                         rel_path_keyword='rel_path', async_callbacks=('reply', 'error'))
+    def Create(self, properties, rel_path, reply, error):
+        def operation():
+            modem_id = self._target(rel_path, 'Modem')
+            sms_id = self.simulator.create_sms(modem_id, str(properties.get('number', '')),
+                                               str(properties.get('text', '')))
+            return dbus.ObjectPath(MM_SMS_PREFIX + sms_id)
+        
+        self._later(self.simulator.latency('create'), operation, reply, error)
+    
+    @dbus.service.method(IFACE_MESSAGING, in_signature='o', out_signature='',
+                         rel_path_keyword='rel_path', async_callbacks=('reply', 'error'))
+    def Delete(self, path, rel_path, reply, error):
+        def operation():
+            self.simulator.delete_sms(self._target(rel_path, 'Modem'), str(path).rsplit('/', 1)[-1])
+        
+        self._later(self.simulator.latency('delete'), operation, reply, error)
+    
+    @dbus.service.signal(IFACE_MESSAGING, signature='ob', rel_path_keyword='rel_path')
+    def Added(self, path, received, rel_path=None):
+        pass
+    
+    # --- org.freedesktop.ModemManager1.Sms ---
+    
+    @dbus.service.method(IFACE_SMS, in_signature='', out_signature='',
+                         rel_path_keyword='rel_path', async_callbacks=('reply', 'error'))
+    def Send(self, rel_path, reply, error):
+        try:
+            sms_id = self._target(rel_path, 'SMS')
+            delay, outcome = self.simulator.plan_send(sms_id)
+        except SimulatorError as e:
+            error(dbus_error(e))
+            return
+        
+        if outcome == 'timeout':
+            logger.info(f"SMS {sms_id}: envoi simulé sans réponse (timeout)")
+            return
+        
+        self._later(delay, lambda: self.simulator.finish_send(sms_id, outcome), reply, error)
+
+def serve(simulator: Simulator = None, bus_address: str = None):
+    """Publie le faux ModemManager et tourne jusqu'à interruption"""
+    DBusGMainLoop(set_as_default=True)
+    
+    if bus_address in (None, 'session'):
+        bus = dbus.SessionBus()
+    elif bus_address == 'system':
+        bus = dbus.SystemBus()
+    else:
+        bus = dbus.bus.BusConnection(bus_address)
+    
+    name = dbus.service.BusName(MM_SERVICE, bus, do_not_queue=True)
+    service = FakeModemManager(bus, simulator or Simulator())
+    logger.info(f"Faux ModemManager publié sous {MM_SERVICE}")
+    
+    loop = GLib.MainLoop()
+    try:
+        loop.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.remove_from_connection()
+        del name
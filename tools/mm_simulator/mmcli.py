@@ -0,0 +1,178 @@
+"""
+Faux mmcli: mêmes options et même sortie machine (-J/-K) que le vrai, sur l'état simulé
+
+Options prises en charge: celles utilisées par MmcliBackend (-L, -m N,
+--messaging-status, --messaging-list-sms, --messaging-create-sms, -s N,
+--send, --messaging-delete-sms). Sans -J, la sortie est au format -K.
+"""
+
+import sys
+import time
+import json
+import argparse
+from typing import Dict, Any, List
+
+from mm_simulator.world import Simulator, SimulatorError
+
+MM_PATH = '/org/freedesktop/ModemManager1'
+
+# Préfixe des erreurs ModemManager, comme dans les messages du vrai mmcli
+ERROR_NAMES = {
+    'not_found': None,
+    'wrong_state': 'org.freedesktop.ModemManager1.Error.Core.WrongState',
+    'memory_full': 'org.freedesktop.ModemManager1.Error.Message.MemoryFull',
+    'failed': 'org.freedesktop.ModemManager1.Error.Core.Failed'
+}
+
+def object_index(value: str) -> str:
+    """'3', '/org/freedesktop/ModemManager1/SMS/3' -> '3'"""
+    return str(value).rstrip('/').rsplit('/', 1)[-1]
+
+def modem_output(modem: Dict[str, Any]) -> Dict[str, Any]:
+    storages = modem['storages']
+    return {'modem': {
+        'dbus-path': f"{MM_PATH}/Modem/{modem['id']}",
+        'generic': {
+            'manufacturer': 'Simulator',
+            'model': 'SIM-EC25',
+            'state': modem['state'],
+            'power-state': 'on',
+            'primary-port': modem['primary_port'],
+            'ports': [f"{modem['primary_port']} (qmi)"],
+            'equipment-identifier': modem['imei'],
+            'signal-quality': {'value': str(modem['signal']), 'recent': 'yes'},
+            'access-technologies': ['lte']
+        },
+        '3gpp': {
+            'imei': modem['imei'],
+            'operator-name': modem['operator'],
+            'registration-state': 'home' if modem['state'] in ('registered', 'connected') else '--'
+        },
+        'messaging': {
+            'supported-storages': storages,
+            'default-storages': [storages[-1]] if storages else []
+        }
+    }}
+
+def sms_output(sms: Dict[str, Any]) -> Dict[str, Any]:
+    return {'sms': {
+        'dbus-path': f"{MM_PATH}/SMS/{sms['id']}",
+        'content': {'number': sms['number'], 'text': sms['text'], 'data': '--'},
+        'properties': {
+            'pdu-type': sms['pdu_type'],
+            'state': sms['state'],
+            'storage': sms['storage'],
+            'timestamp': sms.get('timestamp', '--')
+        }
+    }}
+
+def _keyvalue_lines(value: Any, prefix: str, lines: List[tuple]):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _keyvalue_lines(item, f'{prefix}.{key}' if prefix else key, lines)
+    elif isinstance(value, list):
+        lines.append((f'{prefix}.length', str(len(value))))
+        for index, item in enumerate(value, 1):
+            lines.append((f'{prefix}.value[{index}]', item))
+    else:
+        lines.append((prefix, value))
+
+def render(output: Dict[str, Any], as_json: bool) -> str:
+    if as_json:
+        return json.dumps(output, ensure_ascii=False)
+    
+    lines = []
+    _keyvalue_lines(output, '', lines)
+    width = max((len(key) for key, _ in lines), default=0)
+    return '\n'.join(f'{key.ljust(width)} : {value}' for key, value in lines)
+
+def parse_create_properties(value: str) -> Dict[str, str]:
+    """--messaging-create-sms="text='Bonjour',number='+212...'" (syntaxe du vrai mmcli)"""
+    properties = {}
+    for item in value.split("',"):
+        key, _, content = item.partition('=')
+        if key:
+            properties[key.strip()] = content.strip().strip("'")
+    return properties
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='mmcli', description='Faux mmcli (simulateur SMS Gateway)')
+    parser.add_argument('-J', '--output-json', action='store_true')
+    parser.add_argument('-K', '--output-keyvalue', action='store_true')
+    parser.add_argument('-L', '--list-modems', action='store_true')
+    parser.add_argument('-m', '--modem')
+    parser.add_argument('-s', '--sms')
+    parser.add_argument('--messaging-status', action='store_true')
+    parser.add_argument('--messaging-list-sms', action='store_true')
+    parser.add_argument('--messaging-create-sms', nargs='?', const='')
+    parser.add_argument('--messaging-create-sms-text')
+    parser.add_argument('--messaging-create-sms-number')
+    parser.add_argument('--messaging-delete-sms')
+    parser.add_argument('--send', action='store_true')
+    return parser
+
+def run(args, simulator: Simulator) -> str:
+    as_json = args.output_json
+    
+    if args.list_modems:
+        paths = [f'{MM_PATH}/Modem/{modem_id}' for modem_id in simulator.modem_ids()]
+        if as_json or args.output_keyvalue:
+            return render({'modem-list': paths}, as_json)
+        return '\n'.join(f'    {path} [Simulator] SIM-EC25' for path in paths) or 'No modems were found'
+    
+    if args.modem is not None:
+        modem_id = object_index(args.modem)
+        
+        if args.messaging_create_sms is not None:
+            properties = parse_create_properties(args.messaging_create_sms)
+            text = args.messaging_create_sms_text if args.messaging_create_sms_text is not None \
+                else properties.get('text', '')
+            number = args.messaging_create_sms_number or properties.get('number', '')
+            time.sleep(simulator.latency('create', modem_id))
+            sms_id = simulator.create_sms(modem_id, number, text)
+            return f'Successfully created new SMS: {MM_PATH}/SMS/{sms_id}'
+        
+        if args.messaging_delete_sms is not None:
+            time.sleep(simulator.latency('delete', modem_id))
+            simulator.delete_sms(modem_id, object_index(args.messaging_delete_sms))
+            return 'successfully deleted SMS from modem'
+        
+        if args.messaging_list_sms:
+            time.sleep(simulator.latency('list', modem_id))
+            paths = [f'{MM_PATH}/SMS/{sms_id}' for sms_id in simulator.list_sms(modem_id)]
+            return render({'modem.messaging.sms': paths}, as_json)
+        
+        time.sleep(simulator.latency('info', modem_id))
+        output = modem_output(simulator.modem(modem_id))
+        if args.messaging_status:
+            output = {'modem': {'messaging': output['modem']['messaging']}}
+        else:
+            del output['modem']['messaging']
+        return render(output, as_json)
+    
+    if args.sms is not None:
+        sms_id = object_index(args.sms)
+        
+        if args.send:
+            delay, outcome = simulator.plan_send(sms_id)
+            time.sleep(delay)
+            simulator.finish_send(sms_id, outcome)
+            return 'successfully sent the SMS'
+        
+        time.sleep(simulator.latency('get'))
+        return render(sms_output(simulator.get_sms(sms_id)), as_json)
+    
+    raise SimulatorError('failed', 'no actions specified')
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    simulator = Simulator()
+    
+    try:
+        print(run(args, simulator))
+        return 0
+    except SimulatorError as e:
+        name = ERROR_NAMES.get(e.kind)
+        message = f"'GDBus.Error:{name}: {e.message}'" if name else e.message
+        print(f'error: {message}', file=sys.stderr)
+        return 1
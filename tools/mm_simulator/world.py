@@ -0,0 +1,357 @@
+"""
+État simulé des modems et des SMS, partagé par le faux mmcli et le faux service D-Bus
+
+L'état est un fichier JSON verrouillé par flock: chaque appel du faux mmcli
+(un processus par opération, comme le vrai) et le service D-Bus voient les
+mêmes modems et les mêmes SMS. Les SMS entrants arrivent selon un processus
+de Poisson, calculé à chaque accès à partir du temps écoulé.
+"""
+
+import os
+import json
+import math
+import time
+import fcntl
+import random
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
+
+CONFIG_PATH = os.environ.get('SMS_SIM_CONFIG')
+STATE_PATH = os.environ.get('SMS_SIM_STATE', '/tmp/mm_simulator.json')
+
+# Latence: nombre (secondes, fixe) ou {'distribution': 'fixed'|'uniform'|'exponential'|'lognormal', ...}
+DEFAULT_CONFIG = {
+    'modems': 2,
+    'operator': 'Orange MA',
+    'state': 'registered',
+    'signal': [40, 95],
+    'storages': ['sm', 'me'],
+    'storage_capacity': 50,
+    'failure_rate': 0.0,
+    'timeout_rate': 0.0,
+    'timeout_seconds': 120,
+    'incoming_rate': 0.0,
+    'seed': None,
+    'latency': {
+        'list': 0.005,
+        'info': 0.01,
+        'get': 0.005,
+        'create': {'distribution': 'lognormal', 'median': 0.05, 'sigma': 0.4},
+        'send': {'distribution': 'lognormal', 'median': 1.0, 'sigma': 0.5},
+        'delete': 0.02
+    },
+    'modem_overrides': {}
+}
+
+# Clés de configuration qu'un modem peut surcharger (modem_overrides: {"1": {...}})
+MODEM_KEYS = ('operator', 'state', 'signal', 'storages', 'storage_capacity',
+              'failure_rate', 'timeout_rate', 'incoming_rate', 'latency')
+
+READY_STATES = ('registered', 'connected')
+
+INCOMING_TEXTS = [
+    'OK merci',
+    'Bien reçu, je rappelle demain.',
+    'STOP',
+    'Bonjour,\nje confirme le rendez-vous de 15h.\nCordialement',
+    'شكرا، توصلت بالرسالة',
+    'Votre colis est en route 🚚'
+]
+
+class SimulatorError(Exception):
+    """Erreur simulée; kind: not_found, wrong_state, memory_full ou failed"""
+    
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+
+def load_config(path: str = None) -> Dict[str, Any]:
+    """Configuration par défaut complétée par le fichier JSON (SMS_SIM_CONFIG)"""
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    path = path or CONFIG_PATH
+    
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        latency = overrides.pop('latency', {})
+        config.update(overrides)
+        config['latency'].update(latency)
+    
+    return config
+
+def sample_latency(spec, rng: random.Random) -> float:
+    """Tire une durée (secondes) selon la spécification de latence"""
+    if spec is None:
+        return 0.0
+    if isinstance(spec, (int, float)):
+        return float(spec)
+    
+    distribution = spec.get('distribution', 'fixed')
+    if distribution == 'uniform':
+        return rng.uniform(spec.get('min', 0.0), spec.get('max', 0.0))
+    if distribution == 'exponential':
+        return rng.expovariate(1.0 / spec['mean']) if spec.get('mean') else 0.0
+    if distribution == 'lognormal':
+        return rng.lognormvariate(math.log(spec['median']), spec.get('sigma', 0.5))
+    return float(spec.get('value', 0.0))
+
+def poisson(lam: float, rng: random.Random) -> int:
+    if lam <= 0:
+        return 0
+    if lam > 30:
+        return max(0, int(round(rng.gauss(lam, math.sqrt(lam)))))
+    
+    # Knuth
+    limit = math.exp(-lam)
+    count, product = 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+def _timestamp() -> str:
+    return datetime.now().astimezone().isoformat(timespec='seconds')
+
+class Simulator:
+    """Modems et SMS simulés, persistés dans state_path"""
+    
+    def __init__(self, config: Dict[str, Any] = None, state_path: str = None):
+        self.config = config or load_config()
+        self.state_path = state_path or STATE_PATH
+        self.arrivals = []  # (modem_id, sms_id) des SMS reçus depuis le dernier drain_arrivals()
+        
+        seed = self.config.get('seed')
+        self.rng = random.Random(f'{seed}:{os.getpid()}') if seed is not None else random.Random()
+    
+    def modem_config(self, modem_id: str) -> Dict[str, Any]:
+        config = {key: self.config[key] for key in MODEM_KEYS}
+        overrides = self.config.get('modem_overrides', {}).get(str(modem_id), {})
+        latency = dict(config['latency'])
+        latency.update(overrides.get('latency', {}))
+        config.update(overrides)
+        config['latency'] = latency
+        return config
+    
+    def latency(self, operation: str, modem_id: str = None) -> float:
+        latencies = self.modem_config(modem_id)['latency'] if modem_id is not None else self.config['latency']
+        return sample_latency(latencies.get(operation), self.rng)
+    
+    # --- État persistant ---
+    
+    def _initial_state(self) -> Dict[str, Any]:
+        now = time.time()
+        modems = {}
+        for index in range(int(self.config['modems'])):
+            modem_id = str(index)
+            signal = self.modem_config(modem_id)['signal']
+            if isinstance(signal, list):
+                signal = self.rng.randint(int(signal[0]), int(signal[1]))
+            modems[modem_id] = {
+                'signal': int(signal),
+                'imei': f'8676980412{index:05d}',
+                'primary_port': f'cdc-wdm{index}',
+                'last_tick': now
+            }
+        
+        return {
+            'next_sms_id': 0,
+            'modems': modems,
+            'sms': {},
+            'stats': {'created': 0, 'sent': 0, 'failed': 0, 'timeouts': 0,
+                      'deleted': 0, 'received': 0, 'dropped': 0}
+        }
+    
+    @contextmanager
+    def _locked(self):
+        """État verrouillé (flock exclusif), SMS entrants ajoutés, réécrit à la sortie"""
+        with open(self.state_path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                state = json.loads(content) if content.strip() else self._initial_state()
+                
+                self._tick(state, time.time())
+                try:
+                    yield state
+                finally:
+                    # Réécrit aussi en cas d'erreur simulée: les SMS arrivés entre-temps sont gardés
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f, ensure_ascii=False)
+                    f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def reset(self):
+        """Repart d'un état neuf (modems tirés à nouveau, aucun SMS)"""
+        with open(self.state_path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            f.truncate()
+            json.dump(self._initial_state(), f, ensure_ascii=False)
+    
+    def _tick(self, state: Dict[str, Any], now: float):
+        for modem_id, modem in state['modems'].items():
+            elapsed = max(0.0, now - modem.get('last_tick', now))
+            modem['last_tick'] = now
+            
+            rate = self.modem_config(modem_id)['incoming_rate']  # SMS par minute
+            for _ in range(poisson(rate * elapsed / 60.0, self.rng)):
+                number = '+2126' + ''.join(str(self.rng.randint(0, 9)) for _ in range(8))
+                self._receive(state, modem_id, number, self.rng.choice(INCOMING_TEXTS))
+    
+    def _receive(self, state: Dict[str, Any], modem_id: str, number: str, text: str) -> Optional[str]:
+        if self._stored_count(state, modem_id) >= self.modem_config(modem_id)['storage_capacity']:
+            state['stats']['dropped'] += 1  # mémoire pleine: le SMS est perdu, comme sur un vrai modem
+            return None
+        
+        sms_id = self._new_sms(state, modem_id, number, text, 'received', 'deliver')
+        state['sms'][sms_id]['timestamp'] = _timestamp()
+        state['stats']['received'] += 1
+        self.arrivals.append((modem_id, sms_id))
+        return sms_id
+    
+    def _new_sms(self, state: Dict[str, Any], modem_id: str, number: str, text: str,
+                 sms_state: str, pdu_type: str) -> str:
+        sms_id = str(state['next_sms_id'])
+        state['next_sms_id'] += 1
+        state['sms'][sms_id] = {
+            'modem': modem_id,
+            'number': number,
+            'text': text,
+            'state': sms_state,
+            'pdu_type': pdu_type,
+            'storage': self.modem_config(modem_id)['storages'][-1]
+        }
+        return sms_id
+    
+    def _stored_count(self, state: Dict[str, Any], modem_id: str) -> int:
+        return sum(1 for sms in state['sms'].values() if sms['modem'] == modem_id)
+    
+    def _modem(self, state: Dict[str, Any], modem_id: str) -> Dict[str, Any]:
+        modem = state['modems'].get(str(modem_id))
+        if modem is None:
+            raise SimulatorError('not_found', f"couldn't find modem {modem_id}")
+        return modem
+    
+    def _sms(self, state: Dict[str, Any], sms_id: str) -> Dict[str, Any]:
+        sms = state['sms'].get(str(sms_id))
+        if sms is None:
+            raise SimulatorError('not_found', f"couldn't find SMS {sms_id}")
+        return sms
+    
+    def drain_arrivals(self) -> List[Tuple[str, str]]:
+        arrivals, self.arrivals = self.arrivals, []
+        return arrivals
+    
+    # --- Opérations ModemManager ---
+    
+    def modem_ids(self) -> List[str]:
+        with self._locked() as state:
+            return sorted(state['modems'], key=int)
+    
+    def modem(self, modem_id: str) -> Dict[str, Any]:
+        """id, state, signal, imei, operator, primary_port, storages, messages"""
+        with self._locked() as state:
+            modem = dict(self._modem(state, modem_id))
+            messages = [sms_id for sms_id, sms in state['sms'].items() if sms['modem'] == str(modem_id)]
+        
+        config = self.modem_config(modem_id)
+        modem.update({
+            'id': str(modem_id),
+            'state': config['state'],
+            'operator': config['operator'],
+            'storages': config['storages'],
+            'messages': sorted(messages, key=int)
+        })
+        return modem
+    
+    def list_sms(self, modem_id: str) -> List[str]:
+        return self.modem(modem_id)['messages']
+    
+    def get_sms(self, sms_id: str) -> Dict[str, Any]:
+        with self._locked() as state:
+            sms = dict(self._sms(state, sms_id))
+        sms['id'] = str(sms_id)
+        return sms
+    
+    def create_sms(self, modem_id: str, number: str, text: str) -> str:
+        config = self.modem_config(modem_id)
+        
+        with self._locked() as state:
+            self._modem(state, modem_id)
+            if config['state'] not in READY_STATES:
+                raise SimulatorError('wrong_state', f"modem {modem_id} not registered ({config['state']})")
+            if self._stored_count(state, str(modem_id)) >= config['storage_capacity']:
+                raise SimulatorError('memory_full', f"SMS storage full on modem {modem_id}")
+            
+            sms_id = self._new_sms(state, str(modem_id), number, text, 'unknown', 'submit')
+            state['stats']['created'] += 1
+            return sms_id
+    
+    def plan_send(self, sms_id: str) -> Tuple[float, str]:
+        """Tire la durée et l'issue d'un envoi: 'sent', 'failed' ou 'timeout'"""
+        sms = self.get_sms(sms_id)
+        config = self.modem_config(sms['modem'])
+        
+        if config['state'] not in READY_STATES:
+            return 0.0, 'wrong_state'
+        
+        draw = self.rng.random()
+        if draw < config['timeout_rate']:
+            # Compté tout de suite: l'appelant abandonne souvent avant la fin de l'attente
+            with self._locked() as state:
+                state['stats']['timeouts'] += 1
+            return float(self.config['timeout_seconds']), 'timeout'
+        if draw < config['timeout_rate'] + config['failure_rate']:
+            return self.latency('send', sms['modem']), 'failed'
+        return self.latency('send', sms['modem']), 'sent'
+    
+    def finish_send(self, sms_id: str, outcome: str):
+        """Applique l'issue tirée par plan_send; lève SimulatorError si l'envoi échoue"""
+        with self._locked() as state:
+            sms = self._sms(state, sms_id)
+            
+            if outcome == 'sent':
+                sms['state'] = 'sent'
+                sms['storage'] = 'unknown'
+                state['stats']['sent'] += 1
+                return
+            
+            if outcome != 'timeout':
+                state['stats']['failed'] += 1
+        
+        if outcome == 'wrong_state':
+            raise SimulatorError('wrong_state', f"modem {sms['modem']} not registered")
+        if outcome == 'timeout':
+            raise SimulatorError('failed', 'Timeout was reached')
+        raise SimulatorError('failed', 'Couldn\'t send SMS: network rejected the message')
+    
+    def delete_sms(self, modem_id: str, sms_id: str):
+        with self._locked() as state:
+            self._modem(state, modem_id)
+            sms = self._sms(state, sms_id)
+            if sms['modem'] != str(modem_id):
+                raise SimulatorError('not_found', f"couldn't find SMS {sms_id} on modem {modem_id}")
+            del state['sms'][str(sms_id)]
+            state['stats']['deleted'] += 1
+    
+    def deliver(self, modem_id: str, number: str, text: str) -> Optional[str]:
+        """Fait arriver un SMS sur le modem (None si sa mémoire est pleine)"""
+        with self._locked() as state:
+            self._modem(state, modem_id)
+            return self._receive(state, str(modem_id), number, text)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._locked() as state:
+            per_modem = {modem_id: self._stored_count(state, modem_id) for modem_id in state['modems']}
+            return {
+                'modems': {modem_id: {'signal': modem['signal'], 'primary_port': modem['primary_port'],
+                                      'state': self.modem_config(modem_id)['state'],
+                                      'stored_sms': per_modem[modem_id]}
+                           for modem_id, modem in state['modems'].items()},
+                'stats': dict(state['stats'])
+            }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Analyse de la sortie machine de mmcli (-J JSON ou -K clé-valeur)
+Utilisé par MmcliBackend (mm_backend.py), donc par l'envoi et la réception
+
+Les deux formats sont ramenés en une passe au même dictionnaire plat de clés
+pointées ('modem.generic.state', 'sms.content.text'...), puis convertis en
+enregistrements typés. Contrairement à la sortie lisible, ces formats ne
+dépendent ni de l'alignement des colonnes ni de la langue, et un texte de SMS
+sur plusieurs lignes est conservé en entier.
+"""
+
+import re
+import json
+from typing import Dict, Any, Optional, List
+
+JSON = 'json'
+KEYVALUE = 'keyvalue'
+
+# Option mmcli correspondant à chaque format
+OUTPUT_OPTIONS = {JSON: '-J', KEYVALUE: '-K'}
+
+# Valeur vide dans la sortie mmcli
+EMPTY = '--'
+
+# États de modem qui permettent d'envoyer (MM_MODEM_READY_STATES du backend D-Bus)
+READY_STATES = ('registered', 'connected')
+
+_ARRAY_ITEM = re.compile(r'^(.+)\.value\[(\d+)\]$')
+_OBJECT_ID = re.compile(r'/(?:Modem|SMS|SIM|Bearer)/(\d+)\s*$')
+_CREATED_SMS = re.compile(r'/SMS/(\d+)')
+
+def _flatten(value: Any, prefix: str, flat: Dict[str, Any]):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(item, f'{prefix}.{key}' if prefix else key, flat)
+    else:
+        flat[prefix] = value
+
+def parse_json(output: str) -> Dict[str, Any]:
+    """Sortie de mmcli -J -> dictionnaire plat de clés pointées"""
+    flat = {}
+    _flatten(json.loads(output or '{}'), '', flat)
+    return flat
+
+def parse_keyvalue(output: str) -> Dict[str, Any]:
+    """Sortie de mmcli -K -> dictionnaire plat de clés pointées
+    
+    Les tableaux ('x.length', 'x.value[1]'...) deviennent des listes; une
+    ligne qui n'est pas de la forme 'clé : valeur' prolonge la valeur
+    précédente (texte de SMS sur plusieurs lignes).
+    """
+    flat = {}
+    last_key = None
+    
+    for line in output.splitlines():
+        # 'modem.generic.state          : registered'
+        key, separator, value = line.partition(' : ')
+        key = key.rstrip()
+        if not separator or not key or ' ' in key or key[0] in '\t-':
+            if last_key is not None and isinstance(flat.get(last_key), str):
+                flat[last_key] += '\n' + line
+            continue
+        
+        value = value.rstrip()
+        
+        if key.endswith('.length'):
+            flat.setdefault(key[:-len('.length')], [])
+            last_key = None
+            continue
+        
+        item = key.endswith(']') and _ARRAY_ITEM.match(key)
+        if item:
+            flat.setdefault(item.group(1), []).append(value)
+            last_key = None
+            continue
+        
+        flat[key] = value
+        last_key = key
+    
+    return flat
+
+def parse(output: str, output_format: str = JSON) -> Dict[str, Any]:
+    if output_format == KEYVALUE:
+        return parse_keyvalue(output)
+    return parse_json(output)
+
+def value(flat: Dict[str, Any], key: str) -> Optional[Any]:
+    """Valeur d'une clé, None si absente ou vide ('--')"""
+    item = flat.get(key)
+    if item in (None, '', EMPTY):
+        return None
+    return item
+
+def values(flat: Dict[str, Any], key: str) -> List[str]:
+    """Liste d'une clé (tableau mmcli), sans les valeurs vides"""
+    items = flat.get(key)
+    if items is None or items == EMPTY:
+        return []
+    if not isinstance(items, list):
+        items = [item.strip() for item in str(items).split(',')]
+    return [item for item in items if item not in ('', EMPTY)]
+
+def object_id(path: str) -> Optional[str]:
+    """/org/freedesktop/ModemManager1/SMS/21 -> '21'"""
+    match = _OBJECT_ID.search(path or '')
+    return match.group(1) if match else None
+
+def _int(text: Optional[str]) -> Optional[int]:
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
+
+def modem_ids(flat: Dict[str, Any]) -> List[str]:
+    """mmcli -L"""
+    return [modem_id for modem_id in map(object_id, values(flat, 'modem-list')) if modem_id]
+
+def modem_record(flat: Dict[str, Any], modem_id: str) -> Dict[str, Any]:
+    """mmcli -m N -> id, status, state, imei, operator, signal_quality, device_path"""
+    state = value(flat, 'modem.generic.state') or 'unknown'
+    record = {
+        'id': modem_id,
+        'status': 'ready' if state in READY_STATES else 'not_ready',
+        'state': state
+    }
+    
+    device_path = value(flat, 'modem.generic.primary-port')
+    if device_path:
+        record['device_path'] = device_path
+    
+    imei = value(flat, 'modem.3gpp.imei') or value(flat, 'modem.generic.equipment-identifier')
+    if imei:
+        record['imei'] = imei
+    
+    operator = value(flat, 'modem.3gpp.operator-name')
+    if operator:
+        record['operator'] = operator
+    
+    signal = _int(value(flat, 'modem.generic.signal-quality.value'))
+    if signal is not None:
+        record['signal_quality'] = signal
+    
+    return record
+
+def sms_ids(flat: Dict[str, Any]) -> List[str]:
+    """mmcli -m N --messaging-list-sms"""
+    return [sms_id for sms_id in map(object_id, values(flat, 'modem.messaging.sms')) if sms_id]
+
+def sms_record(flat: Dict[str, Any], sms_id: str) -> Dict[str, Any]:
+    """mmcli -s N -> id, sender, message, timestamp, state, pdu_type"""
+    record = {
+        'id': sms_id,
+        'state': value(flat, 'sms.properties.state') or 'unknown',
+        'pdu_type': value(flat, 'sms.properties.pdu-type') or 'unknown'
+    }
+    
+    for field, key in (('sender', 'sms.content.number'), ('message', 'sms.content.text'),
+                       ('timestamp', 'sms.properties.timestamp')):
+        item = value(flat, key)
+        if item is not None:
+            record[field] = item
+    
+    return record
+
+def messaging_capabilities(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """mmcli -m N --messaging-status -> supported_storages, default_storage, messaging_ready"""
+    storages = values(flat, 'modem.messaging.supported-storages')
+    # Selon la version de mmcli: une valeur ou une liste (stockage par défaut de chaque type)
+    defaults = values(flat, 'modem.messaging.default-storages') or values(flat, 'modem.messaging.default-storage')
+    
+    return {
+        'supported_storages': storages,
+        'default_storage': defaults[0] if defaults else None,
+        'messaging_ready': bool(storages)
+    }
+
+def created_sms_id(output: str) -> Optional[str]:
+    """'Successfully created new SMS: /org/freedesktop/ModemManager1/SMS/21' -> '21'"""
+    match = _CREATED_SMS.search(output or '')
+    return match.group(1) if match else None
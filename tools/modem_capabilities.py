@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Capacités de messagerie des modems, en cache
+Utilisé par send_sms_mmcli.py
+
+Les stockages supportés, le stockage par défaut et l'état de l'interface
+Messaging sont lus par les processus résidents (démon, lot) à chaque
+rechargement de l'inventaire, pour les modems apparus ou dont l'état a changé
+(nouvel état, autre port, autre IMEI). L'envoi ne fait que consulter le cache:
+il se résume à créer puis envoyer le SMS, sans appel préalable au modem, même
+en envoi unitaire où le cache reste vide.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+from mm_backend import ModemBackend, ModemBackendError, ModemBackendTimeout
+# Segments maximum d'un SMS long: ModemManager ne l'expose pas, c'est une limite de la passerelle
+from sms_encoding import DEFAULT_MAX_SEGMENTS
+
+logger = logging.getLogger(__name__)
+
+# Champs de l'inventaire dont le changement impose de relire les capacités
+STATE_FIELDS = ('state', 'status', 'device_path', 'imei')
+
+class CapabilityCache:
+    """Capacités de messagerie par modem, relues à chaque changement d'état"""
+    
+    def __init__(self, backend: ModemBackend, max_segments: int = None):
+        self.backend = backend
+        self.max_segments = max_segments or DEFAULT_MAX_SEGMENTS
+        self._entries = {}  # modem_id -> (clé d'état, capacités)
+        self._lock = threading.Lock()
+    
+    def get(self, modem: Dict[str, Any]) -> Dict[str, Any]:
+        """Retourne les capacités du modem (enregistrement de l'inventaire)"""
+        modem_id = modem['id']
+        key = tuple(modem.get(field) for field in STATE_FIELDS)
+        
+        with self._lock:
+            entry = self._entries.get(modem_id)
+            if entry and entry[0] == key:
+                return dict(entry[1])
+        
+        capabilities = self._probe(modem_id)
+        
+        # Un timeout n'est pas mis en cache: nouvel essai au prochain rechargement
+        if not capabilities.get('timed_out'):
+            with self._lock:
+                self._entries[modem_id] = (key, capabilities)
+        
+        return dict(capabilities)
+    
+    def refresh(self, modems: List[Dict[str, Any]]):
+        """Relit les capacités des modems nouveaux ou changés d'état (rechargement de l'inventaire)"""
+        with self._lock:
+            known = set(self._entries)
+            for modem_id in known - {modem['id'] for modem in modems}:
+                del self._entries[modem_id]
+        
+        for modem in modems:
+            if modem.get('status') == 'ready':
+                self.get(modem)
+    
+    def _probe(self, modem_id: str) -> Dict[str, Any]:
+        capabilities = {'supported_storages': [], 'default_storage': None, 'messaging_ready': False}
+        
+        try:
+            capabilities.update(self.backend.get_messaging_capabilities(modem_id))
+        except ModemBackendTimeout:
+            logger.warning(f"Timeout lors de la lecture des capacités SMS du modem {modem_id}")
+            capabilities['timed_out'] = True
+        except ModemBackendError as e:
+            logger.warning(f"Capacités SMS du modem {modem_id} indisponibles: {str(e)}")
+            capabilities['error'] = str(e)
+        
+        capabilities['max_segments'] = self.max_segments
+        capabilities['probed_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        
+        logger.debug(f"Capacités SMS du modem {modem_id}: {capabilities}")
+        return capabilities
+    
+    def peek(self, modem_id: str) -> Optional[Dict[str, Any]]:
+        """Capacités en cache, sans jamais interroger le modem"""
+        with self._lock:
+            entry = self._entries.get(modem_id)
+            return dict(entry[1]) if entry else None
+    
+    def invalidate(self, modem_id: str):
+        """Force une relecture au prochain rechargement de l'inventaire"""
+        with self._lock:
+            self._entries.pop(modem_id, None)
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {modem_id: dict(entry[1]) for modem_id, entry in self._entries.items()}
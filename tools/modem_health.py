@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Santé des modems et disjoncteurs pour send_sms_mmcli.py
+
+Chaque modem reçoit un score calculé sur la qualité du signal, le taux de
+succès récent, la latence d'envoi (p95) et le nombre d'envois en cours.
+Après plusieurs échecs consécutifs, le disjoncteur du modem s'ouvre: il est
+écarté de la sélection, puis un seul envoi d'essai lui est confié une fois
+le délai de repos écoulé. Le délai double à chaque essai raté.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'envois récents conservés par modem
+DEFAULT_WINDOW = int(os.environ.get('SMS_MODEM_HEALTH_WINDOW', 50))
+# Échecs consécutifs avant d'écarter un modem, et délai avant le premier essai (s)
+DEFAULT_FAILURE_THRESHOLD = int(os.environ.get('SMS_BREAKER_FAILURES', 3))
+DEFAULT_COOLDOWN = float(os.environ.get('SMS_BREAKER_COOLDOWN', 30))
+MAX_COOLDOWN = 600.0
+# Latence p95 (s) pour laquelle le critère de latence vaut 0.5
+LATENCY_REFERENCE = 5.0
+
+# Poids des critères du score (total 1)
+SCORE_WEIGHTS = {'success': 0.4, 'signal': 0.2, 'latency': 0.2, 'load': 0.2}
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """Disjoncteur d'un modem: fermé, ouvert (écarté) ou semi-ouvert (essai en cours)"""
+    
+    def __init__(self, failure_threshold: int, cooldown: float, max_cooldown: float = MAX_COOLDOWN):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.changed_at = time.monotonic()
+    
+    def available(self, now: float) -> bool:
+        """Indique si le modem peut recevoir un envoi, sans changer d'état"""
+        if self.state == BREAKER_CLOSED:
+            return True
+        # Ouvert: repos écoulé; semi-ouvert: l'essai n'a jamais rendu de résultat
+        return now - self.changed_at >= self.cooldown
+    
+    def allow(self, now: float) -> bool:
+        """Comme available(), mais réserve l'envoi d'essai d'un modem écarté"""
+        if not self.available(now):
+            return False
+        if self.state != BREAKER_CLOSED:
+            self.state = BREAKER_HALF_OPEN
+            self.changed_at = now
+        return True
+    
+    def retry_in(self, now: float) -> float:
+        if self.state == BREAKER_CLOSED:
+            return 0.0
+        return max(0.0, self.cooldown - (now - self.changed_at))
+    
+    def release(self, now: float):
+        """L'envoi réservé n'a pas utilisé le modem: l'essai reste disponible, sans résultat"""
+        if self.state == BREAKER_HALF_OPEN:
+            self.state = BREAKER_OPEN
+            self.changed_at = now - self.cooldown
+    
+    def record(self, success: bool, now: float) -> Optional[str]:
+        """Enregistre un résultat; retourne 'opened' ou 'closed' si l'état a changé"""
+        if success:
+            self.failures = 0
+            if self.state == BREAKER_CLOSED:
+                return None
+            self.state = BREAKER_CLOSED
+            self.cooldown = self.base_cooldown
+            self.changed_at = now
+            return 'closed'
+        
+        self.failures += 1
+        
+        if self.state == BREAKER_HALF_OPEN:
+            # Essai raté: repos plus long avant le suivant
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        elif self.state == BREAKER_CLOSED and self.failures < self.failure_threshold:
+            return None
+        
+        opened = self.state != BREAKER_OPEN
+        self.state = BREAKER_OPEN
+        self.changed_at = now
+        return 'opened' if opened else None
+
+class ModemHealth:
+    """Historique récent d'un modem"""
+    
+    def __init__(self, window: int, breaker: CircuitBreaker):
+        self.outcomes = deque(maxlen=window)  # (succès, durée en secondes)
+        self.in_flight = 0
+        self.breaker = breaker
+        self.last_error = None
+    
+    def success_rate(self) -> float:
+        """Taux de succès lissé: un modem sans historique vaut 0.5, pas 0 ni 1"""
+        successes = sum(1 for success, _ in self.outcomes if success)
+        return (successes + 1) / (len(self.outcomes) + 2)
+    
+    def latency_p95(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        durations = sorted(duration for _, duration in self.outcomes)
+        return durations[min(len(durations) - 1, int(0.95 * len(durations)))]
+
+class HealthTracker:
+    """Suivi de santé de tous les modems d'un processus d'envoi"""
+    
+    def __init__(self, window: int = None, failure_threshold: int = None, cooldown: float = None):
+        self.window = window or DEFAULT_WINDOW
+        self.failure_threshold = failure_threshold or DEFAULT_FAILURE_THRESHOLD
+        self.cooldown = DEFAULT_COOLDOWN if cooldown is None else cooldown
+        self._modems = {}
+        self._lock = threading.Lock()
+    
+    def _health(self, modem_id: str) -> ModemHealth:
+        health = self._modems.get(modem_id)
+        if health is None:
+            health = ModemHealth(self.window, CircuitBreaker(self.failure_threshold, self.cooldown))
+            self._modems[modem_id] = health
+        return health
+    
+    def begin(self, modem_id: str):
+        """Un envoi commence (ou attend son tour) sur ce modem"""
+        with self._lock:
+            self._health(modem_id).in_flight += 1
+    
+    def end(self, modem_id: str, success: bool, duration: float, error: str = None):
+        """Un envoi est terminé: met à jour l'historique et le disjoncteur"""
+        with self._lock:
+            health = self._health(modem_id)
+            health.in_flight = max(0, health.in_flight - 1)
+            health.outcomes.append((success, duration))
+            if not success:
+                health.last_error = error
+            
+            transition = health.breaker.record(success, time.monotonic())
+        
+        if transition == 'opened':
+            logger.warning(f"Modem {modem_id} écarté après {health.breaker.failures} échec(s), "
+                           f"nouvel essai dans {health.breaker.cooldown:.0f}s: {error}")
+        elif transition == 'closed':
+            logger.info(f"Modem {modem_id} réintégré après un envoi réussi")
+    
+    def cancel(self, modem_id: str):
+        """Un envoi s'arrête sans avoir été jugé sur le modem: ni succès ni échec"""
+        with self._lock:
+            health = self._health(modem_id)
+            health.in_flight = max(0, health.in_flight - 1)
+            health.breaker.release(time.monotonic())
+    
+    def in_flight(self, modem_id: str) -> int:
+        """Envois en cours ou en attente sur ce modem"""
+        with self._lock:
+            health = self._modems.get(modem_id)
+            return health.in_flight if health else 0
+    
+    def available(self, modem_id: str) -> bool:
+        with self._lock:
+            return self._health(modem_id).breaker.available(time.monotonic())
+    
+    def allow(self, modem_id: str) -> bool:
+        """Indique si un envoi peut partir sur ce modem (réserve l'essai d'un modem écarté)"""
+        with self._lock:
+            return self._health(modem_id).breaker.allow(time.monotonic())
+    
+    def retry_in(self, modem_id: str) -> float:
+        with self._lock:
+            return self._health(modem_id).breaker.retry_in(time.monotonic())
+    
+    def score(self, modem: Dict[str, Any]) -> float:
+        """Score entre 0 et 1, le plus élevé est le meilleur"""
+        with self._lock:
+            return self._score(modem, self._health(modem['id']))
+    
+    def _score(self, modem: Dict[str, Any], health: ModemHealth) -> float:
+        signal = min(100, max(0, modem.get('signal_quality') or 0)) / 100
+        p95 = health.latency_p95()
+        latency = 1.0 if p95 is None else LATENCY_REFERENCE / (LATENCY_REFERENCE + p95)
+        load = 1.0 / (1 + health.in_flight)
+        
+        return (SCORE_WEIGHTS['success'] * health.success_rate()
+                + SCORE_WEIGHTS['signal'] * signal
+                + SCORE_WEIGHTS['latency'] * latency
+                + SCORE_WEIGHTS['load'] * load)
+    
+    def select(self, modems: List[Dict[str, Any]]) -> Optional[str]:
+        """Retourne l'ID du modem au meilleur score parmi ceux non écartés"""
+        with self._lock:
+            now = time.monotonic()
+            ranked = sorted(modems, key=lambda modem: self._score(modem, self._health(modem['id'])),
+                            reverse=True)
+            for modem in ranked:
+                if self._health(modem['id']).breaker.allow(now):
+                    return modem['id']
+        return None
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                modem_id: {
+                    'state': health.breaker.state,
+                    'success_rate': round(health.success_rate(), 3),
+                    'latency_p95': round(health.latency_p95(), 3) if health.outcomes else None,
+                    'in_flight': health.in_flight,
+                    'samples': len(health.outcomes),
+                    'consecutive_failures': health.breaker.failures,
+                    'retry_in': round(health.breaker.retry_in(now), 1),
+                    'last_error': health.last_error
+                }
+                for modem_id, health in self._modems.items()
+            }
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Inventaire des modems avec cache à durée de vie limitée
+Partagé par send_sms_mmcli.py et receive_sms_mmcli.py
+
+Évite de relancer la découverte complète (liste + infos de chaque modem)
+à chaque SMS: l'inventaire est rechargé quand il expire, ou tout de suite
+quand un envoi échoue parce qu'un modem a disparu ou changé d'état.
+Un seul rechargement à la fois, hors verrou: les lectures du cache (métriques,
+peek, cached) ne l'attendent jamais. Les fonctions enregistrées par
+add_listener() reçoivent les modems après chaque rechargement.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, Optional, List, Callable
+
+from mm_backend import ModemBackend, ModemBackendTimeout
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = float(os.environ.get('SMS_MODEM_CACHE_TTL', 60))
+# Nombre de modems interrogés en parallèle et délai global d'une découverte
+DEFAULT_PROBE_WORKERS = int(os.environ.get('SMS_MODEM_PROBE_WORKERS', 8))
+DEFAULT_DISCOVERY_TIMEOUT = float(os.environ.get('SMS_MODEM_DISCOVERY_TIMEOUT', 15))
+
+# Champs conservés pour chaque modem
+RECORD_FIELDS = ('id', 'device_path', 'imei', 'operator', 'signal_quality', 'status', 'state',
+                 'probe_ms')
+
+def device_keys(device_path: str) -> List[str]:
+    """Formes équivalentes d'un chemin: 'ttyUSB2', '/dev/ttyUSB2'"""
+    name = os.path.basename(device_path.rstrip('/'))
+    return list(dict.fromkeys([device_path, name, '/dev/' + name]))
+
+class ModemInventory:
+    """Cache des modems connus de ModemManager, indexé par ID et par périphérique"""
+    
+    def __init__(self, backend: ModemBackend, ttl: float = None, miss_refresh_interval: float = 5.0,
+                 probe_workers: int = None, discovery_timeout: float = None):
+        self.backend = backend
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.probe_workers = probe_workers or DEFAULT_PROBE_WORKERS
+        self.discovery_timeout = discovery_timeout or DEFAULT_DISCOVERY_TIMEOUT
+        # Résultat de la dernière découverte: {modem_id: {'probe_ms', 'timed_out'}}
+        self.last_probe = {}
+        # Délai minimal entre deux rechargements déclenchés par un périphérique inconnu
+        self.miss_refresh_interval = miss_refresh_interval
+        self._modems = {}
+        self._by_device = {}
+        self._loaded_at = None
+        self._lock = threading.RLock()
+        # Rechargement en cours: les autres appelants attendent son résultat
+        self._refreshing = False
+        self._refreshed = threading.Condition(self._lock)
+        # Sondes partagées par tous les rechargements: au plus probe_workers threads,
+        # même si des sondes restent bloquées au-delà du délai de découverte
+        self._executor = None
+        self._listeners = []
+    
+    def add_listener(self, listener: Callable[[List[Dict[str, Any]]], None]):
+        """Appelle listener(modems) après chaque rechargement (thread qui a rechargé)"""
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def is_fresh(self) -> bool:
+        """Indique si l'inventaire est chargé et non expiré"""
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+    
+    def refresh(self) -> List[Dict[str, Any]]:
+        """Recharge l'inventaire depuis le backend (modems interrogés en parallèle)
+        
+        Si un rechargement est déjà en cours, attend son résultat au lieu
+        d'en lancer un second. Le verrou n'est pris que pour publier le résultat.
+        """
+        with self._lock:
+            if self._refreshing:
+                while self._refreshing:
+                    self._refreshed.wait()
+                return self._snapshot()
+            self._refreshing = True
+        
+        try:
+            modems = {}
+            by_device = {}
+            
+            for modem_id, info in self._probe_all(self.backend.list_modems()):
+                record = {key: info[key] for key in RECORD_FIELDS if key in info}
+                modems[modem_id] = record
+                
+                if record.get('device_path'):
+                    for key in device_keys(record['device_path']):
+                        by_device[key] = modem_id
+            
+            with self._lock:
+                self._modems = modems
+                self._by_device = by_device
+                self._loaded_at = time.monotonic()
+                snapshot = self._snapshot()
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._refreshed.notify_all()
+                listeners = list(self._listeners)
+        
+        logger.debug(f"Inventaire des modems rechargé: {len(modems)} modem(s)")
+        for listener in listeners:
+            try:
+                listener([dict(record) for record in snapshot])
+            except Exception as e:
+                logger.warning(f"Erreur après le rechargement de l'inventaire: {str(e)}")
+        return snapshot
+    
+    def _probe_all(self, modem_ids: List[str]) -> List[tuple]:
+        """Interroge tous les modems en même temps, dans la limite du délai global
+        
+        Les modems qui ne répondent pas à temps sont écartés de ce chargement:
+        un modem bloqué ne retarde plus la découverte des autres.
+        """
+        last_probe = {}
+        if not modem_ids:
+            self.last_probe = last_probe
+            return []
+        
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.probe_workers, thread_name_prefix='modem-probe')
+        
+        futures = {self._executor.submit(self._timed_probe, modem_id): modem_id
+                   for modem_id in modem_ids}
+        done, not_done = wait(futures, timeout=self.discovery_timeout)
+        
+        results = []
+        for future in done:
+            modem_id = futures[future]
+            info, probe_ms = future.result()
+            last_probe[modem_id] = {'probe_ms': probe_ms, 'timed_out': False}
+            if info:
+                info['probe_ms'] = probe_ms
+                results.append((modem_id, info))
+        
+        # Sonde pas encore lancée: annulée; sonde bloquée: finira sur son propre timeout
+        for future in not_done:
+            modem_id = futures[future]
+            future.cancel()
+            last_probe[modem_id] = {'probe_ms': None, 'timed_out': True}
+            logger.warning(f"Modem {modem_id} ignoré: pas de réponse en {self.discovery_timeout}s")
+        
+        self.last_probe = last_probe
+        
+        # Ordre stable, comme la liste renvoyée par ModemManager
+        order = {modem_id: index for index, modem_id in enumerate(modem_ids)}
+        results.sort(key=lambda item: order[item[0]])
+        return results
+    
+    def _timed_probe(self, modem_id: str) -> tuple:
+        start = time.perf_counter()
+        info = self._probe(modem_id)
+        return info, round((time.perf_counter() - start) * 1000, 1)
+    
+    def _probe(self, modem_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.backend.get_modem_info(modem_id)
+        except ModemBackendTimeout:
+            logger.warning(f"Timeout lors de la récupération des infos du modem {modem_id}")
+            return None
+        except Exception as e:
+            logger.warning(f"Erreur lors de la récupération des infos du modem {modem_id}: {str(e)}")
+            return None
+    
+    def modems(self, force: bool = False) -> List[Dict[str, Any]]:
+        """Retourne les modems connus, en rechargeant si nécessaire"""
+        with self._lock:
+            if not force and self.is_fresh():
+                return self._snapshot()
+        return self.refresh()
+    
+    def get(self, modem_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne l'enregistrement d'un modem par son ID"""
+        if not self.is_fresh():
+            self.refresh()
+        with self._lock:
+            record = self._modems.get(modem_id)
+            return dict(record) if record else None
+    
+    def peek(self, modem_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne l'enregistrement en cache sans jamais recharger"""
+        record = self._modems.get(modem_id)
+        return dict(record) if record else None
+    
+    def cached(self) -> List[Dict[str, Any]]:
+        """Retourne les modems en cache sans jamais recharger (ex: métriques)"""
+        with self._lock:
+            return self._snapshot()
+    
+    def find_by_device(self, device_path: str) -> Optional[str]:
+        """Retourne l'ID du modem associé à un chemin de périphérique (O(1))"""
+        if not self.is_fresh():
+            self.refresh()
+        
+        with self._lock:
+            modem_id = self._lookup_device(device_path)
+            loaded_at = self._loaded_at
+        
+        # Périphérique inconnu: peut-être un modem branché depuis le dernier chargement
+        if modem_id is None and loaded_at is not None \
+                and time.monotonic() - loaded_at >= self.miss_refresh_interval:
+            self.refresh()
+            with self._lock:
+                modem_id = self._lookup_device(device_path)
+        
+        return modem_id
+    
+    def _lookup_device(self, device_path: str) -> Optional[str]:
+        modem_id = self._by_device.get(device_path)
+        if modem_id is None:
+            for key in device_keys(device_path):
+                modem_id = self._by_device.get(key)
+                if modem_id is not None:
+                    break
+        return modem_id
+    
+    def invalidate(self, reason: str = None):
+        """Force un rechargement au prochain accès"""
+        with self._lock:
+            if self._loaded_at is not None and reason:
+                logger.info(f"Inventaire des modems invalidé: {reason}")
+            self._loaded_at = None
+    
+    def close(self):
+        """Arrête les threads de sonde (les sondes en cours finissent sur leur timeout)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
+    def _snapshot(self) -> List[Dict[str, Any]]:
+        return [dict(record) for record in self._modems.values()]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Correspondance périphérique -> modems.id pour les SMS reçus
+Utilisé par receive_sms_mmcli.py
+
+La table modems est chargée en une requête au démarrage puis gardée en
+mémoire: plus de SELECT par modem à chaque cycle. Un périphérique absent de
+la correspondance (modem branché depuis, port ttyUSB changé) la fait
+recharger; s'il reste inconnu, le modem est déclaré par un seul
+INSERT ... ON DUPLICATE KEY UPDATE avec son IMEI et son opérateur, pour
+que chaque SMS reçu soit rattaché à un modem. La correspondance est aussi
+rechargée toutes les ttl secondes (modems modifiés depuis l'interface).
+Les requêtes sont faites hors verrou: il ne protège que la publication de
+la correspondance, une lecture n'attend jamais la base.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+from db_pool import ConnectionPool, DatabaseError
+from modem_inventory import device_keys
+
+logger = logging.getLogger(__name__)
+
+# Durée (s) de validité de la correspondance chargée depuis la table modems
+DEFAULT_TTL = float(os.environ.get('SMS_RECEIVE_MODEM_MAP_TTL', 300))
+# Délai minimal entre deux rechargements déclenchés par un périphérique inconnu
+MISS_RELOAD_INTERVAL = 5.0
+
+# Modem déclaré inactif: il n'est utilisé pour l'envoi qu'une fois activé depuis l'interface.
+# LAST_INSERT_ID(id): lastrowid donne aussi l'ID d'un modem déjà présent, sans second SELECT
+REGISTER_QUERY = (
+    "INSERT INTO modems (name, device_path, imei, operator, is_active) VALUES (%s, %s, %s, %s, FALSE) "
+    "ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id), imei = COALESCE(VALUES(imei), imei), "
+    "operator = COALESCE(VALUES(operator), operator)"
+)
+
+class ModemRegistry:
+    """Cache des IDs de la table modems, indexé par chemin de périphérique"""
+    
+    def __init__(self, pool: ConnectionPool, ttl: float = None):
+        self.pool = pool
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.stats = {'loads': 0, 'registered': 0}
+        self._by_device = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+    
+    def load(self) -> int:
+        """Recharge toute la correspondance en une requête; retourne le nombre de modems"""
+        rows = self.pool.run('load_modems', lambda session: session.fetch_all(
+            "SELECT id, device_path FROM modems"))
+        
+        by_device = {}
+        # Formes équivalentes du chemin ('ttyUSB2', '/dev/ttyUSB2'), le chemin exact l'emportant
+        for modem_id, device_path in rows:
+            for key in device_keys(device_path):
+                by_device.setdefault(key, modem_id)
+        for modem_id, device_path in rows:
+            by_device[device_path] = modem_id
+        
+        with self._lock:
+            self._by_device = by_device
+            self._loaded_at = time.monotonic()
+            self.stats['loads'] += 1
+        
+        logger.debug(f"Modem mapping loaded: {len(rows)} modem(s)")
+        return len(rows)
+    
+    def _lookup(self, device_path: str) -> Optional[int]:
+        modem_id = self._by_device.get(device_path)
+        if modem_id is None:
+            for key in device_keys(device_path):
+                modem_id = self._by_device.get(key)
+                if modem_id is not None:
+                    break
+        return modem_id
+    
+    def _reload(self) -> bool:
+        try:
+            self.load()
+            return True
+        except DatabaseError as e:
+            # Correspondance précédente gardée: nouvel essai au prochain appel
+            logger.warning(f"Could not load modem mapping: {e}")
+            return False
+    
+    def invalidate(self):
+        """Force le rechargement au prochain appel (modem supprimé de la table)"""
+        with self._lock:
+            self._loaded_at = None
+    
+    def get_id(self, modem: Dict[str, Any]) -> Optional[int]:
+        """ID en base du modem (enregistrement de l'inventaire), déclaré au besoin"""
+        device_path = modem.get('device_path')
+        if not device_path:
+            return None
+        
+        if self._age() >= self.ttl:
+            self._reload()
+        
+        with self._lock:
+            modem_id = self._lookup(device_path)
+        
+        # Périphérique inconnu: peut-être un modem déclaré depuis le dernier chargement
+        if modem_id is None and self._age() >= MISS_RELOAD_INTERVAL:
+            self._reload()
+            with self._lock:
+                modem_id = self._lookup(device_path)
+        
+        # Base injoignable: ID retrouvé au rejeu du journal (device_path)
+        if modem_id is None and self.pool.available():
+            modem_id = self.register(modem)
+        return modem_id
+    
+    def _age(self) -> float:
+        """Âge (s) de la correspondance, infini tant qu'elle n'a pas été chargée"""
+        with self._lock:
+            if self._loaded_at is None:
+                return float('inf')
+            return time.monotonic() - self._loaded_at
+    
+    def register(self, modem: Dict[str, Any]) -> Optional[int]:
+        """Déclare un modem absent de la table (upsert sur device_path) et retourne son ID"""
+        name = os.path.basename(modem['device_path'].rstrip('/'))
+        device_path = '/dev/' + name if not modem['device_path'].startswith('/') else modem['device_path']
+        
+        params = (f"Modem {name}", device_path, modem.get('imei'), modem.get('operator'))
+        try:
+            modem_id = self.pool.run('register_modem', lambda session: session.insert(REGISTER_QUERY, params))
+        except DatabaseError as e:
+            logger.error(f"Could not register modem {device_path}: {e}")
+            return None
+        
+        if modem_id is not None:
+            with self._lock:
+                for key in device_keys(device_path) + [modem['device_path']]:
+                    self._by_device[key] = modem_id
+                self.stats['registered'] += 1
+            logger.info(f"Registered modem {device_path} (IMEI {modem.get('imei') or 'unknown'}, "
+                        f"operator {modem.get('operator') or 'unknown'}) as modem #{modem_id}")
+        return modem_id
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, devices=len(self._by_device), ttl=self.ttl)
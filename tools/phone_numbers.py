@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Normalisation et validation des numéros de téléphone au format E.164
+Utilisé par send_sms_mmcli.py; mêmes règles que app/Services/PhoneNumber.php
+
+- séparateurs supprimés ('06 12-34.56.78' -> '0612345678')
+- préfixe international 00 remplacé par +
+- format national (0 initial) complété avec l'indicatif par défaut:
+  '0612345678' -> '+212612345678'
+- longueur vérifiée par indicatif pays quand il est connu, sinon règle
+  E.164 générique (7 à 15 chiffres)
+
+Les motifs sont compilés une fois et les derniers numéros vus sont gardés
+dans un cache LRU: valider un fichier d'un million de contacts prend
+quelques secondes.
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import argparse
+from functools import lru_cache
+from typing import Dict, Any, Optional, Iterable, Iterator, Tuple
+
+DEFAULT_COUNTRY_CODE = os.environ.get('SMS_DEFAULT_COUNTRY_CODE', '212').lstrip('+')
+CACHE_SIZE = int(os.environ.get('SMS_PHONE_CACHE_SIZE', 65536))
+
+# Longueur (min, max) du numéro national, sans indicatif ni 0 initial
+COUNTRY_CODES = {
+    '1': (10, 10), '7': (10, 10), '20': (10, 10), '27': (9, 9), '30': (10, 10),
+    '31': (9, 9), '32': (8, 9), '33': (9, 9), '34': (9, 9), '39': (6, 11),
+    '40': (9, 9), '41': (9, 9), '43': (4, 13), '44': (10, 10), '45': (8, 8),
+    '46': (7, 13), '47': (8, 8), '48': (9, 9), '49': (6, 13), '90': (10, 10),
+    '212': (9, 9), '213': (9, 9), '216': (8, 8), '218': (8, 9), '221': (9, 9),
+    '222': (8, 8), '223': (8, 8), '225': (10, 10), '226': (8, 8), '227': (8, 8),
+    '228': (8, 8), '229': (8, 10), '237': (9, 9), '241': (7, 8), '242': (9, 9),
+    '243': (9, 9), '261': (9, 9), '351': (9, 9), '352': (4, 11), '961': (7, 8),
+    '966': (9, 9), '971': (8, 9), '974': (8, 8)
+}
+
+SEPARATORS_PATTERN = re.compile(r'[\s\-\.\(\)/]')
+DIGITS_PATTERN = re.compile(r'^\+?\d+$')
+E164_PATTERN = re.compile(r'^\+[1-9]\d{6,14}$')
+
+def country_code(number: str) -> Optional[str]:
+    """Indicatif d'un numéro E.164 s'il figure dans la table ('+212612...' -> '212')"""
+    digits = number.lstrip('+')
+    for length in (1, 2, 3):
+        code = digits[:length]
+        if code in COUNTRY_CODES:
+            return code
+    return None
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize(raw: str, default_country: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """Retourne le numéro au format E.164, ou None s'il est invalide"""
+    if not raw:
+        return None
+    
+    number = SEPARATORS_PATTERN.sub('', raw)
+    if not DIGITS_PATTERN.match(number):
+        return None
+    
+    if number.startswith('00'):
+        number = '+' + number[2:]
+    elif number.startswith('0'):
+        number = '+' + default_country + number[1:]
+    elif not number.startswith('+'):
+        number = '+' + number
+    
+    if not E164_PATTERN.match(number):
+        return None
+    
+    code = country_code(number)
+    if code:
+        minimum, maximum = COUNTRY_CODES[code]
+        if not minimum <= len(number) - 1 - len(code) <= maximum:
+            return None
+    
+    return number
+
+def is_valid(raw: str, default_country: str = DEFAULT_COUNTRY_CODE) -> bool:
+    return normalize(raw, default_country) is not None
+
+def validate_bulk(numbers: Iterable[str],
+                  default_country: str = DEFAULT_COUNTRY_CODE) -> Iterator[Tuple[str, Optional[str]]]:
+    """Génère (numéro brut, numéro E.164 ou None) pour chaque numéro"""
+    for raw in numbers:
+        yield raw, normalize(raw.strip(), default_country)
+
+def validate_file(path: str, column: int = 0, default_country: str = DEFAULT_COUNTRY_CODE,
+                  output=None) -> Dict[str, Any]:
+    """Valide la colonne d'un fichier CSV, en flux
+    
+    Une première ligne invalide est considérée comme un en-tête. Si output
+    est fourni, chaque numéro valide et unique y est écrit au format E.164.
+    """
+    stats = {'lines': 0, 'valid': 0, 'invalid': 0, 'duplicates': 0, 'header': False, 'errors': []}
+    seen = set()
+    
+    with open(path, 'r', encoding='utf-8', newline='') as source:
+        reader = csv.reader(source)
+        column_values = (row[column] if len(row) > column else '' for row in reader)
+        
+        for line_number, (raw, number) in enumerate(validate_bulk(column_values, default_country), 1):
+            stats['lines'] += 1
+            if not raw.strip():
+                continue
+            
+            if number is None:
+                if line_number == 1:
+                    stats['header'] = True
+                    continue
+                stats['invalid'] += 1
+                if len(stats['errors']) < 100:
+                    stats['errors'].append({'line': line_number, 'value': raw})
+                continue
+            
+            if number in seen:
+                stats['duplicates'] += 1
+                continue
+            
+            seen.add(number)
+            stats['valid'] += 1
+            if output:
+                output.write(number + '\n')
+    
+    return stats
+
+def main():
+    """Valide un fichier CSV de contacts et affiche un résumé JSON"""
+    parser = argparse.ArgumentParser(description='Normalisation E.164 de numéros de téléphone')
+    parser.add_argument('file', help='Fichier CSV de contacts')
+    parser.add_argument('--column', type=int, default=0, help='Colonne des numéros (défaut: 0)')
+    parser.add_argument('--country', default=DEFAULT_COUNTRY_CODE,
+                        help=f'Indicatif des numéros nationaux (défaut: {DEFAULT_COUNTRY_CODE})')
+    parser.add_argument('--output', '-o', help='Écrire les numéros valides et uniques dans ce fichier')
+    args = parser.parse_args()
+    
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+    try:
+        stats = validate_file(args.file, args.column, args.country.lstrip('+'), output)
+    finally:
+        if output:
+            output.close()
+    
+    print(json.dumps(stats, indent=2, ensure_ascii=False))
+    sys.exit(0 if stats['valid'] else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Limitation de débit par modem (seau à jetons adaptatif)
+Utilisé par send_sms_mmcli.py en mode démon (--serve) et lot (--batch)
+
+Chaque modem a son propre seau: un modem sain envoie à son débit réel au lieu
+d'une pause fixe, et un modem que l'opérateur bride ralentit tout seul.
+Le débit baisse de moitié quand les envois échouent ou deviennent lents, puis
+remonte progressivement après des envois réussis (AIMD).
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = float(os.environ.get('SMS_MODEM_RATE', 1.0))      # SMS par seconde et par modem
+DEFAULT_BURST = float(os.environ.get('SMS_MODEM_BURST', 3))      # envois consécutifs sans attente
+# Débits par opérateur: "Orange=0.5:2,inwi=1:3" (débit:rafale), appliqués aux modems de cet opérateur
+DEFAULT_OPERATOR_RATES = os.environ.get('SMS_OPERATOR_RATES', '')
+# Au-delà de cette durée (s), un envoi réussi est considéré comme lent
+DEFAULT_SLOW_THRESHOLD = float(os.environ.get('SMS_SLOW_SEND_THRESHOLD', 10))
+
+def check_rate(rate: float, name: str = 'Débit') -> float:
+    """Vérifie qu'un débit est strictement positif (ValueError sinon)"""
+    if not rate > 0:
+        raise ValueError(f"{name} invalide: {rate} (SMS/s, doit être strictement positif)")
+    return rate
+
+def parse_operator_rates(spec: str) -> Dict[str, tuple]:
+    """'Orange=0.5:2,inwi=1' -> {'orange': (0.5, 2.0), 'inwi': (1.0, None)}
+    
+    Lève ValueError pour un débit nul ou négatif (le modem n'enverrait plus rien).
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        rate, _, burst = value.partition(':')
+        try:
+            parsed = (float(rate), float(burst) if burst else None)
+        except ValueError:
+            logger.warning(f"Débit opérateur ignoré (format nom=débit[:rafale]): {item}")
+            continue
+        rates[name.strip().lower()] = (check_rate(parsed[0], f"Débit de l'opérateur {name.strip()}"), parsed[1])
+    return rates
+
+class TokenBucket:
+    """Seau à jetons: rate jetons par seconde, au plus burst jetons en réserve"""
+    
+    def __init__(self, rate: float, burst: float):
+        self.rate = check_rate(rate)
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def acquire(self) -> float:
+        """Prend un jeton, en attendant si nécessaire; retourne l'attente en secondes"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = (1.0 - self.tokens) / self.rate
+            
+            time.sleep(delay)
+            waited += delay
+
+class AdaptiveTokenBucket(TokenBucket):
+    """Seau dont le débit s'adapte au comportement du modem"""
+    
+    def __init__(self, rate: float, burst: float, min_rate: float = None,
+                 decrease_factor: float = 0.5, increase_step: float = None):
+        super().__init__(rate, burst)
+        self.max_rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.decrease_factor = decrease_factor
+        # Remontée additive: le débit nominal est retrouvé après ~10 succès
+        self.increase_step = increase_step or rate / 10
+    
+    def record(self, success: bool, slow: bool = False):
+        with self._lock:
+            self._refill(time.monotonic())
+            if not success or slow:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+class SendRateLimiter:
+    """Un seau adaptatif par modem, paramétré par opérateur si configuré"""
+    
+    def __init__(self, rate: float = None, burst: float = None, operator_rates: Dict[str, tuple] = None,
+                 slow_threshold: float = None):
+        self.rate = check_rate(DEFAULT_RATE if rate is None else rate, 'Débit par modem')
+        self.burst = burst or DEFAULT_BURST
+        self.operator_rates = operator_rates if operator_rates is not None \
+            else parse_operator_rates(DEFAULT_OPERATOR_RATES)
+        for operator, (operator_rate, _) in self.operator_rates.items():
+            check_rate(operator_rate, f"Débit de l'opérateur {operator}")
+        self.slow_threshold = slow_threshold or DEFAULT_SLOW_THRESHOLD
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def _bucket(self, modem_id: str, operator: Optional[str]) -> AdaptiveTokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(modem_id)
+            if bucket is None:
+                rate, burst = self.rate, self.burst
+                override = self.operator_rates.get((operator or '').lower())
+                if override:
+                    rate = override[0]
+                    burst = override[1] or burst
+                bucket = AdaptiveTokenBucket(rate, burst)
+                self._buckets[modem_id] = bucket
+            return bucket
+    
+    def acquire(self, modem_id: str, operator: str = None) -> float:
+        """Attend un jeton pour ce modem; retourne l'attente en secondes"""
+        return self._bucket(modem_id, operator).acquire()
+    
+    def record(self, modem_id: str, success: bool, duration: float):
+        """Adapte le débit du modem après un envoi"""
+        bucket = self._buckets.get(modem_id)
+        if bucket is None:
+            return
+        
+        slow = duration > self.slow_threshold
+        previous = bucket.rate
+        bucket.record(success, slow)
+        
+        if bucket.rate < previous:
+            logger.info(f"Débit du modem {modem_id} réduit à {bucket.rate:.3f} SMS/s "
+                        f"({'envoi lent' if success else 'échec'})")
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            modem_id: {'rate': round(bucket.rate, 3), 'max_rate': bucket.max_rate, 'burst': bucket.burst}
+            for modem_id, bucket in list(self._buckets.items())
+        }
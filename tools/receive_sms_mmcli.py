@@ -1,21 +1,31 @@
 #!/usr/bin/env python3
 """
-Script Python pour recevoir des SMS via mmcli (ModemManager)
+Script Python pour recevoir des SMS via ModemManager (D-Bus ou mmcli)
 Utilisé par l'application PHP SMS Gateway pour récupérer les SMS entrants
 """
 
 import sys
 import argparse
-import subprocess
 import json
 import logging
 import time
-import re
 import hashlib
-import mysql.connector
 import os
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime
+
+from mm_backend import (ModemBackend, ModemBackendError, ModemBackendTimeout,
+                        ModemNotFoundError, ModemStateError, get_backend)
+from modem_inventory import ModemInventory
+from sms_watcher import SMSWatcher, DEFAULT_SWEEP_INTERVAL
+from dedup_cache import DedupCache, content_key
+from db_pool import ConnectionPool, Session, DatabaseError, DatabaseUnavailable, ER_NO_REFERENCED_ROW
+from sms_spool import Spool, SpoolError
+from modem_registry import ModemRegistry
+import sms_encoding
+import metrics
 
 # Configuration du logging
 logging.basicConfig(
@@ -24,83 +34,298 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Modems traités en parallèle dans un cycle de réception (un seul thread par modem)
+DEFAULT_WORKERS = int(os.environ.get('SMS_RECEIVE_WORKERS', 4))
+# Écriture groupée des SMS reçus: taille d'un lot et délai maximal avant écriture (s)
+DEFAULT_BATCH_SIZE = int(os.environ.get('SMS_RECEIVE_BATCH_SIZE', 100))
+DEFAULT_BATCH_DELAY = float(os.environ.get('SMS_RECEIVE_BATCH_DELAY', 1.0))
+# Attente maximale (s) du rejeu en tâche de fond après des erreurs inattendues répétées
+FLUSH_MAX_BACKOFF = 60.0
+# Durée (s) au-delà de laquelle un SMS long resté en réception (partie manquante) est enregistré incomplet
+DEFAULT_INCOMPLETE_TIMEOUT = float(os.environ.get('SMS_RECEIVE_INCOMPLETE_TIMEOUT', 600))
+
+INSERT_COLUMNS = ('sender', 'message', 'received_at', 'modem_id', 'message_hash', 'is_unicode', 'parts_count',
+                  'is_incomplete')
+INSERT_ROW = '(' + ', '.join(['%s'] * len(INSERT_COLUMNS)) + ')'
+
 class SMSReceiveError(Exception):
     """Exception personnalisée pour les erreurs de réception SMS"""
     pass
 
 class DatabaseManager:
-    """Gestionnaire de base de données pour les SMS reçus"""
+    """Gestionnaire de base de données pour les SMS reçus
     
-    def __init__(self, config):
+    Les SMS reçus passent par le journal local (sms_spool.py) puis sont
+    écrits en base par lots. Chaque appel emprunte une connexion au pool
+    (vérifiée, reconnectée si besoin); le rejeu du journal est sérialisé
+    pour garder l'ordre de réception.
+    """
+    
+    def __init__(self, config, batch_size: int = None, batch_delay: float = None, spool_dir: str = None):
         self.config = config
-        self.connection = None
+        self.pool = ConnectionPool(config)
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.batch_delay = DEFAULT_BATCH_DELAY if batch_delay is None else batch_delay
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self.stats = {'inserted': 0, 'duplicates': 0, 'rejected': 0}
+        self.spool = Spool(spool_dir)
+        self._spool_error = None
+        # Correspondance périphérique -> modems.id, chargée au démarrage
+        self.modems = ModemRegistry(self.pool)
         self.connect()
     
     def connect(self):
-        """Établit la connexion à la base de données"""
+        """Vérifie que la base de données répond et charge la liste des modems
+        
+        Une base injoignable n'empêche pas le démarrage: les SMS lus sont
+        journalisés et rejoués, la liste des modems chargée, dès que la
+        connexion revient.
+        """
         try:
-            self.connection = mysql.connector.connect(
-                host=self.config['host'],
-                port=self.config['port'],
-                user=self.config['user'],
-                password=self.config['password'],
-                database=self.config['database'],
-                charset='utf8mb4',
-                autocommit=True
-            )
-            logger.debug("Database connection established")
-        except mysql.connector.Error as e:
-            raise SMSReceiveError(f"Database connection failed: {e}")
-    
-    def store_received_sms(self, sender: str, message: str, received_at: datetime, modem_id: int = None) -> bool:
-        """Stocke un SMS reçu en évitant les doublons"""
+            self.pool.check()
+            self.modems.load()
+        except DatabaseError as e:
+            logger.warning(f"Database unavailable at startup ({e}), received SMS will be spooled until it is reachable")
+    
+    def open_spool(self) -> bool:
+        """Ouvre le journal local; les SMS laissés par une exécution précédente seront rejoués
+        
+        Retourne False si le journal est inutilisable (droits, déjà ouvert par
+        un autre processus): les SMS sont alors écrits directement en base, et
+        l'ouverture retentée au cycle suivant.
+        """
+        if self.spool.opened:
+            return True
         try:
-            cursor = self.connection.cursor()
-            
-            # Générer le hash pour la déduplication
-            message_hash = self.generate_message_hash(sender, message, received_at)
-            
-            # Vérifier si le SMS existe déjà (dans les 5 dernières minutes)
-            check_query = """
-                SELECT id FROM received_sms 
-                WHERE sender = %s 
-                AND message_hash = %s 
-                AND received_at BETWEEN %s AND %s
-            """
-            
-            time_window_start = received_at - timedelta(minutes=5)
-            time_window_end = received_at + timedelta(minutes=5)
-            
-            cursor.execute(check_query, (sender, message_hash, time_window_start, time_window_end))
-            
-            if cursor.fetchone():
-                logger.info(f"Duplicate SMS ignored from {sender}")
-                return False
-            
-            # Insérer le nouveau SMS
-            insert_query = """
-                INSERT INTO received_sms (sender, message, received_at, modem_id, message_hash, is_unicode, parts_count)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            is_unicode = self.contains_unicode(message)
-            parts_count = self.calculate_parts_count(message, is_unicode)
-            
-            cursor.execute(insert_query, (
-                sender, message, received_at, modem_id, 
-                message_hash, is_unicode, parts_count
-            ))
-            
-            sms_id = cursor.lastrowid
-            logger.info(f"SMS stored with ID {sms_id} from {sender}")
-            
-            cursor.close()
+            self.spool.open()
+        except SpoolError as e:
+            if self._spool_error != str(e):
+                logger.error(f"{e}; writing received SMS directly to the database")
+            self._spool_error = str(e)
+            return False
+        
+        if self._spool_error:
+            logger.info(f"Spool {self.spool.directory} opened, received SMS are spooled again")
+        self._spool_error = None
+        return True
+    
+    def store_received_sms(self, sender: str, message: str, received_at: datetime, modem_id: int = None,
+                           device_path: str = None, incomplete: bool = False) -> bool:
+        """Ajoute un SMS reçu au journal local; True une fois l'ajout sur disque
+        
+        L'écriture en base suit par lots (dès batch_size SMS en attente ou au
+        plus tard après batch_delay secondes). Les doublons sont écartés à
+        l'insertion par la clé unique unique_sms (sender, message_hash, received_at).
+        Sans modem_id (base injoignable), device_path permet de le retrouver au rejeu.
+        incomplete: SMS long dont une partie n'est jamais arrivée (texte partiel).
+        Journal inutilisable: le SMS est écrit directement en base (False si elle
+        est injoignable, le SMS reste alors sur le modem).
+        """
+        record = {
+            'sender': sender,
+            'message': message,
+            'received_at': received_at.isoformat(),
+            'modem_id': modem_id
+        }
+        if modem_id is None and device_path:
+            record['device_path'] = device_path
+        if incomplete:
+            record['incomplete'] = True
+        
+        if not self.spool.opened:
+            return self._store_direct(record)
+        
+        try:
+            self.spool.append(record)
+        except SpoolError as e:
+            logger.error(f"Could not spool SMS from {sender}: {e}")
+            return self._store_direct(record)
+        
+        if self.spool.pending() >= self.batch_size:
+            self._wakeup.set()
+        return True
+    
+    def _store_direct(self, record: Dict[str, Any]) -> bool:
+        try:
+            self._insert_row(self._row(record))
             return True
-            
-        except mysql.connector.Error as e:
-            logger.error(f"Database error storing SMS: {e}")
+        except DatabaseError as e:
+            logger.error(f"Database error storing SMS from {record['sender']}: {e}")
             return False
     
+    def pending(self) -> int:
+        return self.spool.pending()
+    
+    def _row(self, record: Dict[str, Any]) -> tuple:
+        sender, message = record['sender'], record['message']
+        received_at = datetime.fromisoformat(record['received_at'])
+        is_unicode = self.contains_unicode(message)
+        modem_id = record.get('modem_id')
+        if modem_id is None and record.get('device_path'):
+            modem_id = self.modems.get_id({'device_path': record['device_path']})
+        return (sender, message, received_at, modem_id,
+                self.generate_message_hash(sender, message, received_at),
+                is_unicode, self.calculate_parts_count(message, is_unicode), bool(record.get('incomplete')))
+    
+    def flush(self, wait: bool = True) -> int:
+        """Rejoue le journal en base par lots multi-lignes; retourne le nombre de SMS insérés
+        
+        Le point de reprise du journal n'avance qu'après chaque lot écrit: si
+        la base est injoignable, ou pendant l'attente avant une nouvelle
+        tentative de connexion, les SMS restent dans le journal pour le
+        prochain passage. Un SMS que la base refuse (valeur invalide), comme un
+        enregistrement du journal illisible (champ manquant, date invalide), est
+        mis de côté dans rejected.log. Avec wait=False, rien n'est fait si un
+        rejeu est déjà en cours.
+        """
+        if not self.spool.opened or not self._flush_lock.acquire(blocking=wait):
+            return 0
+        try:
+            inserted = duplicates = 0
+            while self.pool.available():
+                records, position, lines = self.spool.read(self.batch_size)
+                if not lines:
+                    break
+                
+                count = done = rejected = 0
+                try:
+                    records, rows = self._rows(records)
+                    try:
+                        for chunk in self._chunks(rows):
+                            count += self.pool.run('insert_received_sms',
+                                                   lambda session: self._insert_batch(session, chunk))
+                            done += len(chunk)
+                    except DatabaseUnavailable:
+                        raise
+                    except DatabaseError as e:
+                        # Lot refusé (clé étrangère, valeur invalide): repris ligne à ligne
+                        logger.warning(f"Batch of {len(rows) - done} spooled SMS rejected ({e}), "
+                                       f"inserting them one by one")
+                        inserted_rows, rejected = self._insert_rows(records[done:], rows[done:])
+                        count += inserted_rows
+                except DatabaseError as e:
+                    logger.error(f"Database error storing {self.spool.pending()} spooled SMS: {e}")
+                    break
+                
+                self.spool.commit(position, lines)
+                inserted += count
+                duplicates += len(rows) - count - rejected
+            
+            if inserted or duplicates:
+                logger.info(f"Stored {inserted} SMS" + (f", {duplicates} duplicates ignored" if duplicates else ""))
+            return inserted
+        except SpoolError as e:
+            logger.error(f"Spool replay failed: {e}")
+            return 0
+        finally:
+            self._flush_lock.release()
+    
+    def _rows(self, records: List[Any]) -> Tuple[List[Dict[str, Any]], List[tuple]]:
+        # Enregistrement impossible à convertir (journal d'une version précédente,
+        # ligne abîmée): mis de côté pour que le point de reprise puisse avancer
+        kept, rows = [], []
+        for record in records:
+            try:
+                rows.append(self._row(record))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                self.spool.reject(record, f"Invalid spool record: {e!r}")
+                self.stats['rejected'] += 1
+                logger.error(f"Invalid spool record kept in {self.spool.directory}/rejected.log: {e!r}")
+                continue
+            kept.append(record)
+        return kept, rows
+    
+    def _chunks(self, rows: List[tuple]):
+        # Lots pleins puis reste découpé en puissances de deux: au plus
+        # log2(batch_size) + 1 requêtes distinctes, toutes préparées une seule fois
+        start = 0
+        while start < len(rows):
+            remaining = len(rows) - start
+            size = self.batch_size if remaining >= self.batch_size else 1 << (remaining.bit_length() - 1)
+            yield rows[start:start + size]
+            start += size
+    
+    def _insert_rows(self, records: List[Dict[str, Any]], rows: List[tuple]) -> Tuple[int, int]:
+        # Une ligne toujours refusée est mise de côté (rejected.log) pour que le
+        # point de reprise avance; une base injoignable interrompt le rejeu.
+        # Retourne le nombre de lignes insérées et de lignes mises de côté
+        inserted = rejected = 0
+        for record, row in zip(records, rows):
+            try:
+                inserted += self._insert_row(row)
+            except DatabaseUnavailable:
+                raise
+            except DatabaseError as e:
+                self.spool.reject(record, str(e))
+                self.stats['rejected'] += 1
+                rejected += 1
+                logger.error(f"SMS from {record['sender']} rejected by the database ({e}), "
+                             f"kept in {self.spool.directory}/rejected.log")
+        return inserted, rejected
+    
+    def _insert_row(self, row: tuple) -> int:
+        try:
+            return self.pool.run('insert_received_sms', lambda session: self._insert_batch(session, [row]))
+        except DatabaseUnavailable:
+            raise
+        except DatabaseError as e:
+            if e.errno != ER_NO_REFERENCED_ROW or row[3] is None:
+                raise
+        
+        # Modem supprimé depuis le chargement de la correspondance: SMS gardé sans modem
+        logger.warning(f"Modem #{row[3]} no longer exists, storing SMS from {row[0]} without modem")
+        self.modems.invalidate()
+        row = row[:3] + (None,) + row[4:]
+        return self.pool.run('insert_received_sms', lambda session: self._insert_batch(session, [row]))
+    
+    def _insert_batch(self, session: Session, rows: List[tuple]) -> int:
+        # ON DUPLICATE KEY UPDATE id = id plutôt que INSERT IGNORE: seul le doublon
+        # (clé unique_sms) est écarté, une clé étrangère ou une valeur invalide fait
+        # échouer la requête et le lot reste dans le journal. Sans CLIENT_FOUND_ROWS
+        # (db_pool), rowcount compte 1 par ligne insérée et 0 par doublon; la requête
+        # peut être rejouée après une coupure sans créer de doublon
+        query = (f"INSERT INTO received_sms ({', '.join(INSERT_COLUMNS)}) VALUES "
+                 + ', '.join([INSERT_ROW] * len(rows)) + " ON DUPLICATE KEY UPDATE id = id")
+        params = [value for row in rows for value in row]
+        
+        with metrics.DB_WRITE_SECONDS.time(operation='insert_received_sms'):
+            inserted = session.execute(query, params)
+        
+        duplicates = len(rows) - inserted
+        self.stats['inserted'] += inserted
+        self.stats['duplicates'] += duplicates
+        metrics.DEDUP.inc(inserted, stage='database', result='miss')
+        metrics.DEDUP.inc(duplicates, stage='database', result='hit')
+        return inserted
+    
+    def start(self) -> 'DatabaseManager':
+        """Rejoue le journal en tâche de fond, au plus tard batch_delay secondes après un ajout"""
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='received-sms-flush', daemon=True)
+            self._flusher.start()
+        return self
+    
+    def _flush_loop(self):
+        # Une erreur inattendue n'arrête pas le rejeu: nouvel essai après une attente
+        # qui double à chaque échec, sans être écourtée par les ajouts au journal
+        backoff = 0.0
+        while not self._stopping.is_set():
+            if backoff:
+                self._stopping.wait(backoff)
+            else:
+                self._wakeup.wait(self.batch_delay)
+            self._wakeup.clear()
+            try:
+                if self.spool.pending():
+                    self.flush()
+                backoff = 0.0
+            except Exception as e:
+                backoff = min(FLUSH_MAX_BACKOFF, backoff * 2 if backoff else self.batch_delay or 1.0)
+                logger.error(f"Spool replay failed ({e!r}), next attempt in {backoff:g}s")
+    
     def generate_message_hash(self, sender: str, message: str, received_at: datetime) -> str:
         """Génère un hash pour la déduplication"""
         # Arrondir à la minute pour éviter les doublons temporels
@@ -110,130 +335,70 @@ class DatabaseManager:
         return hashlib.sha256(hash_input.encode()).hexdigest()
     
     def contains_unicode(self, text: str) -> bool:
-        """Vérifie si le texte contient des caractères Unicode"""
-        return len(text.encode('utf-8')) != len(text)
+        """Vérifie si le texte sort de l'alphabet GSM 7 bits (encodage UCS-2)"""
+        return sms_encoding.is_unicode(text)
     
-    def calculate_parts_count(self, message: str, is_unicode: bool) -> int:
-        """Calcule le nombre de parties SMS"""
-        max_length = 70 if is_unicode else 160
-        return max(1, (len(message) + max_length - 1) // max_length)
+    def calculate_parts_count(self, message: str, is_unicode: bool = None) -> int:
+        """Calcule le nombre de parties SMS (153 septets / 67 caractères UCS-2 par segment)"""
+        return sms_encoding.count_parts(message)
     
-    def get_modem_id_by_device(self, device_path: str) -> Optional[int]:
-        """Récupère l'ID du modem par son chemin de périphérique"""
-        try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT id FROM modems WHERE device_path = %s", (device_path,))
-            result = cursor.fetchone()
-            cursor.close()
-            return result[0] if result else None
-        except mysql.connector.Error as e:
-            logger.error(f"Error getting modem ID: {e}")
-            return None
+    def get_modem_id(self, modem: Dict[str, Any]) -> Optional[int]:
+        """Récupère l'ID en base d'un modem de l'inventaire (en cache; déclaré s'il est inconnu)"""
+        return self.modems.get_id(modem)
     
     def close(self):
-        """Ferme la connexion à la base de données"""
-        if self.connection:
-            self.connection.close()
+        """Rejoue le journal une dernière fois puis ferme le journal et les connexions à la base de données"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        if self.pending():
+            logger.warning(f"Database unavailable: {self.pending()} received SMS kept in the spool")
+        self.spool.close()
+        self.pool.close()
 
 class SMSReceiver:
     """Classe principale pour la réception de SMS"""
     
-    def __init__(self, db_config):
-        self.db = DatabaseManager(db_config)
-        self.processed_sms = set()  # Cache pour éviter les doublons dans la session
+    def __init__(self, db_config, backend: ModemBackend = None, modem_cache_ttl: float = None,
+                 workers: int = None, spool_dir: str = None, incomplete_timeout: float = None):
+        self.db = DatabaseManager(db_config, spool_dir=spool_dir)
+        self.backend = backend or get_backend()
+        self.inventory = ModemInventory(self.backend, ttl=modem_cache_ttl)
+        self.workers = workers or DEFAULT_WORKERS
+        # SMS déjà traités, reconnus à leur contenu avant toute requête en base
+        self.dedup = DedupCache()
+        # SMS en cours de réception: (modem, SMS) -> premier passage (monotone)
+        self.incomplete_timeout = DEFAULT_INCOMPLETE_TIMEOUT if incomplete_timeout is None else incomplete_timeout
+        self._receiving = {}
+        self._receiving_lock = threading.Lock()
     
-    def find_modems(self) -> List[Dict[str, Any]]:
-        """Trouve tous les modems disponibles"""
+    def find_modems(self, force: bool = False) -> List[Dict[str, Any]]:
+        """Trouve tous les modems disponibles (depuis l'inventaire si encore valide)"""
         try:
-            result = subprocess.run(
-                ['mmcli', '-L'],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode != 0:
-                raise SMSReceiveError(f"Erreur lors de la recherche de modems: {result.stderr}")
-            
-            modems = []
-            for line in result.stdout.split('\n'):
-                if '/org/freedesktop/ModemManager1/Modem/' in line:
-                    match = re.search(r'/Modem/(\d+)', line)
-                    if match:
-                        modem_id = match.group(1)
-                        modem_info = self.get_modem_info(modem_id)
-                        if modem_info:
-                            modems.append(modem_info)
-            
-            return modems
+            return [m for m in self.inventory.modems(force=force) if m.get('device_path')]
         
-        except subprocess.TimeoutExpired:
+        except ModemBackendTimeout:
             raise SMSReceiveError("Timeout lors de la recherche de modems")
+        except ModemBackendError as e:
+            raise SMSReceiveError(f"Erreur lors de la recherche de modems: {str(e)}")
         except Exception as e:
             raise SMSReceiveError(f"Erreur inattendue: {str(e)}")
     
-    def get_modem_info(self, modem_id: str) -> Optional[Dict[str, Any]]:
-        """Récupère les informations d'un modem"""
-        try:
-            result = subprocess.run(
-                ['mmcli', '-m', modem_id],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode != 0:
-                return None
-            
-            info = {'id': modem_id}
-            
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                
-                if 'Primary port:' in line:
-                    match = re.search(r'Primary port:\s*(.+)', line)
-                    if match:
-                        info['device_path'] = match.group(1).strip()
-                
-                elif 'Status |' in line and 'state:' in line:
-                    if 'registered' in line or 'connected' in line:
-                        info['status'] = 'ready'
-                    else:
-                        info['status'] = 'not_ready'
-            
-            return info if info.get('device_path') else None
-            
-        except subprocess.TimeoutExpired:
-            return None
-        except Exception as e:
-            logger.warning(f"Error getting modem info: {str(e)}")
-            return None
-    
     def get_sms_list(self, modem_id: str) -> List[str]:
         """Récupère la liste des SMS sur un modem"""
         try:
-            result = subprocess.run(
-                ['mmcli', '-m', modem_id, '--messaging-list-sms'],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            
-            if result.returncode != 0:
-                return []
+            return self.backend.list_sms(modem_id, timeout=15)
             
-            sms_ids = []
-            for line in result.stdout.split('\n'):
-                if '/org/freedesktop/ModemManager1/SMS/' in line:
-                    match = re.search(r'/SMS/(\d+)', line)
-                    if match:
-                        sms_ids.append(match.group(1))
-            
-            return sms_ids
-            
-        except subprocess.TimeoutExpired:
+        except ModemBackendTimeout:
             logger.warning(f"Timeout getting SMS list for modem {modem_id}")
             return []
+        except (ModemNotFoundError, ModemStateError) as e:
+            logger.warning(f"Modem {modem_id} unavailable: {str(e)}")
+            self.inventory.invalidate(str(e))
+            return []
         except Exception as e:
             logger.warning(f"Error getting SMS list: {str(e)}")
             return []
@@ -241,44 +406,20 @@ class SMSReceiver:
     def get_sms_details(self, sms_id: str) -> Optional[Dict[str, Any]]:
         """Récupère les détails d'un SMS"""
         try:
-            result = subprocess.run(
-                ['mmcli', '-s', sms_id],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            sms_info = self.backend.get_sms(sms_id, timeout=10)
             
-            if result.returncode != 0:
+            if not sms_info or not sms_info.get('sender') or not sms_info.get('message'):
                 return None
             
-            sms_info = {'id': sms_id}
-            
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                
-                if 'Number:' in line:
-                    match = re.search(r'Number:\s*(.+)', line)
-                    if match:
-                        sms_info['sender'] = match.group(1).strip()
-                
-                elif 'Text:' in line:
-                    match = re.search(r'Text:\s*(.+)', line)
-                    if match:
-                        sms_info['message'] = match.group(1).strip()
-                
-                elif 'Timestamp:' in line:
-                    match = re.search(r'Timestamp:\s*(.+)', line)
-                    if match:
-                        timestamp_str = match.group(1).strip()
-                        try:
-                            # Parse timestamp (format peut varier)
-                            sms_info['timestamp'] = self.parse_timestamp(timestamp_str)
-                        except:
-                            sms_info['timestamp'] = datetime.now()
+            try:
+                # Parse timestamp (format peut varier)
+                sms_info['timestamp'] = self.parse_timestamp(sms_info.get('timestamp', ''))
+            except:
+                sms_info['timestamp'] = datetime.now()
             
-            return sms_info if sms_info.get('sender') and sms_info.get('message') else None
+            return sms_info
             
-        except subprocess.TimeoutExpired:
+        except ModemBackendTimeout:
             return None
         except Exception as e:
             logger.warning(f"Error getting SMS details: {str(e)}")
@@ -306,16 +447,9 @@ class SMSReceiver:
     def delete_sms_from_modem(self, modem_id: str, sms_id: str) -> bool:
         """Supprime un SMS de la mémoire du modem"""
         try:
-            result = subprocess.run(
-                ['mmcli', '-m', modem_id, '--messaging-delete-sms', sms_id],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            return result.returncode == 0
+            return self.backend.delete_sms(modem_id, sms_id, timeout=10)
             
-        except subprocess.TimeoutExpired:
+        except ModemBackendTimeout:
             logger.warning(f"Timeout deleting SMS {sms_id}")
             return False
         except Exception as e:
@@ -330,80 +464,218 @@ class SMSReceiver:
         
         logger.info(f"Processing SMS for modem {modem_id} ({device_path})")
         
-        # Récupérer l'ID du modem dans la base de données
-        db_modem_id = self.db.get_modem_id_by_device(device_path)
+        # Récupérer l'ID du modem dans la base de données (en cache)
+        db_modem_id = self.db.get_modem_id(modem)
         
         # Récupérer la liste des SMS
         sms_list = self.get_sms_list(modem_id)
+        metrics.QUEUE_DEPTH.set(len(sms_list), queue='inbox', modem=modem_id)
         
         if not sms_list:
             logger.debug(f"No SMS found on modem {modem_id}")
             return 0
         
         logger.info(f"Found {len(sms_list)} SMS on modem {modem_id}")
+        self._prune_receiving(modem_id, sms_list)
         
         for sms_id in sms_list:
-            try:
-                # Éviter de traiter le même SMS plusieurs fois
-                cache_key = f"{modem_id}_{sms_id}"
-                if cache_key in self.processed_sms:
-                    continue
-                
-                # Récupérer les détails du SMS
-                sms_details = self.get_sms_details(sms_id)
-                
-                if not sms_details:
-                    logger.warning(f"Could not get details for SMS {sms_id}")
-                    continue
+            if self.process_sms(modem_id, sms_id, db_modem_id, device_path):
+                processed_count += 1
+        
+        return processed_count
+    
+    def process_sms(self, modem_id: str, sms_id: str, db_modem_id: int = None,
+                    device_path: str = None) -> Optional[bool]:
+        """Lit, journalise puis supprime un SMS du modem
+        
+        Retourne True s'il a été journalisé pour l'écriture en base, False sinon, None
+        si sa réception n'est pas terminée (à reprendre plus tard). Un SMS long
+        encore en réception après incomplete_timeout secondes est journalisé
+        avec les parties reçues, marqué incomplet, puis supprimé du modem.
+        """
+        try:
+            # Récupérer les détails du SMS
+            sms_details = self.get_sms_details(sms_id)
+            
+            if not sms_details:
+                metrics.SMS_RECEIVED.inc(modem=modem_id, outcome='invalid')
+                logger.warning(f"Could not get details for SMS {sms_id}")
+                return False
+            
+            # SMS sortant: il appartient à send_sms_mmcli.py, qui le supprimera
+            if sms_details.get('pdu_type') == 'submit':
+                logger.debug(f"Outbound SMS {sms_id} skipped")
+                return False
+            
+            # Réception pas encore terminée (parties manquantes): laissé sur le modem,
+            # sauf si la dernière partie n'arrive pas (mémoire du modem occupée sans fin)
+            incomplete = sms_details.get('state') == 'receiving'
+            if incomplete:
+                if not self._receiving_expired(modem_id, sms_id):
+                    logger.debug(f"SMS {sms_id} still being received")
+                    return None
+                logger.warning(f"SMS {sms_id} from {sms_details['sender']} still incomplete after "
+                               f"{self.incomplete_timeout:g}s, storing the parts received so far")
+            
+            # Déjà traité (suppression ratée, relu par le balayage...): seulement le supprimer
+            key = content_key(sms_details['sender'], sms_details['message'], sms_details['timestamp'])
+            if self.dedup.seen(key):
+                stored = False
+                metrics.DEDUP.inc(stage='memory', result='hit')
+                metrics.SMS_RECEIVED.inc(modem=modem_id, outcome='duplicate')
+                logger.info(f"Duplicate SMS ignored from {sms_details['sender']}")
+            else:
+                metrics.DEDUP.inc(stage='memory', result='miss')
                 
-                # Stocker en base de données
+                # Journaliser avant d'écrire en base (écriture groupée, doublons écartés à l'insertion)
                 stored = self.db.store_received_sms(
                     sms_details['sender'],
                     sms_details['message'],
                     sms_details['timestamp'],
-                    db_modem_id
+                    db_modem_id,
+                    device_path,
+                    incomplete
                 )
                 
-                if stored:
-                    processed_count += 1
-                    logger.info(f"Stored SMS from {sms_details['sender']}: {sms_details['message'][:50]}...")
-                
-                # Supprimer le SMS du modem pour libérer la mémoire
-                if self.delete_sms_from_modem(modem_id, sms_id):
-                    logger.debug(f"Deleted SMS {sms_id} from modem memory")
+                # Ni journal ni base: le SMS reste sur le modem pour un prochain passage
+                if not stored:
+                    self.dedup.forget(key)
+                    metrics.SMS_RECEIVED.inc(modem=modem_id, outcome='error')
+                    return False
                 
-                # Marquer comme traité
-                self.processed_sms.add(cache_key)
+                metrics.SMS_RECEIVED.inc(modem=modem_id, outcome='incomplete' if incomplete else 'stored')
+                logger.info(f"Received SMS from {sms_details['sender']}: {sms_details['message'][:50]}...")
+            
+            # Supprimer le SMS du modem pour libérer la mémoire
+            if self.delete_sms_from_modem(modem_id, sms_id):
+                logger.debug(f"Deleted SMS {sms_id} from modem memory")
+            self._forget_receiving(modem_id, sms_id)
+            
+            return stored
+            
+        except Exception as e:
+            metrics.SMS_RECEIVED.inc(modem=modem_id, outcome='error')
+            logger.error(f"Error processing SMS {sms_id}: {str(e)}")
+            return False
+    
+    def _receiving_expired(self, modem_id: str, sms_id: str) -> bool:
+        # Le délai court depuis le premier passage qui a trouvé le SMS en réception
+        now = time.monotonic()
+        with self._receiving_lock:
+            first_seen = self._receiving.setdefault((modem_id, sms_id), now)
+        return now - first_seen >= self.incomplete_timeout
+    
+    def _forget_receiving(self, modem_id: str, sms_id: str):
+        with self._receiving_lock:
+            self._receiving.pop((modem_id, sms_id), None)
+    
+    def _prune_receiving(self, modem_id: str, sms_ids: List[str]):
+        # SMS disparus du modem (supprimés ailleurs, modem réinitialisé): plus suivis
+        present = set(sms_ids)
+        with self._receiving_lock:
+            for key in [key for key in self._receiving if key[0] == modem_id and key[1] not in present]:
+                del self._receiving[key]
+    
+    def process_notified_sms(self, modem_id: str, sms_id: str) -> Optional[bool]:
+        """Traite un SMS signalé par le watcher (modem encore inconnu: laissé au balayage)"""
+        modem = self.inventory.get(modem_id)
+        if not modem or not modem.get('device_path'):
+            logger.debug(f"SMS {sms_id} on unknown modem {modem_id}, left to the next sweep")
+            return False
+        
+        db_modem_id = self.db.get_modem_id(modem)
+        return self.process_sms(modem_id, sms_id, db_modem_id, modem['device_path'])
+    
+    def run_watch(self, sweep_interval: float = None, poll_interval: float = None):
+        """Boucle du démon en mode événementiel: chaque SMS est traité dès qu'il est signalé
+        
+        Un cycle complet est lancé au démarrage puis toutes les sweep_interval
+        secondes, pour les SMS manqués (signal perdu, modem rebranché).
+        """
+        sweep_interval = sweep_interval or DEFAULT_SWEEP_INTERVAL
+        watcher = SMSWatcher(
+            self.backend,
+            lambda: [m['id'] for m in self.find_modems() if m.get('status') == 'ready'],
+            poll_interval
+        ).start()
+        
+        self.db.open_spool()
+        self.db.start()
+        next_sweep = time.monotonic()
+        try:
+            while True:
+                if time.monotonic() >= next_sweep:
+                    result = self.run_receive_cycle()
+                    if result.get('processed'):
+                        logger.info(f"Sweep stored {result['processed']} SMS missed by the watcher")
+                    next_sweep = time.monotonic() + sweep_interval
                 
-            except Exception as e:
-                logger.error(f"Error processing SMS {sms_id}: {str(e)}")
-                continue
+                event = watcher.get(timeout=next_sweep - time.monotonic())
+                if event:
+                    if self.process_notified_sms(*event) is None:
+                        watcher.retry(*event)
+                    else:
+                        watcher.done(*event)
+        finally:
+            watcher.stop()
+    
+    def process_modems(self, modems: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Vide les modems en parallèle (au plus self.workers à la fois)
         
-        return processed_count
+        Chaque modem est traité par un seul thread, ses SMS dans l'ordre de la
+        liste: un modem plein ne retarde plus les autres. Retourne, par modem,
+        le nombre de SMS lus et la durée de son traitement.
+        """
+        if len(modems) <= 1 or self.workers <= 1:
+            return {modem['id']: self._timed_process_modem(modem) for modem in modems}
+        
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(modems)),
+                                thread_name_prefix='receive-modem') as executor:
+            futures = {modem['id']: executor.submit(self._timed_process_modem, modem) for modem in modems}
+        
+        return {modem_id: future.result() for modem_id, future in futures.items()}
+    
+    def _timed_process_modem(self, modem: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        cycle = {'read': 0}
+        try:
+            cycle['read'] = self.process_modem_sms(modem)
+        except Exception as e:
+            logger.error(f"Error processing modem {modem['id']}: {str(e)}")
+            cycle['error'] = str(e)
+        
+        duration = time.perf_counter() - start
+        metrics.RECEIVE_MODEM_CYCLE_SECONDS.observe(duration, modem=modem['id'])
+        cycle['duration_ms'] = round(duration * 1000, 1)
+        logger.debug(f"Modem {modem['id']} processed in {cycle['duration_ms']} ms")
+        return cycle
     
     def run_receive_cycle(self) -> Dict[str, Any]:
         """Exécute un cycle de réception SMS"""
+        with metrics.RECEIVE_CYCLE_SECONDS.time():
+            return self._receive_cycle()
+    
+    def _receive_cycle(self) -> Dict[str, Any]:
         try:
             modems = self.find_modems()
+            metrics.record_modems(modems)
             
             if not modems:
                 logger.warning("No modems found")
                 return {'success': True, 'processed': 0, 'modems': 0}
             
-            total_processed = 0
-            active_modems = 0
-            
-            for modem in modems:
-                if modem.get('status') == 'ready':
-                    active_modems += 1
-                    processed = self.process_modem_sms(modem)
-                    total_processed += processed
+            self.db.open_spool()
+            inserted_before = self.db.stats['inserted']
+            ready_modems = [modem for modem in modems if modem.get('status') == 'ready']
+            modem_cycles = self.process_modems(ready_modems)
+            self.db.flush()
             
             return {
                 'success': True,
-                'processed': total_processed,
-                'modems': active_modems,
-                'total_modems': len(modems)
+                'processed': self.db.stats['inserted'] - inserted_before,
+                'modems': len(ready_modems),
+                'total_modems': len(modems),
+                'modem_cycles': modem_cycles
             }
             
         except Exception as e:
@@ -459,6 +731,7 @@ def main():
 Exemples d'utilisation:
   %(prog)s --check-once
   %(prog)s --daemon --interval 30
+  %(prog)s --daemon --watch
   %(prog)s --list-modems
         """
     )
@@ -467,25 +740,56 @@ Exemples d'utilisation:
                        help='Vérifier une seule fois les SMS reçus')
     parser.add_argument('--daemon', action='store_true',
                        help='Mode démon - vérification continue')
-    parser.add_argument('--interval', type=int, default=30,
-                       help='Intervalle de vérification en secondes (mode démon)')
+    parser.add_argument('--interval', type=int,
+                       help='Intervalle de vérification en secondes (mode démon, défaut: 30; '
+                            'avec --watch, balayage de sécurité, défaut: 300)')
+    parser.add_argument('--workers', type=int,
+                       help='Modems traités en parallèle par cycle (défaut: $SMS_RECEIVE_WORKERS ou 4)')
+    parser.add_argument('--watch', action='store_true',
+                       help='Mode démon: traiter chaque SMS dès que ModemManager le signale')
+    parser.add_argument('--poll-interval', type=float,
+                       help='Avec --watch sans signaux D-Bus (backend mmcli): intervalle '
+                            'd\'interrogation des listes de SMS en secondes (défaut: 2)')
+    parser.add_argument('--spool-dir',
+                       help='Journal local des SMS reçus avant leur écriture en base '
+                            '(défaut: $SMS_RECEIVE_SPOOL_DIR ou /var/lib/sms-gateway/receive-spool)')
     parser.add_argument('--list-modems', action='store_true',
                        help='Lister tous les modems disponibles')
     parser.add_argument('--verbose', '-v', action='store_true',
                        help='Mode verbose')
     parser.add_argument('--json-output', action='store_true',
                        help='Sortie au format JSON')
+    parser.add_argument('--backend', choices=['auto', 'dbus', 'mmcli'],
+                       help='Accès à ModemManager (défaut: $SMS_MODEM_BACKEND ou auto)')
+    parser.add_argument('--modem-cache-ttl', type=float,
+                       help='Durée de validité de l\'inventaire des modems en secondes (défaut: 60)')
+    parser.add_argument('--metrics-listen', metavar='[HOST:]PORT',
+                       help='Mode démon: métriques Prometheus sur http://HOST:PORT/metrics '
+                            '(défaut: $SMS_METRICS_LISTEN)')
+    parser.add_argument('--metrics-textfile', metavar='FILE',
+                       help='Mode démon: métriques écrites périodiquement dans FILE '
+                            '(textfile collector, défaut: $SMS_METRICS_TEXTFILE)')
     
     args = parser.parse_args()
     
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
+    exporter = None
     try:
         # Charger la configuration
         db_config = load_config()
         
-        receiver = SMSReceiver(db_config)
+        # Métriques: démon uniquement, chaque appel ModemManager est mesuré
+        backend = get_backend(args.backend)
+        if args.daemon:
+            exporter = metrics.MetricsExporter(args.metrics_listen, args.metrics_textfile)
+            if exporter.enabled:
+                backend = metrics.InstrumentedBackend(backend)
+            else:
+                exporter = None
+        
+        receiver = SMSReceiver(db_config, backend, args.modem_cache_ttl, args.workers, args.spool_dir)
         
         if args.list_modems:
             modems = receiver.find_modems()
@@ -498,19 +802,36 @@ Exemples d'utilisation:
                     print(f"  ID: {modem['id']}")
                     print(f"  Périphérique: {modem.get('device_path', 'N/A')}")
                     print(f"  Statut: {modem.get('status', 'N/A')}")
+                    print(f"  Sonde: {modem.get('probe_ms', 'N/A')} ms")
                     print()
             
             sys.exit(0)
         
-        if args.daemon:
+        if args.daemon and args.watch:
+            logger.info(f"Starting SMS receiver daemon in watch mode "
+                        f"(sweep interval: {args.interval or DEFAULT_SWEEP_INTERVAL:g}s)")
+            if exporter:
+                exporter.start()
+            
+            try:
+                receiver.run_watch(args.interval, args.poll_interval)
+            except KeyboardInterrupt:
+                logger.info("Daemon stopped by user")
+        
+        elif args.daemon:
+            args.interval = args.interval or 30
             logger.info(f"Starting SMS receiver daemon (interval: {args.interval}s)")
+            if exporter:
+                exporter.start()
             
             while True:
                 try:
                     result = receiver.run_receive_cycle()
                     
                     if args.verbose and result['processed'] > 0:
-                        logger.info(f"Processed {result['processed']} SMS from {result['modems']} modems")
+                        timings = ', '.join(f"{modem_id}: {cycle['duration_ms']} ms"
+                                            for modem_id, cycle in result['modem_cycles'].items())
+                        logger.info(f"Processed {result['processed']} SMS from {result['modems']} modems ({timings})")
                     
                     time.sleep(args.interval)
                     
@@ -566,7 +887,10 @@ Exemples d'utilisation:
         sys.exit(1)
     
     finally:
+        if exporter:
+            exporter.stop()
         try:
+            receiver.inventory.close()
             receiver.db.close()
         except:
             pass
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Répartiteur d'envois multi-modems pour send_sms_mmcli.py
+
+Une voie d'envoi (thread) par modem prêt, alimentée par une file partagée:
+chaque modem envoie dès qu'il est libre, le débit total suit le nombre de
+modems au lieu d'être limité à celui d'un seul.
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Dict, Any, List, Callable
+
+from modem_inventory import device_keys
+
+logger = logging.getLogger(__name__)
+
+# Jobs en attente par file: borne la mémoire et applique une contre-pression au lecteur
+DEFAULT_QUEUE_SIZE = 64
+
+class SendLane(threading.Thread):
+    """Voie d'envoi dédiée à un modem"""
+    
+    def __init__(self, dispatcher: 'ModemDispatcher', modem: Dict[str, Any]):
+        super().__init__(name=f"lane-{modem['id']}", daemon=True)
+        self.dispatcher = dispatcher
+        self.modem_id = modem['id']
+        self.device_path = modem.get('device_path')
+        # Jobs imposés sur ce modem (champ "device"), servis avant la file partagée
+        self.jobs = queue.Queue(maxsize=dispatcher.queue_size)
+        self.sent = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.started_at = None
+        self.stopped_at = None
+    
+    def run(self):
+        self.started_at = time.monotonic()
+        
+        while True:
+            item = self._next_job()
+            if item is None:
+                break
+            
+            job, callback = item
+            start = time.perf_counter()
+            
+            try:
+                result = self.dispatcher.send_fn(job, self.modem_id)
+            except Exception as e:
+                result = {'success': False, 'error': str(e), 'error_type': 'SYSTEM_ERROR'}
+            
+            self.busy_time += time.perf_counter() - start
+            if result.get('success'):
+                self.sent += 1
+            else:
+                self.failed += 1
+            
+            try:
+                callback(job, result)
+            except Exception as e:
+                logger.error(f"Erreur dans le traitement du résultat: {e}")
+        
+        self.stopped_at = time.monotonic()
+    
+    def _next_job(self):
+        """Job suivant: d'abord ceux imposés sur ce modem, puis la file partagée"""
+        while True:
+            try:
+                return self.jobs.get_nowait()
+            except queue.Empty:
+                pass
+            
+            if self.dispatcher.closing and self.jobs.empty() and self.dispatcher.shared.empty():
+                return None
+            
+            # Modem écarté (disjoncteur ouvert): laisser la file partagée aux autres voies,
+            # tant qu'il en reste une disponible pour ne pas bloquer le lot (sinon le job
+            # échoue aussitôt, comme un job imposé sur ce modem)
+            if not self.dispatcher.is_available(self.modem_id) and self.dispatcher.others_available(self):
+                time.sleep(0.05)
+                continue
+            
+            try:
+                return self.dispatcher.shared.get(timeout=0.05)
+            except queue.Empty:
+                continue
+    
+    def stats(self) -> Dict[str, Any]:
+        """Débit de la voie: SMS envoyés par seconde depuis son démarrage"""
+        end = self.stopped_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        
+        return {
+            'modem_id': self.modem_id,
+            'device_path': self.device_path,
+            'sent': self.sent,
+            'failed': self.failed,
+            'elapsed': round(elapsed, 3),
+            'busy': round(self.busy_time, 3),
+            'throughput': round(self.sent / elapsed, 3) if elapsed > 0 else 0.0
+        }
+
+class ModemDispatcher:
+    """Distribue des jobs d'envoi sur une voie par modem
+    
+    send_fn(job, modem_id) envoie un job sur le modem donné et retourne le
+    dictionnaire de résultat; callback(job, result) est appelé depuis la voie
+    dès que le job est terminé (résultats dans l'ordre de fin, pas d'arrivée).
+    available_fn(modem_id), si fourni, indique si un modem peut prendre des
+    jobs de la file partagée (disjoncteur fermé).
+    """
+    
+    def __init__(self, send_fn: Callable[[Dict[str, Any], str], Dict[str, Any]],
+                 modems: List[Dict[str, Any]], queue_size: int = DEFAULT_QUEUE_SIZE,
+                 available_fn: Callable[[str], bool] = None):
+        if not modems:
+            raise ValueError("Aucun modem pour le répartiteur")
+        
+        self.send_fn = send_fn
+        self.available_fn = available_fn
+        self.queue_size = queue_size
+        self.shared = queue.Queue(maxsize=queue_size)
+        self.closing = False
+        self.lanes = [SendLane(self, modem) for modem in modems]
+        
+        self._lanes_by_device = {}
+        for lane in self.lanes:
+            if lane.device_path:
+                for key in device_keys(lane.device_path):
+                    self._lanes_by_device[key] = lane
+    
+    def start(self) -> 'ModemDispatcher':
+        for lane in self.lanes:
+            lane.start()
+        logger.info(f"Répartiteur démarré: {len(self.lanes)} voie(s) d'envoi")
+        return self
+    
+    def submit(self, job: Dict[str, Any], callback: Callable[[Dict[str, Any], Dict[str, Any]], None]):
+        """Met un job en file (bloque si les files sont pleines)"""
+        device_path = job.get('device')
+        
+        if not device_path:
+            self.shared.put((job, callback))
+            return
+        
+        lane = self._lane_for_device(device_path)
+        if lane is None:
+            callback(job, {
+                'success': False,
+                'error': f"Modem non trouvé pour le périphérique: {device_path}",
+                'error_type': 'SMS_ERROR',
+                'modem_error': True
+            })
+            return
+        
+        lane.jobs.put((job, callback))
+    
+    def is_available(self, modem_id: str) -> bool:
+        return self.available_fn is None or self.available_fn(modem_id)
+    
+    def others_available(self, lane: SendLane) -> bool:
+        return any(other is not lane and self.is_available(other.modem_id) for other in self.lanes)
+    
+    def _lane_for_device(self, device_path: str):
+        for key in device_keys(device_path):
+            lane = self._lanes_by_device.get(key)
+            if lane:
+                return lane
+        return None
+    
+    def close(self):
+        """Attend la fin de tous les jobs en file puis arrête les voies"""
+        self.closing = True
+        for lane in self.lanes:
+            lane.join()
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        return [lane.stats() for lane in self.lanes]
@@ -126,14 +126,23 @@ try {
                 $result = sendSmsViaPython($sms, $modem, $verbose);
                 
                 if ($result['success']) {
-                    Sms::markAsSent($sms['id']);
+                    Sms::markAsSent($sms['id'], $result);
                     Modem::updateLastUsed($modem['id']);
                     $sent++;
                     
                     if ($verbose) {
                         echo "  ✓ SMS envoyé avec succès\n";
                     }
+                } elseif (!empty($result['delivery_unknown'])) {
+                    // Requête transmise au démon sans réponse: pas de réenvoi, risque de doublon
+                    $failed++;
+                    handleDeliveryUnknown($sms, $result['error'], $verbose);
                 } else {
+                    // Échec sans lien avec le modem (numéro, message): ne pas le compter
+                    // dans les erreurs du modem (trigger update_modem_stats)
+                    if (isset($result['modem_error']) && !$result['modem_error']) {
+                        Sms::update($sms['id'], ['modem_id' => null]);
+                    }
                     throw new Exception($result['error'] ?? 'Erreur inconnue');
                 }
             } else {
@@ -144,8 +153,9 @@ try {
             
             $processed++;
             
-            // Petite pause entre les envois pour éviter la surcharge
-            if (!$dryRun) {
+            // Petite pause entre les envois pour éviter la surcharge, sauf si le
+            // démon d'envoi a déjà appliqué le débit propre au modem
+            if (!$dryRun && !isset($result['rate_limit_wait'])) {
                 usleep(500000); // 0.5 seconde
             }
             
@@ -196,6 +206,24 @@ try {
  */
 function sendSmsViaPython($sms, $modem, $verbose = false)
 {
+    static $daemon = null;
+    
+    // Utiliser le démon d'envoi résident s'il tourne
+    if ($daemon === null) {
+        $daemon = new SmsDaemonClient();
+    }
+    
+    if ($daemon->isAvailable()) {
+        try {
+            if ($verbose) {
+                echo "  Envoi via le démon: " . SMS_SEND_SOCKET . "\n";
+            }
+            return $daemon->send($sms['recipient'], $sms['message'], $modem['device_path']);
+        } catch (SmsDaemonUnavailableException $e) {
+            Logger::warning('SMS daemon unavailable, falling back to process: ' . $e->getMessage());
+        }
+    }
+    
     $pythonScript = SMS_PYTHON_SCRIPT;
     
     $command = sprintf(
@@ -275,6 +303,30 @@ function sendSmsViaPython($sms, $modem, $verbose = false)
     return $result;
 }
 
+/**
+ * Gère un SMS transmis au démon sans réponse: échec définitif, sans réenvoi
+ */
+function handleDeliveryUnknown($sms, $errorMessage, $verbose = false)
+{
+    Sms::markAsDeliveryUnknown($sms['id'], $errorMessage);
+    
+    NotificationService::createSmsFailedNotification(
+        $sms['id'],
+        $sms['recipient'],
+        $errorMessage
+    );
+    
+    if ($verbose) {
+        echo "  ✗ {$errorMessage}: SMS #{$sms['id']} non renvoyé\n";
+    }
+    
+    Logger::error("SMS delivery unknown, not retried", [
+        'sms_id' => $sms['id'],
+        'recipient' => $sms['recipient'],
+        'error' => $errorMessage
+    ]);
+}
+
 /**
  * Gère les erreurs d'envoi SMS
  */
@@ -1,18 +1,32 @@
 #!/usr/bin/env python3
 """
-Script Python pour envoyer des SMS via mmcli (ModemManager)
+Script Python pour envoyer des SMS via ModemManager (D-Bus ou mmcli)
 Utilisé par l'application PHP SMS Gateway
 """
 
 import sys
 import argparse
-import subprocess
 import json
 import logging
 import time
-import re
+import os
+import signal
+import socketserver
+import threading
 from typing import Dict, Any, Optional, List
 
+from mm_backend import (ModemBackend, ModemBackendError, ModemBackendTimeout,
+                        ModemNotFoundError, ModemStateError, get_backend)
+from modem_inventory import ModemInventory
+from send_dispatcher import ModemDispatcher
+from rate_limiter import SendRateLimiter
+from modem_health import HealthTracker
+from sms_reaper import SMSReaper
+from modem_capabilities import CapabilityCache
+import sms_encoding
+import phone_numbers
+import metrics
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,96 +35,89 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class SMSError(Exception):
-    """Exception personnalisée pour les erreurs SMS"""
-    pass
+    """Exception personnalisée pour les erreurs SMS
+    
+    modem_error indique que l'échec vient du modem et non de la requête
+    (numéro ou message invalide): seuls ces échecs sont comptés dans les
+    erreurs du modem côté application PHP.
+    """
+    
+    def __init__(self, message: str, modem_error: bool = False):
+        super().__init__(message)
+        self.modem_error = modem_error
+        # Durées des phases déjà passées quand l'envoi a échoué
+        self.timings = None
+
+class PhaseTimer:
+    """Durée de chaque phase d'un envoi, en millisecondes
+    
+    Horloge monotone haute résolution (perf_counter): chaque mark() enregistre
+    le temps écoulé depuis la phase précédente sous le nom donné.
+    """
+    
+    def __init__(self):
+        self.timings = {}
+        self._last = time.perf_counter()
+    
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.timings[phase] = round((now - self._last) * 1000, 3)
+        self._last = now
 
 class ModemManager:
-    """Gestionnaire de modems via mmcli"""
+    """Gestionnaire de modems via un backend ModemManager (D-Bus ou mmcli)"""
     
-    def __init__(self, device_path: str = None):
+    def __init__(self, device_path: str = None, backend: ModemBackend = None,
+                 inventory: ModemInventory = None, cache_ttl: float = None,
+                 rate_limiter: SendRateLimiter = None, health: HealthTracker = None):
         self.device_path = device_path
         self.modem_id = None
+        self.backend = backend or get_backend()
+        # Inventaire partagé: évite une découverte complète à chaque envoi
+        self.inventory = inventory or ModemInventory(self.backend, ttl=cache_ttl)
+        # Débit par modem (processus résidents uniquement, None en envoi unitaire)
+        self.rate_limiter = rate_limiter
+        # Score et disjoncteur de chaque modem, alimentés par les envois
+        self.health = health or HealthTracker()
+        # Capacités de messagerie lues au rechargement de l'inventaire (watch_capabilities),
+        # jamais dans le chemin d'envoi
+        self.capabilities = CapabilityCache(self.backend)
+        # Un verrou par modem: un seul envoi à la fois sur un même modem
+        self._modem_locks = {}
+        self._locks_guard = threading.Lock()
+        # Suppression des SMS envoyés hors du chemin d'envoi, quand le modem est libre
+        self.reaper = SMSReaper(
+            self.backend,
+            self._lock_for,
+            is_busy=lambda modem_id: self.health.in_flight(modem_id) > 0,
+            modems_fn=lambda: [modem['id'] for modem in self.inventory.modems()]
+        )
+    
+    def _lock_for(self, modem_id: str) -> threading.Lock:
+        """Retourne le verrou associé à un modem"""
+        with self._locks_guard:
+            if modem_id not in self._modem_locks:
+                self._modem_locks[modem_id] = threading.Lock()
+            return self._modem_locks[modem_id]
         
-    def find_modems(self) -> List[Dict[str, Any]]:
-        """Trouve tous les modems disponibles"""
+    def find_modems(self, force: bool = False) -> List[Dict[str, Any]]:
+        """Trouve tous les modems disponibles (depuis l'inventaire si encore valide)"""
         try:
-            result = subprocess.run(
-                ['mmcli', '-L'],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode != 0:
-                raise SMSError(f"Erreur lors de la recherche de modems: {result.stderr}")
-            
-            modems = []
-            for line in result.stdout.split('\n'):
-                if '/org/freedesktop/ModemManager1/Modem/' in line:
-                    # Extraire l'ID du modem
-                    match = re.search(r'/Modem/(\d+)', line)
-                    if match:
-                        modem_id = match.group(1)
-                        modem_info = self.get_modem_info(modem_id)
-                        if modem_info:
-                            modems.append(modem_info)
-            
-            return modems
+            return self.inventory.modems(force=force)
         
-        except subprocess.TimeoutExpired:
+        except ModemBackendTimeout:
             raise SMSError("Timeout lors de la recherche de modems")
+        except ModemBackendError as e:
+            raise SMSError(f"Erreur lors de la recherche de modems: {str(e)}")
         except Exception as e:
             raise SMSError(f"Erreur inattendue lors de la recherche de modems: {str(e)}")
     
     def get_modem_info(self, modem_id: str) -> Optional[Dict[str, Any]]:
         """Récupère les informations d'un modem"""
         try:
-            result = subprocess.run(
-                ['mmcli', '-m', modem_id],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode != 0:
-                logger.warning(f"Impossible d'obtenir les infos du modem {modem_id}")
-                return None
+            return self.backend.get_modem_info(modem_id)
             
-            info = {'id': modem_id}
-            
-            # Parser les informations du modem
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                
-                if 'Status |' in line and 'state:' in line:
-                    if 'registered' in line or 'connected' in line:
-                        info['status'] = 'ready'
-                    else:
-                        info['status'] = 'not_ready'
-                
-                elif '3GPP |' in line and 'imei:' in line:
-                    match = re.search(r'imei:\s*(\w+)', line)
-                    if match:
-                        info['imei'] = match.group(1)
-                
-                elif '3GPP |' in line and 'operator name:' in line:
-                    match = re.search(r'operator name:\s*(.+)', line)
-                    if match:
-                        info['operator'] = match.group(1).strip()
-                
-                elif 'Signal |' in line and 'quality:' in line:
-                    match = re.search(r'quality:\s*(\d+)%', line)
-                    if match:
-                        info['signal_quality'] = int(match.group(1))
-                
-                elif 'Primary port:' in line:
-                    match = re.search(r'Primary port:\s*(.+)', line)
-                    if match:
-                        info['device_path'] = match.group(1).strip()
-            
-            return info
-            
-        except subprocess.TimeoutExpired:
+        except ModemBackendTimeout:
             logger.warning(f"Timeout lors de la récupération des infos du modem {modem_id}")
             return None
         except Exception as e:
@@ -119,174 +126,453 @@ class ModemManager:
     
     def find_modem_by_device(self, device_path: str) -> Optional[str]:
         """Trouve l'ID d'un modem par son chemin de périphérique"""
-        modems = self.find_modems()
-        
-        for modem in modems:
-            if modem.get('device_path') == device_path:
-                return modem['id']
+        try:
+            return self.inventory.find_by_device(device_path)
         
-        return None
+        except ModemBackendTimeout:
+            raise SMSError("Timeout lors de la recherche de modems")
+        except ModemBackendError as e:
+            raise SMSError(f"Erreur lors de la recherche de modems: {str(e)}")
     
-    def get_best_modem(self) -> str:
-        """Trouve le meilleur modem disponible"""
-        if self.device_path:
-            modem_id = self.find_modem_by_device(self.device_path)
-            if modem_id:
-                return modem_id
-            else:
-                raise SMSError(f"Modem non trouvé pour le périphérique: {self.device_path}")
+    def get_best_modem(self, device_path: str = None, timer: PhaseTimer = None) -> str:
+        """Trouve le meilleur modem disponible (phases discovery et selection du timer)"""
+        timer = timer or PhaseTimer()
+        device_path = device_path or self.device_path
+        if device_path:
+            modem_id = self.find_modem_by_device(device_path)
+            timer.mark('discovery')
+            if not modem_id:
+                raise SMSError(f"Modem non trouvé pour le périphérique: {device_path}", modem_error=True)
+            
+            allowed = self.health.allow(modem_id)
+            timer.mark('selection')
+            if not allowed:
+                raise SMSError(f"Modem {modem_id} écarté après des échecs répétés, "
+                               f"nouvel essai dans {self.health.retry_in(modem_id):.0f}s", modem_error=True)
+            return modem_id
         
         # Chercher le meilleur modem disponible
         modems = self.find_modems()
+        timer.mark('discovery')
         ready_modems = [m for m in modems if m.get('status') == 'ready']
         
         if not ready_modems:
             raise SMSError("Aucun modem prêt trouvé")
         
-        # Trier par qualité de signal (descendant)
-        ready_modems.sort(key=lambda x: x.get('signal_quality', 0), reverse=True)
-        return ready_modems[0]['id']
+        # Meilleur score (signal, succès récents, latence, charge) parmi les modems non écartés
+        modem_id = self.health.select(ready_modems)
+        timer.mark('selection')
+        if modem_id is None:
+            raise SMSError("Aucun modem disponible: tous les modems prêts sont écartés après des échecs répétés")
+        return modem_id
     
-    def enable_sms(self, modem_id: str):
-        """Active les SMS sur le modem"""
-        try:
-            result = subprocess.run(
-                ['mmcli', '-m', modem_id, '--messaging-create-sms'],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            if result.returncode != 0:
-                logger.warning(f"Impossible d'activer les SMS: {result.stderr}")
-            
-        except subprocess.TimeoutExpired:
-            logger.warning("Timeout lors de l'activation des SMS")
-        except Exception as e:
-            logger.warning(f"Erreur lors de l'activation des SMS: {str(e)}")
+    def get_capabilities(self, modem_id: str) -> Dict[str, Any]:
+        """Capacités de messagerie du modem (en cache tant que son état ne change pas)"""
+        modem = self.inventory.peek(modem_id) or {'id': modem_id}
+        return self.capabilities.get(modem)
+    
+    def watch_capabilities(self):
+        """Processus résidents: lit les capacités des modems à chaque rechargement de l'inventaire"""
+        self.inventory.add_listener(self.capabilities.refresh)
+        if self.inventory.is_fresh():
+            self.capabilities.refresh(self.inventory.cached())
     
-    def send_sms(self, recipient: str, message: str) -> Dict[str, Any]:
-        """Envoie un SMS"""
+    def send_sms(self, recipient: str, message: str, device_path: str = None,
+                 modem_id: str = None) -> Dict[str, Any]:
+        """Envoie un SMS (sur modem_id s'il est imposé, sinon sur le meilleur modem)
+        
+        Le résultat contient 'timings': durée en ms de chaque phase (discovery,
+        selection, queue, create, send) de cet envoi. La suppression,
+        faite en arrière-plan, est mesurée à part (sms_gateway_reaper_delete_seconds).
+        """
+        timer = PhaseTimer()
         try:
             # Trouver le meilleur modem
-            modem_id = self.get_best_modem()
+            if modem_id:
+                # Modem imposé (voie du répartiteur): réserve l'essai s'il était écarté,
+                # échoue tout de suite si son disjoncteur est ouvert
+                allowed = self.health.allow(modem_id)
+                timer.mark('selection')
+                if not allowed:
+                    raise SMSError(f"Modem {modem_id} écarté (disjoncteur ouvert) après des échecs répétés, "
+                                   f"nouvel essai dans {self.health.retry_in(modem_id):.0f}s", modem_error=True)
+            else:
+                modem_id = self.get_best_modem(device_path, timer)
             logger.info(f"Utilisation du modem {modem_id} pour envoyer SMS à {recipient}")
             
-            # S'assurer que les SMS sont activés
-            self.enable_sms(modem_id)
-            
-            # Créer le SMS
-            create_result = subprocess.run([
-                'mmcli', '-m', modem_id,
-                '--messaging-create-sms',
-                f'--messaging-create-sms-text={message}',
-                f'--messaging-create-sms-number={recipient}'
-            ], capture_output=True, text=True, timeout=30)
-            
-            if create_result.returncode != 0:
-                raise SMSError(f"Erreur création SMS: {create_result.stderr}")
-            
-            # Extraire l'ID du SMS créé
-            sms_id = None
-            for line in create_result.stdout.split('\n'):
-                if 'messaging/sms/' in line:
-                    match = re.search(r'messaging/sms/(\d+)', line)
-                    if match:
-                        sms_id = match.group(1)
-                        break
-            
-            if not sms_id:
-                raise SMSError("Impossible d'obtenir l'ID du SMS créé")
-            
-            logger.info(f"SMS créé avec l'ID: {sms_id}")
-            
-            # Envoyer le SMS
-            send_result = subprocess.run([
-                'mmcli', '-s', sms_id, '--send'
-            ], capture_output=True, text=True, timeout=60)
+            # Compté en cours dès l'attente du verrou: la charge d'un modem inclut sa file
+            self.health.begin(modem_id)
+            start_time = None
+            try:
+                with self._lock_for(modem_id):
+                    waited = None
+                    if self.rate_limiter:
+                        modem = self.inventory.peek(modem_id) or {}
+                        waited = self.rate_limiter.acquire(modem_id, modem.get('operator'))
+                    timer.mark('queue')
+                    
+                    start_time = time.monotonic()
+                    result = self._send_on_modem(modem_id, recipient, message, timer)
+            except Exception as e:
+                # Seul un échec du modem lui-même compte contre lui (disjoncteur, débit);
+                # sinon la place en cours est rendue sans résultat
+                modem_failed = start_time is not None and (
+                    isinstance(e, ModemBackendTimeout) or (isinstance(e, SMSError) and e.modem_error))
+                if modem_failed:
+                    duration = time.monotonic() - start_time
+                    if self.rate_limiter:
+                        self.rate_limiter.record(modem_id, False, duration)
+                    self.health.end(modem_id, False, duration, str(e) or type(e).__name__)
+                else:
+                    self.health.cancel(modem_id)
+                raise
             
-            if send_result.returncode != 0:
-                # Tenter de supprimer le SMS créé
-                try:
-                    subprocess.run(['mmcli', '-m', modem_id, '--messaging-delete-sms', sms_id], 
-                                 timeout=10, capture_output=True)
-                except:
-                    pass
-                
-                raise SMSError(f"Erreur envoi SMS: {send_result.stderr}")
+            duration = time.monotonic() - start_time
+            if self.rate_limiter:
+                self.rate_limiter.record(modem_id, True, duration)
+                result['rate_limit_wait'] = round(waited, 3)
+            self.health.end(modem_id, True, duration)
             
-            logger.info(f"SMS envoyé avec succès à {recipient}")
+            result['timings'] = timer.timings
+            metrics.SMS_SENT.inc(modem=modem_id, outcome='sent')
+            metrics.record_send_timings(timer.timings)
+            return result
             
-            # Nettoyer - supprimer le SMS de la mémoire du modem
-            try:
-                subprocess.run([
-                    'mmcli', '-m', modem_id, 
-                    '--messaging-delete-sms', sms_id
-                ], timeout=10, capture_output=True)
-            except:
-                logger.warning(f"Impossible de supprimer le SMS {sms_id} de la mémoire")
+        except ModemBackendTimeout:
+            error = SMSError("Timeout lors de l'envoi du SMS", modem_error=True)
+            outcome = 'timeout'
+        except SMSError as e:
+            error = e
+            outcome = 'failed'
+        except Exception as e:
+            error = SMSError(f"Erreur inattendue: {str(e)}", modem_error=True)
+            outcome = 'failed'
+        
+        error.timings = timer.timings
+        metrics.SMS_SENT.inc(modem=modem_id or 'none', outcome=outcome)
+        metrics.record_send_timings(timer.timings)
+        raise error
+    
+    def collect_metrics(self):
+        """Met à jour les jauges des modems et des files (appelé à chaque lecture des métriques)"""
+        metrics.record_modems(self.inventory.cached())
+        
+        health = self.health.snapshot()
+        depth = {('send', modem_id): state['in_flight'] for modem_id, state in health.items()}
+        depth.update({('delete', modem_id): count for modem_id, count in self.reaper.pending_by_modem().items()})
+        metrics.QUEUE_DEPTH.replace(depth)
+        metrics.MODEM_BREAKER_OPEN.replace({(modem_id,): int(state['state'] != 'closed')
+                                            for modem_id, state in health.items()})
+    
+    def _invalidate_on(self, error: ModemBackendError, modem_id: str):
+        """Invalide l'inventaire et les capacités si l'erreur révèle un modem disparu ou dans un autre état"""
+        if isinstance(error, (ModemNotFoundError, ModemStateError)):
+            self.inventory.invalidate(str(error))
+            self.capabilities.invalidate(modem_id)
+    
+    def _send_on_modem(self, modem_id: str, recipient: str, message: str,
+                       timer: PhaseTimer = None) -> Dict[str, Any]:
+        """Crée, envoie puis supprime le SMS sur le modem donné"""
+        timer = timer or PhaseTimer()
+        
+        # Capacités déjà en cache seulement (processus résidents): aucun appel au modem avant la création
+        capabilities = self.capabilities.peek(modem_id)
+        if capabilities is not None and not capabilities.get('messaging_ready'):
+            logger.warning(f"Messagerie du modem {modem_id} non prête, tentative d'envoi quand même")
+        
+        # Créer le SMS
+        try:
+            sms_id = self.backend.create_sms(modem_id, recipient, message, timeout=30)
+        except ModemBackendTimeout:
+            raise
+        except ModemBackendError as e:
+            self._invalidate_on(e, modem_id)
+            raise SMSError(f"Erreur création SMS: {str(e)}", modem_error=True)
+        finally:
+            timer.mark('create')
+        
+        logger.info(f"SMS créé avec l'ID: {sms_id}")
+        
+        # Envoyer le SMS
+        try:
+            self.backend.send_sms(sms_id, timeout=60)
+        except ModemBackendError as e:
+            timer.mark('send')
+            self._invalidate_on(e, modem_id)
             
-            return {
-                'success': True,
-                'modem_id': modem_id,
-                'sms_id': sms_id,
-                'recipient': recipient,
-                'message_length': len(message)
-            }
+            # Le SMS créé sera supprimé avec les autres
+            self.reaper.schedule(modem_id, sms_id)
             
-        except subprocess.TimeoutExpired:
-            raise SMSError("Timeout lors de l'envoi du SMS")
-        except SMSError:
-            raise
-        except Exception as e:
-            raise SMSError(f"Erreur inattendue: {str(e)}")
+            if isinstance(e, ModemBackendTimeout):
+                raise
+            raise SMSError(f"Erreur envoi SMS: {str(e)}", modem_error=True)
+        
+        timer.mark('send')
+        logger.info(f"SMS envoyé avec succès à {recipient}")
+        
+        # Nettoyer - la suppression de la mémoire du modem est faite en arrière-plan
+        self.reaper.schedule(modem_id, sms_id)
+        
+        return {
+            'success': True,
+            'modem_id': modem_id,
+            'sms_id': sms_id,
+            'recipient': recipient,
+            'message_length': len(message)
+        }
 
 class SMSSender:
     """Classe principale pour l'envoi de SMS"""
     
-    def __init__(self):
-        self.modem_manager = None
+    def __init__(self, backend: ModemBackend = None, modem_cache_ttl: float = None,
+                 rate_limiter: SendRateLimiter = None):
+        # Gestionnaire unique, réutilisé d'un envoi à l'autre (mode --serve)
+        self.modem_manager = ModemManager(backend=backend, cache_ttl=modem_cache_ttl,
+                                          rate_limiter=rate_limiter)
+        self.max_segments = sms_encoding.DEFAULT_MAX_SEGMENTS
     
-    def send(self, recipient: str, message: str, device_path: str = None) -> Dict[str, Any]:
+    def send(self, recipient: str, message: str, device_path: str = None,
+             modem_id: str = None) -> Dict[str, Any]:
         """Envoie un SMS avec validation"""
         
-        # Validation du destinataire
-        if not self.validate_phone_number(recipient):
+        # Validation du destinataire, envoyé au format E.164 (06... -> +212 6...)
+        normalized = phone_numbers.normalize(recipient.strip())
+        if normalized is None:
             raise SMSError(f"Numéro de téléphone invalide: {recipient}")
+        recipient = normalized
         
         # Validation du message
         if not message or not message.strip():
             raise SMSError("Message vide")
         
-        if len(message) > 1600:  # Limite raisonnable pour éviter les très longs SMS
-            raise SMSError(f"Message trop long: {len(message)} caractères")
-        
-        # Initialiser le gestionnaire de modems
-        self.modem_manager = ModemManager(device_path)
+        # Encodage GSM-7/UCS-2 et segments réellement facturés (153/67 par segment)
+        encoding = sms_encoding.analyze(message)
+        if encoding['parts'] > self.max_segments:
+            raise SMSError(f"Message trop long: {encoding['parts']} segments {encoding['encoding']} "
+                           f"({len(message)} caractères), maximum {self.max_segments}")
         
         # Envoyer le SMS
-        start_time = time.time()
-        result = self.modem_manager.send_sms(recipient, message)
-        end_time = time.time()
+        start_time = time.perf_counter()
+        result = self.modem_manager.send_sms(recipient, message, device_path, modem_id)
+        end_time = time.perf_counter()
         
-        result['send_duration'] = round(end_time - start_time, 2)
+        result['encoding'] = encoding['encoding']
+        result['parts_count'] = encoding['parts']
+        result['send_duration'] = round(end_time - start_time, 3)
         result['timestamp'] = time.strftime('%Y-%m-%d %H:%M:%S')
         
         return result
     
     def validate_phone_number(self, phone: str) -> bool:
-        """Valide un numéro de téléphone au format international"""
-        # Supprimer les espaces et caractères spéciaux
-        phone_clean = re.sub(r'[\s\-\(\)]', '', phone)
-        
-        # Vérifier le format international
-        pattern = r'^\+[1-9]\d{6,14}$'
-        return bool(re.match(pattern, phone_clean))
+        """Valide un numéro de téléphone (international, ou national avec l'indicatif par défaut)"""
+        return phone_numbers.is_valid(phone.strip())
     
-    def list_modems(self) -> List[Dict[str, Any]]:
+    def list_modems(self, refresh: bool = False) -> List[Dict[str, Any]]:
         """Liste tous les modems disponibles"""
-        self.modem_manager = ModemManager()
-        return self.modem_manager.find_modems()
+        return self.modem_manager.find_modems(force=refresh)
+    
+    def close(self):
+        """Supprime les SMS envoyés encore en mémoire des modems avant de quitter"""
+        self.modem_manager.reaper.stop()
+        self.modem_manager.inventory.close()
+
+def send_job(sender: SMSSender, job: Dict[str, Any], modem_id: str = None) -> Dict[str, Any]:
+    """Envoie un SMS décrit par un dictionnaire JSON et retourne toujours un résultat
+    
+    Utilisé par le démon (--serve) et le mode lot (--batch): une erreur
+    produit le même dictionnaire d'erreur que --json-output au lieu d'une exception.
+    """
+    try:
+        recipient = job.get('recipient')
+        message = job.get('message')
+        if not recipient or not message:
+            raise SMSError("recipient et message sont requis")
+        return sender.send(recipient, message, job.get('device'), modem_id)
+    
+    except SMSError as e:
+        logger.error(f"Erreur SMS: {e}")
+        error_result = {'success': False, 'error': str(e), 'error_type': 'SMS_ERROR', 'modem_error': e.modem_error}
+        if e.timings:
+            error_result['timings'] = e.timings
+        return error_result
+    except Exception as e:
+        logger.error(f"Erreur système: {e}")
+        return {'success': False, 'error': str(e), 'error_type': 'SYSTEM_ERROR'}
+
+def run_batch(sender: SMSSender, source, output, parallel: bool = False) -> Dict[str, Any]:
+    """Envoie les jobs JSON lus ligne à ligne et écrit un résultat JSON par job
+    
+    Chaque ligne d'entrée est un objet {"recipient", "message", "device"?, "id"?}.
+    Le résultat reprend "id" (ou le numéro de ligne) et est écrit dès que le job
+    est terminé; rien n'est accumulé, la mémoire reste constante quelle que soit
+    la longueur du flux.
+    
+    En mode parallèle, une voie d'envoi par modem prêt (ModemDispatcher): les
+    résultats sortent dans l'ordre de fin d'envoi.
+    """
+    stats = {'total': 0, 'sent': 0, 'failed': 0}
+    output_lock = threading.Lock()
+    
+    def emit(job_id, result: Dict[str, Any]):
+        result['id'] = job_id
+        with output_lock:
+            stats['sent' if result.get('success') else 'failed'] += 1
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    
+    dispatcher = None
+    if parallel:
+        ready_modems = [m for m in sender.list_modems() if m.get('status') == 'ready']
+        if not ready_modems:
+            raise SMSError("Aucun modem prêt trouvé")
+        
+        dispatcher = ModemDispatcher(
+            lambda job, modem_id: send_job(sender, job, modem_id),
+            ready_modems,
+            available_fn=sender.modem_manager.health.available
+        ).start()
+    
+    try:
+        for line_number, raw_line in enumerate(source, 1):
+            line = raw_line.strip()
+            if not line:
+                continue
+            
+            with output_lock:
+                stats['total'] += 1
+            
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("objet JSON attendu")
+            except ValueError as e:
+                emit(line_number, {'success': False, 'error': f"Job invalide: {e}", 'error_type': 'BAD_REQUEST'})
+                continue
+            
+            job_id = job.get('id', line_number)
+            
+            if dispatcher:
+                dispatcher.submit(job, lambda job, result, job_id=job_id: emit(job_id, result))
+            else:
+                emit(job_id, send_job(sender, job))
+    finally:
+        if dispatcher:
+            dispatcher.close()
+            stats['lanes'] = dispatcher.stats()
+            
+            for lane in stats['lanes']:
+                logger.info(f"Voie modem {lane['modem_id']} ({lane['device_path']}): "
+                            f"{lane['sent']} envoyés, {lane['failed']} échoués, "
+                            f"{lane['throughput']} SMS/s")
+    
+    return stats
+
+class SendRequestHandler(socketserver.StreamRequestHandler):
+    """Traite les requêtes JSON (une par ligne) reçues sur le socket Unix"""
+    
+    def handle(self):
+        for raw_line in self.rfile:
+            line = raw_line.strip()
+            if not line:
+                continue
+            
+            response = self.server.dispatch(line)
+            
+            try:
+                self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+class SMSSendServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Démon d'envoi résident: garde un SMSSender chaud entre les requêtes
+    
+    Protocole: une requête JSON par ligne, une réponse JSON par ligne.
+      {"recipient": "+33612345678", "message": "Hello", "device": "/dev/ttyUSB0"}
+      {"action": "list_modems", "refresh": true}
+      {"action": "ping"}
+    La réponse d'un envoi est le même dictionnaire que --json-output.
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self, socket_path: str, sender: SMSSender = None):
+        self.socket_path = socket_path
+        self.sender = sender or SMSSender()
+        
+        socket_dir = os.path.dirname(socket_path)
+        if socket_dir:
+            os.makedirs(socket_dir, exist_ok=True)
+        
+        # Supprimer un socket orphelin laissé par une instance précédente
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        
+        super().__init__(socket_path, SendRequestHandler)
+        os.chmod(socket_path, 0o660)
+    
+    def dispatch(self, line: bytes) -> Dict[str, Any]:
+        """Décode une requête et retourne le dictionnaire de réponse"""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("objet JSON attendu")
+        except ValueError as e:
+            return {'success': False, 'error': f"Requête invalide: {e}", 'error_type': 'BAD_REQUEST'}
+        
+        action = request.get('action', 'send')
+        
+        try:
+            if action == 'ping':
+                response = {'success': True, 'pid': os.getpid()}
+                rate_limiter = self.sender.modem_manager.rate_limiter
+                if rate_limiter:
+                    response['rate_limits'] = rate_limiter.snapshot()
+                response['health'] = self.sender.modem_manager.health.snapshot()
+                response['reaper'] = self.sender.modem_manager.reaper.snapshot()
+                response['capabilities'] = self.sender.modem_manager.capabilities.snapshot()
+                return response
+            
+            if action == 'list_modems':
+                modems = self.sender.list_modems(bool(request.get('refresh')))
+                return {'success': True, 'modems': modems}
+            
+            if action == 'send':
+                return send_job(self.sender, request)
+            
+            return {'success': False, 'error': f"Action inconnue: {action}", 'error_type': 'BAD_REQUEST'}
+        
+        except Exception as e:
+            logger.error(f"Erreur système: {e}")
+            return {'success': False, 'error': str(e), 'error_type': 'SYSTEM_ERROR'}
+    
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+def serve(socket_path: str, sender: SMSSender):
+    """Lance le démon d'envoi sur le socket Unix donné"""
+    server = SMSSendServer(socket_path, sender)
+    
+    def stop(signum, frame):
+        # shutdown() bloque jusqu'à la fin de serve_forever: l'appeler hors du thread principal
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    logger.info(f"Démon d'envoi SMS en écoute sur {socket_path} (backend {server.sender.modem_manager.backend.name})")
+    server.sender.modem_manager.watch_capabilities()
+    server.sender.modem_manager.reaper.start()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        server.sender.close()
+        logger.info("Démon d'envoi SMS arrêté")
 
 def main():
     """Fonction principale"""
@@ -298,6 +584,9 @@ Exemples d'utilisation:
   %(prog)s --recipient "+33612345678" --message "Hello World"
   %(prog)s --device "/dev/ttyUSB0" --recipient "+33612345678" --message "Test"
   %(prog)s --list-modems
+  %(prog)s --serve /run/sms-gateway/send.sock
+  %(prog)s --batch jobs.ndjson
+  cat jobs.ndjson | %(prog)s --batch --parallel
         """
     )
     
@@ -313,6 +602,27 @@ Exemples d'utilisation:
                        help='Mode verbose')
     parser.add_argument('--json-output', action='store_true',
                        help='Sortie au format JSON')
+    parser.add_argument('--serve', metavar='SOCKET',
+                       help='Mode démon: accepter les requêtes JSON sur ce socket Unix')
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                       help='Mode lot: jobs JSON (un par ligne) lus depuis FILE ou stdin, '
+                            'un résultat JSON par ligne sur stdout')
+    parser.add_argument('--parallel', action='store_true',
+                       help='Mode lot: une voie d\'envoi par modem prêt (résultats dans l\'ordre de fin)')
+    parser.add_argument('--rate', type=float,
+                       help='Débit maximal par modem en SMS/s, modes --serve/--batch (défaut: 1)')
+    parser.add_argument('--burst', type=float,
+                       help='Envois consécutifs autorisés sans attente par modem (défaut: 3)')
+    parser.add_argument('--backend', choices=['auto', 'dbus', 'mmcli'],
+                       help='Accès à ModemManager (défaut: $SMS_MODEM_BACKEND ou auto)')
+    parser.add_argument('--modem-cache-ttl', type=float,
+                       help='Durée de validité de l\'inventaire des modems en secondes (défaut: 60)')
+    parser.add_argument('--metrics-listen', metavar='[HOST:]PORT',
+                       help='Modes --serve/--batch: métriques Prometheus sur http://HOST:PORT/metrics '
+                            '(défaut: $SMS_METRICS_LISTEN)')
+    parser.add_argument('--metrics-textfile', metavar='FILE',
+                       help='Modes --serve/--batch: métriques écrites périodiquement dans FILE '
+                            '(textfile collector, défaut: $SMS_METRICS_TEXTFILE)')
     
     args = parser.parse_args()
     
@@ -321,7 +631,53 @@ Exemples d'utilisation:
         logging.getLogger().setLevel(logging.DEBUG)
     
     try:
-        sender = SMSSender()
+        # Le débit n'a de sens que pour un processus qui enchaîne les envois
+        rate_limiter = None
+        exporter = None
+        backend = get_backend(args.backend)
+        if args.serve or args.batch:
+            try:
+                rate_limiter = SendRateLimiter(args.rate, args.burst)
+            except ValueError as e:
+                parser.error(str(e))
+            
+            # Métriques: processus résidents uniquement, chaque appel ModemManager est mesuré
+            exporter = metrics.MetricsExporter(args.metrics_listen, args.metrics_textfile)
+            if exporter.enabled:
+                backend = metrics.InstrumentedBackend(backend)
+            else:
+                exporter = None
+        
+        sender = SMSSender(backend, args.modem_cache_ttl, rate_limiter)
+        
+        if exporter:
+            metrics.REGISTRY.add_collector(sender.modem_manager.collect_metrics)
+            exporter.start()
+        
+        if args.serve:
+            try:
+                serve(args.serve, sender)
+            finally:
+                if exporter:
+                    exporter.stop()
+            sys.exit(0)
+        
+        if args.batch:
+            sender.modem_manager.watch_capabilities()
+            sender.modem_manager.reaper.start()
+            try:
+                if args.batch == '-':
+                    stats = run_batch(sender, sys.stdin, sys.stdout, args.parallel)
+                else:
+                    with open(args.batch, 'r', encoding='utf-8') as source:
+                        stats = run_batch(sender, source, sys.stdout, args.parallel)
+            finally:
+                sender.close()
+                if exporter:
+                    exporter.stop()
+            
+            logger.info(f"Lot terminé: {stats['total']} jobs, {stats['sent']} envoyés, {stats['failed']} échoués")
+            sys.exit(0 if stats['failed'] == 0 else 1)
         
         if args.list_modems:
             # Lister les modems
@@ -338,6 +694,7 @@ Exemples d'utilisation:
                     print(f"  Opérateur: {modem.get('operator', 'N/A')}")
                     print(f"  Signal: {modem.get('signal_quality', 'N/A')}%")
                     print(f"  Statut: {modem.get('status', 'N/A')}")
+                    print(f"  Sonde: {modem.get('probe_ms', 'N/A')} ms")
                     print()
             
             sys.exit(0)
@@ -348,15 +705,20 @@ Exemples d'utilisation:
         
         # Envoyer le SMS
         logger.info(f"Envoi SMS à {args.recipient}")
-        result = sender.send(args.recipient, args.message, args.device)
-        
-        if args.json_output:
-            print(json.dumps(result, indent=2))
-        else:
-            print("SMS envoyé avec succès!")
-            print(f"Destinataire: {result['recipient']}")
-            print(f"Modem utilisé: {result['modem_id']}")
-            print(f"Durée d'envoi: {result['send_duration']}s")
+        try:
+            result = sender.send(args.recipient, args.message, args.device)
+            
+            if args.json_output:
+                print(json.dumps(result, indent=2))
+            else:
+                print("SMS envoyé avec succès!")
+                print(f"Destinataire: {result['recipient']}")
+                print(f"Modem utilisé: {result['modem_id']}")
+                print(f"Durée d'envoi: {result['send_duration']}s")
+            sys.stdout.flush()
+        finally:
+            # Suppression du SMS de la mémoire du modem, une fois le résultat écrit
+            sender.close()
         
         sys.exit(0)
         
@@ -365,8 +727,11 @@ Exemples d'utilisation:
             error_result = {
                 'success': False,
                 'error': str(e),
-                'error_type': 'SMS_ERROR'
+                'error_type': 'SMS_ERROR',
+                'modem_error': e.modem_error
             }
+            if e.timings:
+                error_result['timings'] = e.timings
             print(json.dumps(error_result))
         else:
             logger.error(f"Erreur SMS: {e}")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Encodage des SMS: GSM 03.38 (7 bits) ou UCS-2, et découpage en segments
+Partagé par send_sms_mmcli.py et receive_sms_mmcli.py
+
+Les tables GSM sont précalculées en tables de traduction str.translate:
+classer un message et compter ses septets se fait en C, sans boucle Python
+par caractère. La boucle de découpage n'est utilisée que pour un message
+long contenant des caractères d'extension (2 septets) ou hors BMP (2 unités
+UTF-16), qui ne doivent pas être coupés entre deux segments.
+"""
+
+import os
+import sys
+import json
+import argparse
+from functools import lru_cache
+from typing import Dict, Any, List, Iterable
+
+# Alphabet GSM 03.38 de base (0x00-0x7F, sans ESC 0x1B)
+GSM_BASIC = (
+    '@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ' 'ÆæßÉ !"#¤%&\'()*+,-./0123456789:;<=>?'
+    '¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà'
+)
+# Table d'extension: chaque caractère coûte ESC + le caractère, soit 2 septets
+GSM_EXTENSION = '\f^{}\\[~]|€'
+
+GSM7 = 'GSM-7'
+UCS2 = 'UCS-2'
+
+# Capacité d'un SMS seul et d'un segment de SMS long (en-tête UDH de concaténation)
+GSM7_SINGLE = 160
+GSM7_SEGMENT = 153
+UCS2_SINGLE = 70
+UCS2_SEGMENT = 67
+
+DEFAULT_MAX_SEGMENTS = int(os.environ.get('SMS_MAX_SEGMENTS', 10))
+
+# Tables de suppression: ce qui reste après translate() est hors de l'alphabet visé
+_GSM_DELETE = str.maketrans(dict.fromkeys(GSM_BASIC + GSM_EXTENSION))
+_EXTENSION_DELETE = str.maketrans(dict.fromkeys(GSM_EXTENSION))
+
+def is_gsm7(text: str) -> bool:
+    """Indique si le texte s'encode entièrement en GSM 7 bits"""
+    return not text.translate(_GSM_DELETE)
+
+def is_unicode(text: str) -> bool:
+    """Indique si le texte impose l'encodage UCS-2"""
+    return not is_gsm7(text)
+
+def septet_count(text: str) -> int:
+    """Septets d'un texte GSM: 1 par caractère, 2 pour la table d'extension"""
+    return 2 * len(text) - len(text.translate(_EXTENSION_DELETE))
+
+def ucs2_units(text: str) -> int:
+    """Unités de 16 bits: 2 pour un caractère hors BMP (emoji...)"""
+    return len(text.encode('utf-16-le')) // 2
+
+def _unit_cost(char: str, encoding: str) -> int:
+    if encoding == GSM7:
+        return 2 if char in GSM_EXTENSION else 1
+    return 2 if ord(char) > 0xFFFF else 1
+
+def _split(text: str, encoding: str, capacity: int) -> List[str]:
+    """Découpe sans couper un caractère de 2 unités entre deux segments"""
+    segments = []
+    start = 0
+    used = 0
+    
+    for index, char in enumerate(text):
+        cost = _unit_cost(char, encoding)
+        if used + cost > capacity:
+            segments.append(text[start:index])
+            start = index
+            used = 0
+        used += cost
+    
+    segments.append(text[start:])
+    return segments
+
+@lru_cache(maxsize=4096)
+def _analyze(text: str) -> tuple:
+    if is_gsm7(text):
+        encoding, units = GSM7, septet_count(text)
+        single, capacity = GSM7_SINGLE, GSM7_SEGMENT
+    else:
+        encoding, units = UCS2, ucs2_units(text)
+        single, capacity = UCS2_SINGLE, UCS2_SEGMENT
+    
+    if units <= single:
+        return encoding, units, 1, single
+    
+    if units != len(text):
+        # Caractères de 2 unités: le nombre de segments dépend de leur position
+        parts = len(_split(text, encoding, capacity))
+    else:
+        parts = -(-units // capacity)
+    
+    return encoding, units, parts, capacity
+
+def analyze(text: str) -> Dict[str, Any]:
+    """Encodage, taille et nombre de segments d'un message
+    
+    units: septets (GSM-7) ou unités de 16 bits (UCS-2);
+    per_part: capacité d'un segment; remaining: unités libres dans le dernier.
+    """
+    encoding, units, parts, per_part = _analyze(text)
+    return {
+        'encoding': encoding,
+        'is_unicode': encoding == UCS2,
+        'length': len(text),
+        'units': units,
+        'parts': parts,
+        'per_part': per_part,
+        'remaining': max(0, parts * per_part - units)
+    }
+
+def count_parts(text: str) -> int:
+    """Nombre de SMS facturés pour ce message"""
+    return _analyze(text)[2]
+
+def split_segments(text: str) -> List[str]:
+    """Textes des segments, tels que le message sera découpé"""
+    encoding, units, parts, capacity = _analyze(text)
+    if parts == 1:
+        return [text]
+    return _split(text, encoding, capacity)
+
+def analyze_batch(messages: Iterable[str]) -> List[Dict[str, Any]]:
+    """analyze() pour une liste de messages (messages identiques analysés une fois)"""
+    seen = {}
+    results = []
+    for text in messages:
+        result = seen.get(text)
+        if result is None:
+            result = seen[text] = analyze(text)
+        results.append(dict(result))
+    return results
+
+def summarize_batch(messages: Iterable[str], max_segments: int = None) -> Dict[str, Any]:
+    """Coût d'une campagne: segments au total, messages UCS-2 et messages trop longs"""
+    max_segments = max_segments or DEFAULT_MAX_SEGMENTS
+    summary = {'messages': 0, 'parts': 0, 'unicode': 0, 'too_long': []}
+    
+    for index, result in enumerate(analyze_batch(messages)):
+        summary['messages'] += 1
+        summary['parts'] += result['parts']
+        summary['unicode'] += result['is_unicode']
+        if result['parts'] > max_segments:
+            summary['too_long'].append(index)
+    
+    summary['max_segments'] = max_segments
+    return summary
+
+def main():
+    """Chiffre une campagne: un message par ligne (texte brut ou JSON {"message": ...})"""
+    parser = argparse.ArgumentParser(description='Encodage et segments de SMS (GSM 03.38 / UCS-2)')
+    parser.add_argument('file', nargs='?', default='-', help='Fichier de messages (défaut: stdin)')
+    parser.add_argument('--max-segments', type=int, help='Segments maximum par message (défaut: 10)')
+    parser.add_argument('--details', action='store_true', help='Afficher le résultat de chaque message')
+    args = parser.parse_args()
+    
+    def read_messages(source):
+        for line in source:
+            line = line.rstrip('\n')
+            if line.startswith('{'):
+                try:
+                    line = json.loads(line).get('message', '')
+                except ValueError:
+                    pass
+            yield line
+    
+    source = sys.stdin if args.file == '-' else open(args.file, 'r', encoding='utf-8')
+    try:
+        messages = list(read_messages(source))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    
+    output = summarize_batch(messages, args.max_segments)
+    if args.details:
+        output['details'] = analyze_batch(messages)
+    
+    print(json.dumps(output, indent=2, ensure_ascii=False))
+    sys.exit(0 if not output['too_long'] else 1)
+
+if __name__ == '__main__':
+    main()
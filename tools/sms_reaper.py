@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Nettoyage en arrière-plan des SMS stockés dans les modems
+Utilisé par send_sms_mmcli.py
+
+Après un envoi, la suppression du SMS n'est plus faite dans le chemin
+d'envoi: elle est mise en file et exécutée par lots, modem par modem, quand
+le modem n'a pas d'envoi en cours. Un balayage périodique supprime aussi les
+SMS sortants orphelins (envoi interrompu, suppression ratée...). Les SMS reçus
+ne sont jamais touchés: ils appartiennent à receive_sms_mmcli.py.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Callable, List, Optional
+
+from mm_backend import ModemBackend, ModemBackendError
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Suppressions par modem à chaque passage, pour rendre vite la main aux envois
+DEFAULT_BATCH_SIZE = int(os.environ.get('SMS_REAPER_BATCH', 20))
+# Intervalle (s) entre deux balayages des SMS orphelins, 0 pour désactiver
+DEFAULT_SWEEP_INTERVAL = float(os.environ.get('SMS_REAPER_SWEEP_INTERVAL', 300))
+# Tentatives de suppression avant d'abandonner un SMS au balayage
+MAX_ATTEMPTS = 3
+
+# SMS sortants: les seuls que le balayage peut supprimer
+OUTBOUND_PDU_TYPES = ('submit',)
+# États d'un SMS sortant qui n'est plus en cours d'envoi
+FINISHED_STATES = ('sent',)
+IDLE_STATES = ('stored', 'unknown')
+
+class SMSReaper:
+    """File de suppression des SMS envoyés, vidée quand chaque modem est au repos
+    
+    lock_for(modem_id) retourne le verrou d'envoi du modem: une suppression ne
+    s'intercale jamais au milieu d'un envoi. is_busy(modem_id), si fourni,
+    signale des envois en attente sur le modem.
+    """
+    
+    def __init__(self, backend: ModemBackend, lock_for: Callable[[str], threading.Lock],
+                 is_busy: Callable[[str], bool] = None, modems_fn: Callable[[], List[str]] = None,
+                 batch_size: int = None, sweep_interval: float = None):
+        self.backend = backend
+        self.lock_for = lock_for
+        self.is_busy = is_busy or (lambda modem_id: False)
+        # Modems à balayer; sans fonction, seuls ceux ayant eu des suppressions
+        self.modems_fn = modems_fn
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.sweep_interval = DEFAULT_SWEEP_INTERVAL if sweep_interval is None else sweep_interval
+        self.stats = {'deleted': 0, 'failed': 0, 'swept': 0}
+        self._delete_ms = {}      # modem_id -> durée (ms) de la dernière suppression
+        self._pending = {}        # modem_id -> deque[(sms_id, tentatives)]
+        self._suspects = {}       # modem_id -> SMS sortants non envoyés vus au balayage précédent
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._last_sweep = time.monotonic()
+    
+    def schedule(self, modem_id: str, sms_id: str):
+        """Met un SMS en file de suppression"""
+        with self._lock:
+            self._pending.setdefault(modem_id, deque()).append((sms_id, 0))
+        self._wakeup.set()
+    
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._pending.values())
+    
+    def pending_by_modem(self) -> Dict[str, int]:
+        with self._lock:
+            return {modem_id: len(queue) for modem_id, queue in self._pending.items()}
+    
+    def start(self) -> 'SMSReaper':
+        """Démarre le thread de nettoyage (processus résidents)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='sms-reaper', daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self, flush_timeout: float = 30):
+        """Arrête le thread puis supprime ce qui reste en file"""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush(flush_timeout)
+    
+    def flush(self, timeout: float = 30):
+        """Supprime tout de suite les SMS en file (attend la fin des envois en cours)"""
+        deadline = time.monotonic() + timeout
+        
+        for modem_id in self._modems_with_pending():
+            lock = self.lock_for(modem_id)
+            if not lock.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                logger.warning(f"Nettoyage du modem {modem_id} abandonné: modem occupé")
+                continue
+            try:
+                while self._reap_batch(modem_id):
+                    pass
+            finally:
+                lock.release()
+    
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(timeout=1.0)
+            self._wakeup.clear()
+            
+            for modem_id in self._modems_with_pending():
+                self._reap_when_idle(modem_id)
+            
+            if self.sweep_interval and time.monotonic() - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = time.monotonic()
+                self.sweep()
+    
+    def _modems_with_pending(self) -> List[str]:
+        with self._lock:
+            return [modem_id for modem_id, queue in self._pending.items() if queue]
+    
+    def _reap_when_idle(self, modem_id: str):
+        """Un lot de suppressions si aucun envoi n'est en cours ni en attente sur le modem"""
+        if self.is_busy(modem_id):
+            return
+        
+        lock = self.lock_for(modem_id)
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            if self._reap_batch(modem_id):
+                # Il en reste: repasser sans attendre, un envoi aura pu prendre le verrou entre-temps
+                self._wakeup.set()
+        finally:
+            lock.release()
+    
+    def _reap_batch(self, modem_id: str) -> bool:
+        """Supprime jusqu'à batch_size SMS du modem; retourne True s'il en reste"""
+        with self._lock:
+            queue = self._pending.get(modem_id)
+            batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))] if queue else []
+        
+        retry = []
+        for sms_id, attempts in batch:
+            start = time.perf_counter()
+            try:
+                deleted = self.backend.delete_sms(modem_id, sms_id)
+            except ModemBackendError as e:
+                logger.debug(f"Suppression du SMS {sms_id} impossible: {e}")
+                deleted = False
+            
+            if deleted:
+                duration = time.perf_counter() - start
+                self.stats['deleted'] += 1
+                self._delete_ms[modem_id] = round(duration * 1000, 3)
+                metrics.REAPER_DELETE_SECONDS.observe(duration, modem=modem_id)
+            elif attempts + 1 < MAX_ATTEMPTS:
+                retry.append((sms_id, attempts + 1))
+            else:
+                self.stats['failed'] += 1
+                logger.warning(f"Impossible de supprimer le SMS {sms_id} de la mémoire "
+                               f"du modem {modem_id}, laissé au balayage")
+        
+        with self._lock:
+            queue = self._pending.setdefault(modem_id, deque())
+            queue.extend(retry)
+            return bool(queue) and bool(batch)
+    
+    def sweep(self):
+        """Supprime les SMS sortants orphelins restés dans la mémoire des modems
+        
+        Un SMS sortant déjà envoyé est supprimé tout de suite; un SMS sortant
+        jamais envoyé (créé puis abandonné) seulement s'il était déjà là au
+        balayage précédent, pour ne pas gêner un envoi d'un autre processus.
+        """
+        try:
+            modem_ids = self.modems_fn() if self.modems_fn else list(self._pending)
+        except Exception as e:
+            logger.warning(f"Balayage des SMS orphelins impossible: {e}")
+            return
+        
+        for modem_id in modem_ids:
+            if self.is_busy(modem_id):
+                continue
+            
+            lock = self.lock_for(modem_id)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                self._sweep_modem(modem_id)
+            except ModemBackendError as e:
+                logger.warning(f"Balayage du modem {modem_id} impossible: {e}")
+            finally:
+                lock.release()
+    
+    def _sweep_modem(self, modem_id: str):
+        with self._lock:
+            queued = {sms_id for sms_id, _ in self._pending.get(modem_id, ())}
+        previous = self._suspects.get(modem_id, set())
+        suspects = set()
+        
+        for sms_id in self.backend.list_sms(modem_id):
+            if sms_id in queued:
+                continue
+            
+            sms = self.backend.get_sms(sms_id)
+            if not sms or sms.get('pdu_type') not in OUTBOUND_PDU_TYPES:
+                continue
+            
+            state = sms.get('state', 'unknown')
+            if state in FINISHED_STATES or (state in IDLE_STATES and sms_id in previous):
+                if self.backend.delete_sms(modem_id, sms_id):
+                    self.stats['swept'] += 1
+                    logger.info(f"SMS orphelin {sms_id} ({state}) supprimé du modem {modem_id}")
+            elif state in IDLE_STATES:
+                suspects.add(sms_id)
+        
+        self._suspects[modem_id] = suspects
+    
+    def delete_ms(self, modem_id: str) -> Optional[float]:
+        """Durée (ms) de la dernière suppression réussie sur le modem, None si aucune"""
+        return self._delete_ms.get(modem_id)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.stats, pending=self.pending(), delete_ms=dict(self._delete_ms))
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Journal local des SMS reçus, en ajout seul avec fsync groupés
+Utilisé par receive_sms_mmcli.py
+
+Chaque SMS lu sur un modem est d'abord ajouté au journal et n'est supprimé
+du modem qu'une fois l'écriture sur disque confirmée (fdatasync). Les ajouts
+concurrents des threads de réception partagent un même fdatasync
+(validation groupée). Le journal est ensuite relu depuis le point de reprise
+et écrit en base par lots: la vidange des modems n'attend plus la base, et
+un SMS lu survit à une indisponibilité de MySQL comme à un arrêt du démon.
+Le point de reprise n'avance qu'après l'écriture en base: un SMS peut être
+rejoué deux fois, la clé unique_sms écarte alors le doublon.
+
+Fichiers du répertoire: segments spool-<numéro>.log (une ligne JSON par SMS),
+checkpoint ("<segment> <position>"), lock (un seul processus à la fois) et
+rejected.log (SMS refusés par la base, gardés avec l'erreur pour reprise manuelle).
+"""
+
+import os
+import json
+import fcntl
+import logging
+import threading
+from typing import Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Répertoire du journal (doit survivre aux redémarrages), commun au démon systemd et à la
+# tâche cron pour que chacun rejoue ce que l'autre a laissé, et taille d'un segment (octets)
+DEFAULT_SPOOL_DIR = os.environ.get('SMS_RECEIVE_SPOOL_DIR', '/var/lib/sms-gateway/receive-spool')
+DEFAULT_SEGMENT_SIZE = int(os.environ.get('SMS_RECEIVE_SPOOL_SEGMENT_SIZE', 4 * 1024 * 1024))
+
+SEGMENT_PREFIX = 'spool-'
+SEGMENT_SUFFIX = '.log'
+
+_fdatasync = getattr(os, 'fdatasync', os.fsync)
+
+class SpoolError(Exception):
+    """Journal inutilisable (disque plein, droits, déjà ouvert par un autre processus)"""
+    pass
+
+class Spool:
+    """Journal des SMS reçus: append() durable, puis read()/commit() par le rejoueur"""
+    
+    def __init__(self, directory: str = None, segment_size: int = None):
+        self.directory = directory or DEFAULT_SPOOL_DIR
+        self.segment_size = segment_size or DEFAULT_SEGMENT_SIZE
+        self._lock = threading.Lock()          # segment actif et compteurs
+        self._sync_lock = threading.Lock()     # un seul fdatasync à la fois
+        self._lock_fd = None
+        self._fd = None
+        self._segment = 0
+        self._size = 0
+        self._written = 0                      # ajouts depuis l'ouverture
+        self._synced = 0                       # ajouts déjà sur disque
+        self._pending = 0                      # lignes pas encore écrites en base
+        self._checkpoint = (0, 0)
+    
+    @property
+    def opened(self) -> bool:
+        return self._fd is not None
+    
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:08d}{SEGMENT_SUFFIX}")
+    
+    def _segments(self) -> List[int]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    segments.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(segments)
+    
+    def open(self) -> 'Spool':
+        """Verrouille le répertoire, répare la fin du dernier segment et compte les SMS à rejouer"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._lock_fd = os.open(os.path.join(self.directory, 'lock'), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+                raise SpoolError(f"Spool {self.directory} already in use by another process")
+            
+            self._checkpoint = self._load_checkpoint()
+            segments = self._segments()
+            self._segment = segments[-1] if segments else self._checkpoint[0]
+            self._repair(self._segment_path(self._segment))
+            self._fd = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            self._size = os.fstat(self._fd).st_size
+            self._sync_directory()
+            self._pending = self._count_pending()
+        except OSError as e:
+            raise SpoolError(f"Cannot open spool {self.directory}: {e}")
+        
+        if self._pending:
+            logger.info(f"{self._pending} received SMS left in the spool, replaying them")
+        return self
+    
+    def _load_checkpoint(self) -> Tuple[int, int]:
+        try:
+            with open(os.path.join(self.directory, 'checkpoint'), 'r') as f:
+                segment, offset = f.read().split()
+                return int(segment), int(offset)
+        except FileNotFoundError:
+            segments = self._segments()
+            return (segments[0] if segments else 0), 0
+        except ValueError:
+            logger.error(f"Invalid spool checkpoint in {self.directory}, replaying from the oldest segment")
+            segments = self._segments()
+            return (segments[0] if segments else 0), 0
+    
+    @staticmethod
+    def _repair(path: str):
+        # Arrêt brutal pendant un ajout: la dernière ligne incomplète n'a jamais été confirmée
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                end = data.rfind(b'\n') + 1
+                f.truncate(end)
+                logger.warning(f"Truncated incomplete spool record at the end of {path}")
+    
+    def _count_pending(self) -> int:
+        count = 0
+        segment, offset = self._checkpoint
+        for current in self._segments():
+            if current < segment:
+                continue
+            with open(self._segment_path(current), 'rb') as f:
+                if current == segment:
+                    f.seek(offset)
+                count += f.read().count(b'\n')
+        return count
+    
+    def append(self, record: Dict[str, Any]):
+        """Ajoute un SMS au journal; il est sur disque au retour (SpoolError sinon)"""
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        
+        try:
+            if self._size >= self.segment_size:
+                with self._sync_lock, self._lock:
+                    if self._size >= self.segment_size:
+                        self._rotate()
+            
+            with self._lock:
+                view = memoryview(line)
+                try:
+                    while view:
+                        view = view[os.write(self._fd, view):]
+                except OSError:
+                    # Disque plein en cours d'écriture: pas de ligne tronquée avant l'ajout suivant
+                    os.ftruncate(self._fd, self._size)
+                    raise
+                self._size += len(line)
+                self._written += 1
+                self._pending += 1
+                sequence = self._written
+            
+            self._sync(sequence)
+        except OSError as e:
+            raise SpoolError(f"Cannot write to spool {self.directory}: {e}")
+    
+    def _sync(self, sequence: int):
+        # Validation groupée: un fdatasync couvre tous les ajouts faits avant lui
+        with self._sync_lock:
+            if self._synced >= sequence:
+                return
+            with self._lock:
+                fd = self._fd
+                target = self._written
+            _fdatasync(fd)
+            self._synced = target
+    
+    def _rotate(self):
+        # Appelé sous _sync_lock et _lock: le segment plein est complet et sur disque
+        _fdatasync(self._fd)
+        self._synced = self._written
+        os.close(self._fd)
+        self._segment += 1
+        self._fd = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self._size = 0
+        self._sync_directory()
+    
+    def _sync_directory(self):
+        # Un segment créé doit rester visible après une coupure de courant
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def read(self, limit: int) -> Tuple[List[Dict[str, Any]], Tuple[int, int], int]:
+        """Lit au plus limit SMS depuis le point de reprise
+        
+        Retourne les SMS, la position à passer à commit() une fois écrits en
+        base, et le nombre de lignes consommées (lignes illisibles comprises).
+        """
+        segment, offset = self._checkpoint
+        records = []
+        lines = 0
+        
+        while len(records) < limit:
+            path = self._segment_path(segment)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    for raw in f:
+                        # Ligne en cours d'ajout par un autre thread: lue au prochain passage
+                        if not raw.endswith(b'\n'):
+                            break
+                        offset += len(raw)
+                        lines += 1
+                        try:
+                            records.append(json.loads(raw))
+                        except ValueError:
+                            logger.error(f"Skipping unreadable spool record in {path} at offset {offset - len(raw)}")
+                        if len(records) >= limit:
+                            break
+            
+            if len(records) >= limit:
+                break
+            with self._lock:
+                active = self._segment
+            if segment >= active:
+                break
+            segment, offset = segment + 1, 0
+        
+        return records, (segment, offset), lines
+    
+    def commit(self, position: Tuple[int, int], lines: int):
+        """Avance le point de reprise après écriture en base et supprime les segments entièrement rejoués"""
+        path = os.path.join(self.directory, 'checkpoint')
+        temp_path = path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(f"{position[0]} {position[1]}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            
+            for segment in self._segments():
+                if segment < position[0]:
+                    os.remove(self._segment_path(segment))
+        except OSError as e:
+            raise SpoolError(f"Cannot update spool checkpoint: {e}")
+        
+        with self._lock:
+            self._checkpoint = position
+            self._pending = max(0, self._pending - lines)
+    
+    def reject(self, record: Dict[str, Any], error: str):
+        """Met de côté un SMS que la base refuse, pour que le rejeu continue sans le perdre"""
+        # Ligne du journal qui n'est pas un objet JSON: gardée telle quelle sous 'record'
+        rejected = dict(record, error=error) if isinstance(record, dict) else {'record': record, 'error': error}
+        line = (json.dumps(rejected, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        try:
+            fd = os.open(os.path.join(self.directory, 'rejected.log'), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line)
+                _fdatasync(fd)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            raise SpoolError(f"Cannot write rejected SMS to spool {self.directory}: {e}")
+    
+    def pending(self) -> int:
+        """SMS journalisés pas encore écrits en base"""
+        with self._lock:
+            return self._pending
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'directory': self.directory, 'pending': self._pending, 'segment': self._segment,
+                    'checkpoint': list(self._checkpoint), 'appended': self._written}
+    
+    def close(self):
+        with self._sync_lock, self._lock:
+            if self._fd is not None:
+                _fdatasync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
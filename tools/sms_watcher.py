@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Détection des SMS entrants au fil de l'eau pour receive_sms_mmcli.py
+
+Avec le backend D-Bus, chaque SMS reçu est signalé par ModemManager
+(Messaging.Added): il est traité quelques millisecondes après son arrivée.
+mmcli n'offre pas de suivi des SMS: le backend mmcli (ou un backend sans
+boucle GLib) se rabat sur une interrogation légère, la seule liste des SMS
+de chaque modem à intervalle court, sans lecture du détail des SMS déjà vus.
+Dans les deux cas les SMS nouveaux sont placés dans une file consommée par
+le démon, qui garde un balayage complet lent en filet de sécurité.
+"""
+
+import os
+import queue
+import logging
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from mm_backend import ModemBackend, ModemBackendError
+
+logger = logging.getLogger(__name__)
+
+# Intervalle (s) de l'interrogation de repli quand le backend ne notifie pas
+DEFAULT_POLL_INTERVAL = float(os.environ.get('SMS_RECEIVE_POLL_INTERVAL', 2))
+# Intervalle (s) du balayage complet de sécurité (SMS manqués, modems rebranchés)
+DEFAULT_SWEEP_INTERVAL = float(os.environ.get('SMS_RECEIVE_SWEEP_INTERVAL', 300))
+# SMS signalé avant la fin de sa réception (multipart): nouvel essai toutes les RETRY_DELAY s
+RETRY_DELAY = 5.0
+MAX_RETRIES = 12
+
+MODE_SIGNAL = 'signal'
+MODE_POLL = 'poll'
+
+class SMSWatcher:
+    """File des SMS entrants (modem_id, sms_id), alimentée par signaux ou interrogation
+    
+    modems_fn() retourne les IDs des modems prêts (interrogation de repli).
+    """
+    
+    def __init__(self, backend: ModemBackend, modems_fn: Callable[[], List[str]],
+                 poll_interval: float = None):
+        self.backend = backend
+        self.modems_fn = modems_fn
+        self.poll_interval = poll_interval or DEFAULT_POLL_INTERVAL
+        self.mode = None
+        self._queue = queue.Queue()
+        self._seen = {}           # modem_id -> IDs vus à la dernière interrogation
+        self._retries = {}        # (modem_id, sms_id) -> essais déjà replanifiés
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+    
+    def start(self) -> 'SMSWatcher':
+        if self.backend.watch_sms(self._notify):
+            self.mode = MODE_SIGNAL
+            logger.info("Réception sur signal ModemManager (Messaging.Added)")
+        else:
+            self.mode = MODE_POLL
+            self._thread = threading.Thread(target=self._poll_loop, name='sms-watch-poll', daemon=True)
+            self._thread.start()
+            logger.info(f"Réception par interrogation des listes de SMS toutes les {self.poll_interval:g}s")
+        return self
+    
+    def stop(self):
+        self._stopping.set()
+        if self.mode == MODE_SIGNAL:
+            self.backend.stop_watch()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _notify(self, modem_id: str, sms_id: str):
+        self._queue.put((modem_id, sms_id))
+    
+    def retry(self, modem_id: str, sms_id: str):
+        """Resignale un SMS plus tard (réception pas terminée); abandon au balayage après MAX_RETRIES"""
+        key = (modem_id, sms_id)
+        with self._lock:
+            attempts = self._retries.get(key, 0) + 1
+            if attempts > MAX_RETRIES:
+                self._retries.pop(key, None)
+                return
+            self._retries[key] = attempts
+        
+        timer = threading.Timer(RETRY_DELAY, self._notify, key)
+        timer.daemon = True
+        timer.start()
+    
+    def done(self, modem_id: str, sms_id: str):
+        with self._lock:
+            self._retries.pop((modem_id, sms_id), None)
+    
+    def get(self, timeout: float) -> Optional[Tuple[str, str]]:
+        """Prochain SMS signalé, ou None après timeout secondes sans SMS"""
+        try:
+            return self._queue.get(timeout=max(0.0, timeout))
+        except queue.Empty:
+            return None
+    
+    def _poll_loop(self):
+        while not self._stopping.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Interrogation des SMS impossible: {e}")
+    
+    def poll(self):
+        """Signale les SMS apparus sur chaque modem depuis l'interrogation précédente"""
+        modem_ids = self.modems_fn()
+        
+        for modem_id in modem_ids:
+            try:
+                sms_ids = self.backend.list_sms(modem_id)
+            except ModemBackendError as e:
+                logger.debug(f"Liste des SMS du modem {modem_id} impossible: {e}")
+                continue
+            
+            previous = self._seen.get(modem_id)
+            # Premier passage: ce qui est déjà stocké revient au balayage complet
+            if previous is not None:
+                for sms_id in sms_ids:
+                    if sms_id not in previous:
+                        self._notify(modem_id, sms_id)
+            self._seen[modem_id] = set(sms_ids)
+        
+        for modem_id in set(self._seen) - set(modem_ids):
+            del self._seen[modem_id]
@@ -0,0 +1,40 @@
+"""
+Tests des modules Python de tools/ (lancer: python3 -m pytest tools/tests)
+
+Les scripts de tools/ s'importent entre eux par leur nom de fichier:
+le répertoire est ajouté au chemin d'import comme quand ils sont lancés.
+Les tests de la réception écrivent dans une base SQLite par le remplaçant
+de mysql.connector des benchmarks, et parlent au simulateur de modems.
+"""
+
+import os
+import sys
+
+import pytest
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TOOLS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(TOOLS_DIR), 'benchmarks'))
+
+@pytest.fixture
+def simulator(tmp_path):
+    """Simulateur sans latence ni SMS entrant aléatoire, un modem par défaut"""
+    from mm_simulator.world import Simulator, load_config
+    
+    config = load_config()
+    config.update({'modems': 1, 'seed': 1})
+    config['latency'] = {operation: 0.0 for operation in config['latency']}
+    simulator = Simulator(config, str(tmp_path / 'simulator.json'))
+    simulator.reset()
+    return simulator
+
+@pytest.fixture
+def sqlite_db(tmp_path, simulator):
+    """Configuration d'une base SQLite neuve, modems du simulateur déclarés"""
+    import sqlite_standin
+    sqlite_standin.install()
+    
+    database = str(tmp_path / 'receive.sqlite')
+    sqlite_standin.create_schema(database, [simulator.modem(modem_id)['primary_port']
+                                            for modem_id in simulator.modem_ids()])
+    return {'host': None, 'port': None, 'user': None, 'password': None, 'database': database}
@@ -0,0 +1,156 @@
+"""Pool de connexions de la réception (db_pool), sur un connecteur simulé"""
+
+import pytest
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+class Server:
+    """Serveur MySQL simulé sur SQLite: peut être arrêté, ou redémarré (connexions coupées)"""
+    
+    def __init__(self, standin, database):
+        self.open_database = standin.connect
+        self.database = database
+        self.up = True
+        self.generation = 0
+        self.attempts = 0
+        
+        class Gone(standin.Error):
+            def __init__(self, message, errno):
+                super().__init__(message)
+                self.errno = errno
+        self.Gone = Gone
+    
+    def connect(self, **kwargs):
+        self.attempts += 1
+        if not self.up:
+            raise self.Gone("Can't connect to MySQL server", 2003)
+        return Connection(self, self.open_database(database=self.database))
+    
+    def restart(self):
+        self.generation += 1
+
+class Connection:
+    def __init__(self, server, connection):
+        self.server = server
+        self.connection = connection
+        self.generation = server.generation
+    
+    def _check(self):
+        if self.generation != self.server.generation:
+            raise self.server.Gone("MySQL server has gone away", 2006)
+    
+    def ping(self, reconnect=False):
+        self._check()
+    
+    def cursor(self, **kwargs):
+        connection = self
+        cursor = self.connection.cursor()
+        
+        class Cursor:
+            def execute(self, query, params=()):
+                connection._check()
+                cursor.execute(query, params)
+            
+            def __getattr__(self, name):
+                return getattr(cursor, name)
+        return Cursor()
+    
+    def close(self):
+        self.connection.close()
+
+@pytest.fixture
+def clock(monkeypatch):
+    import db_pool
+    clock = Clock()
+    monkeypatch.setattr(db_pool.time, 'monotonic', clock)
+    return clock
+
+@pytest.fixture
+def server(sqlite_db, monkeypatch):
+    import sqlite_standin
+    import db_pool
+    server = Server(sqlite_standin, sqlite_db['database'])
+    monkeypatch.setattr(db_pool.mysql.connector, 'connect', server.connect)
+    return server
+
+@pytest.fixture
+def make_pool(sqlite_db):
+    from db_pool import ConnectionPool
+    pools = []
+    
+    def make_pool(**kwargs):
+        pool = ConnectionPool(sqlite_db, size=1, **kwargs)
+        pools.append(pool)
+        return pool
+    yield make_pool
+    for pool in pools:
+        pool.close()
+
+def count_modems(session):
+    return session.fetch_one("SELECT COUNT(*) FROM modems")[0]
+
+def test_idle_connection_is_pinged_and_replaced_when_lost(server, make_pool, clock):
+    pool = make_pool(ping_interval=60)
+    assert pool.run('count', count_modems) == 1
+    
+    # Récente: prêtée sans ping
+    clock.now += 59
+    pool.run('count', count_modems)
+    assert pool.stats['pings'] == 0
+    
+    server.restart()
+    clock.now += 60
+    assert pool.run('count', count_modems) == 1
+    assert pool.stats == {'connects': 2, 'connect_failures': 0, 'reconnects': 1, 'pings': 1}
+
+def test_call_is_replayed_once_on_a_new_connection(server, make_pool, clock):
+    pool = make_pool(ping_interval=600)
+    pool.run('count', count_modems)
+    
+    server.restart()
+    assert pool.run('count', count_modems) == 1
+    assert pool.stats['reconnects'] == 1 and pool.stats['connects'] == 2
+    
+    # Coupée à nouveau pendant le rejeu: pas de second rejeu
+    from db_pool import DatabaseUnavailable
+    calls = []
+    
+    def cut_every_time(session):
+        calls.append(session)
+        server.restart()
+        return count_modems(session)
+    
+    with pytest.raises(DatabaseUnavailable):
+        pool.run('count', cut_every_time)
+    assert len(calls) == 2
+
+def test_connection_attempts_back_off_up_to_the_maximum(server, make_pool, clock):
+    from db_pool import DatabaseUnavailable
+    pool = make_pool(max_backoff=3)
+    server.up = False
+    
+    delays = []
+    for _ in range(5):
+        with pytest.raises(DatabaseUnavailable):
+            pool.run('count', count_modems)
+        delays.append(pool._retry_at - clock.now)
+        
+        # Pendant l'attente: échec immédiat, sans tentative de connexion
+        attempts = server.attempts
+        assert not pool.available()
+        with pytest.raises(DatabaseUnavailable):
+            pool.run('count', count_modems)
+        assert server.attempts == attempts
+        clock.now = pool._retry_at
+    
+    assert delays == [0.5, 1.0, 2.0, 3.0, 3.0]
+    
+    server.up = True
+    assert pool.available()
+    assert pool.run('count', count_modems) == 1
+    assert pool.stats['connect_failures'] == 5 and pool._failures == 0
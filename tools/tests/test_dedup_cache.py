@@ -0,0 +1,67 @@
+"""Cache de déduplication des SMS reçus (dedup_cache)"""
+
+from datetime import datetime
+
+import dedup_cache
+from dedup_cache import DedupCache, content_key
+
+RECEIVED_AT = datetime(2024, 3, 1, 10, 15)
+
+class Clock:
+    """Horloge monotone pilotée par le test"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+def test_content_key():
+    key = content_key('+212612345678', 'Bonjour', RECEIVED_AT)
+    assert len(key) == 16
+    assert key == content_key('+212612345678', 'Bonjour', RECEIVED_AT)
+    assert key != content_key('+212612345678', 'Bonjour ', RECEIVED_AT)
+    assert key != content_key('+212612345679', 'Bonjour', RECEIVED_AT)
+    assert key != content_key('+212612345678', 'Bonjour', RECEIVED_AT.replace(second=1))
+
+def test_seen_records_the_key():
+    cache = DedupCache(window=60, max_entries=10)
+    key = content_key('+212612345678', 'Bonjour', RECEIVED_AT)
+    assert cache.seen(key) is False
+    assert cache.seen(key) is True
+    assert len(cache) == 1
+    assert cache.snapshot()['hits'] == 1 and cache.snapshot()['misses'] == 1
+
+def test_oldest_entry_is_evicted_beyond_max_entries():
+    cache = DedupCache(window=60, max_entries=3)
+    for key in (b'a', b'b', b'c', b'd'):
+        assert not cache.seen(key)
+    assert len(cache) == 3
+    assert cache.stats['evicted'] == 1
+    assert cache.seen(b'd') and cache.seen(b'b')
+    assert not cache.seen(b'a')
+
+def test_entries_expire_after_the_window(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dedup_cache.time, 'monotonic', clock)
+    cache = DedupCache(window=60, max_entries=10)
+    
+    cache.seen(b'a')
+    clock.now += 30
+    cache.seen(b'b')
+    clock.now += 30
+    assert cache.seen(b'b')
+    assert not cache.seen(b'a')
+    assert cache.stats['expired'] == 1
+    
+    clock.now += 120
+    cache.seen(b'c')
+    assert len(cache) == 1
+    assert cache.stats['expired'] == 3
+
+def test_forget():
+    cache = DedupCache(window=60, max_entries=10)
+    cache.seen(b'a')
+    cache.forget(b'a')
+    cache.forget(b'unknown')
+    assert not cache.seen(b'a')
@@ -0,0 +1,100 @@
+"""Analyse de la sortie machine de mmcli, -J et -K (mmcli_parser)"""
+
+import json
+
+import mmcli_parser
+
+MODEM_KEYVALUE = """\
+modem.dbus-path                                 : /org/freedesktop/ModemManager1/Modem/0
+modem.generic.manufacturer                      : QUALCOMM INCORPORATED
+modem.generic.primary-port                      : cdc-wdm0
+modem.generic.ports.length                      : 2
+modem.generic.ports.value[1]                    : cdc-wdm0 (qmi)
+modem.generic.ports.value[2]                    : ttyUSB2 (at)
+modem.generic.state                             : registered
+modem.generic.signal-quality.value              : 67
+modem.generic.signal-quality.recent             : yes
+modem.3gpp.imei                                 : 867962040123456
+modem.3gpp.operator-name                        : Maroc Telecom
+modem.messaging.supported-storages.length       : 2
+modem.messaging.supported-storages.value[1]     : sm
+modem.messaging.supported-storages.value[2]     : me
+modem.messaging.default-storages.length         : 1
+modem.messaging.default-storages.value[1]       : me
+"""
+
+SMS_KEYVALUE = """\
+sms.dbus-path                 : /org/freedesktop/ModemManager1/SMS/21
+sms.content.number            : +212612345678
+sms.content.text              : Bonjour
+la suite : sur deux lignes
+sms.content.data              : --
+sms.properties.pdu-type       : deliver
+sms.properties.state          : received
+sms.properties.timestamp      : 2024-03-01T10:15:00+01:00
+"""
+
+def test_keyvalue_arrays_become_lists():
+    flat = mmcli_parser.parse(MODEM_KEYVALUE, mmcli_parser.KEYVALUE)
+    assert flat['modem.generic.ports'] == ['cdc-wdm0 (qmi)', 'ttyUSB2 (at)']
+    assert flat['modem.generic.state'] == 'registered'
+
+def test_keyvalue_modem_record():
+    flat = mmcli_parser.parse_keyvalue(MODEM_KEYVALUE)
+    assert mmcli_parser.modem_record(flat, '0') == {
+        'id': '0', 'status': 'ready', 'state': 'registered', 'device_path': 'cdc-wdm0',
+        'imei': '867962040123456', 'operator': 'Maroc Telecom', 'signal_quality': 67
+    }
+    assert mmcli_parser.messaging_capabilities(flat) == {
+        'supported_storages': ['sm', 'me'], 'default_storage': 'me', 'messaging_ready': True
+    }
+
+def test_keyvalue_multiline_sms_text_is_kept():
+    flat = mmcli_parser.parse_keyvalue(SMS_KEYVALUE)
+    record = mmcli_parser.sms_record(flat, '21')
+    assert record == {
+        'id': '21', 'state': 'received', 'pdu_type': 'deliver', 'sender': '+212612345678',
+        'message': 'Bonjour\nla suite : sur deux lignes', 'timestamp': '2024-03-01T10:15:00+01:00'
+    }
+    assert mmcli_parser.value(flat, 'sms.content.data') is None
+
+def test_json_matches_keyvalue():
+    output = json.dumps({'sms': {
+        'dbus-path': '/org/freedesktop/ModemManager1/SMS/21',
+        'content': {'number': '+212612345678', 'text': 'Bonjour\nla suite : sur deux lignes', 'data': '--'},
+        'properties': {'pdu-type': 'deliver', 'state': 'received', 'timestamp': '2024-03-01T10:15:00+01:00'}
+    }})
+    assert (mmcli_parser.sms_record(mmcli_parser.parse(output), '21')
+            == mmcli_parser.sms_record(mmcli_parser.parse_keyvalue(SMS_KEYVALUE), '21'))
+
+def test_modem_not_ready_and_missing_fields():
+    flat = mmcli_parser.parse_json(json.dumps({'modem': {'generic': {'state': 'searching', 'primary-port': '--'}}}))
+    assert mmcli_parser.modem_record(flat, '3') == {'id': '3', 'status': 'not_ready', 'state': 'searching'}
+    assert mmcli_parser.messaging_capabilities(flat)['messaging_ready'] is False
+
+def test_modem_and_sms_lists():
+    flat = mmcli_parser.parse_json(json.dumps({'modem-list': [
+        '/org/freedesktop/ModemManager1/Modem/0', '/org/freedesktop/ModemManager1/Modem/4']}))
+    assert mmcli_parser.modem_ids(flat) == ['0', '4']
+    
+    flat = mmcli_parser.parse_keyvalue(
+        "modem.messaging.sms.length    : 2\n"
+        "modem.messaging.sms.value[1]  : /org/freedesktop/ModemManager1/SMS/21\n"
+        "modem.messaging.sms.value[2]  : /org/freedesktop/ModemManager1/SMS/22\n")
+    assert mmcli_parser.sms_ids(flat) == ['21', '22']
+    
+    flat = mmcli_parser.parse_keyvalue("modem.messaging.sms.length    : 0\n")
+    assert mmcli_parser.sms_ids(flat) == []
+    assert mmcli_parser.modem_ids(mmcli_parser.parse_json('')) == []
+
+def test_values_splits_comma_separated_strings():
+    assert mmcli_parser.values({'key': 'sm, me, --'}, 'key') == ['sm', 'me']
+    assert mmcli_parser.values({'key': '--'}, 'key') == []
+
+def test_object_ids():
+    assert mmcli_parser.object_id('/org/freedesktop/ModemManager1/SMS/21') == '21'
+    assert mmcli_parser.object_id('/org/freedesktop/ModemManager1/Modem/0 ') == '0'
+    assert mmcli_parser.object_id('') is None
+    assert mmcli_parser.created_sms_id(
+        'Successfully created new SMS: /org/freedesktop/ModemManager1/SMS/21') == '21'
+    assert mmcli_parser.created_sms_id('error: couldn\'t create new SMS') is None
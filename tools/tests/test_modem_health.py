@@ -0,0 +1,75 @@
+"""Santé des modems et disjoncteurs (modem_health)"""
+
+import pytest
+
+import modem_health
+from modem_health import CircuitBreaker, HealthTracker
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(modem_health.time, 'monotonic', clock)
+    return clock
+
+def test_breaker_opens_then_doubles_its_cooldown_after_a_failed_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30, max_cooldown=100)
+    
+    assert breaker.record(False, clock()) is None
+    assert breaker.record(False, clock()) is None
+    assert breaker.state == 'closed' and breaker.allow(clock())
+    
+    assert breaker.record(False, clock()) == 'opened'
+    assert breaker.state == 'open'
+    assert not breaker.allow(clock())
+    
+    # Repos écoulé: un seul essai, les autres envois restent écartés
+    clock.now += 30
+    assert breaker.allow(clock())
+    assert breaker.state == 'half_open'
+    assert not breaker.allow(clock())
+    
+    assert breaker.record(False, clock()) == 'opened'
+    assert breaker.state == 'open' and breaker.cooldown == 60
+    clock.now += 59
+    assert not breaker.allow(clock())
+    clock.now += 1
+    assert breaker.allow(clock())
+    
+    # Plafonné à max_cooldown
+    breaker.record(False, clock())
+    assert breaker.cooldown == 100
+    
+    clock.now += 100
+    assert breaker.allow(clock())
+    assert breaker.record(True, clock()) == 'closed'
+    assert breaker.state == 'closed' and breaker.cooldown == 30 and breaker.failures == 0
+
+def test_cancelled_trial_leaves_the_breaker_open_with_the_trial_available(clock):
+    tracker = HealthTracker(failure_threshold=1, cooldown=30)
+    tracker.begin('0')
+    tracker.end('0', False, 1.0, 'Erreur envoi SMS')
+    
+    clock.now += 30
+    assert tracker.allow('0')
+    tracker.begin('0')
+    tracker.cancel('0')
+    
+    state = tracker.snapshot()['0']
+    assert state['state'] == 'open' and state['in_flight'] == 0
+    assert state['samples'] == 1 and state['consecutive_failures'] == 1
+    assert tracker.allow('0')
+
+def test_cancel_does_not_count_against_a_healthy_modem(clock):
+    tracker = HealthTracker(failure_threshold=1, cooldown=30)
+    tracker.begin('0')
+    tracker.cancel('0')
+    
+    state = tracker.snapshot()['0']
+    assert state['state'] == 'closed' and state['samples'] == 0 and state['in_flight'] == 0
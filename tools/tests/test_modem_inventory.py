@@ -0,0 +1,160 @@
+"""Inventaire des modems en cache (modem_inventory)"""
+
+import time
+import threading
+
+import pytest
+
+import modem_inventory
+from mm_backend import ModemNotFoundError, ModemStateError
+from mm_simulator.backend import SimulatorBackend
+from modem_inventory import ModemInventory, device_keys
+
+class CountingBackend(SimulatorBackend):
+    """Backend du simulateur qui compte les découvertes et peut les retenir"""
+    
+    def __init__(self, simulator):
+        super().__init__(simulator)
+        self.listings = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.listing = threading.Event()
+    
+    def list_modems(self):
+        self.listings += 1
+        self.listing.set()
+        self.release.wait(5)
+        return super().list_modems()
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(modem_inventory.time, 'monotonic', clock)
+    return clock
+
+@pytest.fixture
+def backend(simulator):
+    return CountingBackend(simulator)
+
+@pytest.fixture
+def inventory(backend):
+    inventory = ModemInventory(backend, ttl=60, miss_refresh_interval=5)
+    yield inventory
+    inventory.close()
+
+def test_inventory_is_reloaded_once_the_ttl_expires(inventory, backend, clock):
+    modems = inventory.modems()
+    assert [modem['id'] for modem in modems] == ['0']
+    assert modems[0]['device_path'] == 'cdc-wdm0' and modems[0]['status'] == 'ready'
+    
+    clock.now += 59
+    inventory.modems()
+    inventory.get('0')
+    assert backend.listings == 1
+    
+    clock.now += 1
+    assert not inventory.is_fresh()
+    inventory.modems()
+    assert backend.listings == 2
+    
+    inventory.modems(force=True)
+    assert backend.listings == 3
+
+def test_invalidate_forces_a_reload_without_blocking_cached_reads(inventory, backend, clock):
+    inventory.modems()
+    inventory.invalidate('modem disparu')
+    assert not inventory.is_fresh()
+    assert inventory.cached() and inventory.peek('0')
+    assert backend.listings == 1
+    
+    inventory.modems()
+    assert backend.listings == 2
+
+def test_find_by_device_accepts_every_path_form(inventory, backend, clock):
+    assert device_keys('/dev/ttyUSB2') == ['/dev/ttyUSB2', 'ttyUSB2']
+    assert device_keys('ttyUSB2') == ['ttyUSB2', '/dev/ttyUSB2']
+    for device_path in ('cdc-wdm0', '/dev/cdc-wdm0', '/dev/cdc-wdm0/'):
+        assert inventory.find_by_device(device_path) == '0'
+    assert backend.listings == 1
+
+def test_unknown_device_reloads_at_most_every_miss_interval(inventory, backend, simulator, clock):
+    assert inventory.find_by_device('cdc-wdm1') is None
+    assert backend.listings == 1
+    
+    # Modem branché depuis le chargement: retrouvé au premier rechargement permis
+    with simulator._locked() as state:
+        state['modems']['1'] = dict(state['modems']['0'], primary_port='cdc-wdm1')
+    clock.now += 4
+    assert inventory.find_by_device('cdc-wdm1') is None
+    assert backend.listings == 1
+    
+    clock.now += 1
+    assert inventory.find_by_device('/dev/cdc-wdm1') == '1'
+    assert backend.listings == 2
+
+def test_concurrent_refreshes_share_one_discovery(inventory, backend):
+    backend.release.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(inventory.refresh())) for _ in range(4)]
+    threads[0].start()
+    assert backend.listing.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Les trois autres appelants attendent le résultat du rechargement en cours
+    deadline = time.monotonic() + 5
+    while len(inventory._refreshed._waiters) < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    
+    # Rechargement en cours: les lectures du cache ne l'attendent pas
+    assert inventory.cached() == []
+    
+    backend.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert backend.listings == 1
+    assert [[modem['id'] for modem in result] for result in results] == [['0']] * 4
+
+@pytest.mark.parametrize('error', [ModemNotFoundError('modem 0 introuvable'),
+                                   ModemStateError('modem 0 pas enregistré')])
+def test_send_failure_on_a_vanished_modem_invalidates_the_inventory(backend, error):
+    from send_sms_mmcli import ModemManager, SMSError
+    
+    def create_sms(modem_id, number, text, timeout=30):
+        raise error
+    
+    backend.create_sms = create_sms
+    manager = ModemManager(backend=backend, cache_ttl=60)
+    try:
+        manager.find_modems()
+        manager.get_capabilities('0')
+        with pytest.raises(SMSError):
+            manager.send_sms('+212612345678', 'Bonjour')
+        assert not manager.inventory.is_fresh()
+        assert manager.capabilities.peek('0') is None
+    finally:
+        manager.inventory.close()
+
+@pytest.mark.parametrize('error', [ModemNotFoundError('modem 0 introuvable'),
+                                   ModemStateError('modem 0 pas enregistré')])
+def test_receive_failure_on_a_vanished_modem_invalidates_the_inventory(tmp_path, backend, sqlite_db, error):
+    from receive_sms_mmcli import SMSReceiver
+    
+    def list_sms(modem_id, timeout=15):
+        raise error
+    
+    backend.list_sms = list_sms
+    receiver = SMSReceiver(sqlite_db, backend, modem_cache_ttl=60, spool_dir=str(tmp_path / 'spool'))
+    try:
+        receiver.find_modems()
+        assert receiver.get_sms_list('0') == []
+        assert not receiver.inventory.is_fresh()
+    finally:
+        receiver.inventory.close()
+        receiver.db.close()
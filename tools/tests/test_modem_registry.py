@@ -0,0 +1,67 @@
+"""Correspondance périphérique -> modems.id (modem_registry)"""
+
+import sqlite3
+import threading
+
+import pytest
+
+@pytest.fixture
+def pool(sqlite_db):
+    from db_pool import ConnectionPool
+    pool = ConnectionPool(sqlite_db)
+    yield pool
+    pool.close()
+
+@pytest.fixture
+def registry(pool):
+    from modem_registry import ModemRegistry
+    return ModemRegistry(pool)
+
+def modems_table(sqlite_db):
+    with sqlite3.connect(sqlite_db['database']) as db:
+        return db.execute("SELECT id, device_path, imei, operator FROM modems ORDER BY id").fetchall()
+
+def test_known_device_is_resolved_from_a_single_load(registry, sqlite_db):
+    (modem_id, device_path, _, _), = modems_table(sqlite_db)
+    
+    assert registry.get_id({'device_path': device_path}) == modem_id
+    assert registry.get_id({'device_path': device_path.rsplit('/', 1)[-1]}) == modem_id
+    assert registry.stats == {'loads': 1, 'registered': 0}
+
+def test_unknown_device_is_registered_by_one_upsert(registry, sqlite_db):
+    modem_id = registry.register({'device_path': 'ttyUSB7', 'imei': '356938035643809', 'operator': None})
+    
+    assert modems_table(sqlite_db)[-1] == (modem_id, '/dev/ttyUSB7', '356938035643809', None)
+    assert registry.get_id({'device_path': '/dev/ttyUSB7'}) == modem_id
+    
+    # Déjà présent: même ID par LAST_INSERT_ID(id), IMEI gardé, opérateur complété
+    assert registry.register({'device_path': '/dev/ttyUSB7', 'imei': None, 'operator': 'Orange'}) == modem_id
+    assert modems_table(sqlite_db)[-1] == (modem_id, '/dev/ttyUSB7', '356938035643809', 'Orange')
+
+def test_lookups_do_not_wait_for_a_slow_load(registry, pool, sqlite_db):
+    (modem_id, device_path, _, _), = modems_table(sqlite_db)
+    registry.load()
+    
+    loading = threading.Event()
+    release = threading.Event()
+    run = pool.run
+    
+    def slow_run(operation, fn):
+        if operation == 'load_modems':
+            loading.set()
+            release.wait(5)
+        return run(operation, fn)
+    
+    pool.run = slow_run
+    registry.invalidate()
+    reloader = threading.Thread(target=registry.get_id, args=({'device_path': device_path},))
+    reloader.start()
+    try:
+        assert loading.wait(5)
+        # Verrou libre pendant la requête: la correspondance précédente reste lisible
+        assert registry._lock.acquire(timeout=1)
+        registry._lock.release()
+        assert registry.snapshot()['devices'] >= 1
+    finally:
+        release.set()
+        reloader.join(5)
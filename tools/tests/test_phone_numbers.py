@@ -0,0 +1,42 @@
+"""Normalisation E.164 des numéros (phone_numbers)"""
+
+import pytest
+
+import phone_numbers
+
+@pytest.mark.parametrize('raw, expected', [
+    ('0612345678', '+212612345678'),
+    ('06 12-34.56.78', '+212612345678'),
+    ('(06) 12/34/56/78', '+212612345678'),
+    ('00212612345678', '+212612345678'),
+    ('+212612345678', '+212612345678'),
+    ('212612345678', '+212612345678'),
+    ('+33612345678', '+33612345678'),
+    ('0033 6 12 34 56 78', '+33612345678'),
+    ('+1 415 555 2671', '+14155552671'),
+])
+def test_normalize(raw, expected):
+    assert phone_numbers.normalize(raw) == expected
+
+def test_default_country_applies_to_national_numbers_only():
+    assert phone_numbers.normalize('0612345678', '33') == '+33612345678'
+    assert phone_numbers.normalize('+212612345678', '33') == '+212612345678'
+
+@pytest.mark.parametrize('raw', [
+    '', None, 'abc', '06123a5678', '+0612345678', '12345',
+    '+2126123456789',   # 10 chiffres nationaux au Maroc
+    '+3361234567',      # 8 chiffres en France
+    '+1234567890123456',
+])
+def test_invalid_numbers(raw):
+    assert phone_numbers.normalize(raw) is None
+    assert not phone_numbers.is_valid(raw)
+
+def test_unknown_country_uses_generic_e164_length():
+    assert phone_numbers.country_code('+8612345678901') is None
+    assert phone_numbers.normalize('+8612345678901') == '+8612345678901'
+
+def test_country_code():
+    assert phone_numbers.country_code('+212612345678') == '212'
+    assert phone_numbers.country_code('+14155552671') == '1'
+    assert phone_numbers.country_code('+33612345678') == '33'
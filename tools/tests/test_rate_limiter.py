@@ -0,0 +1,95 @@
+"""Limitation de débit par modem (rate_limiter)"""
+
+import pytest
+
+import rate_limiter
+from rate_limiter import AdaptiveTokenBucket, SendRateLimiter, TokenBucket, parse_operator_rates
+
+class Clock:
+    """Horloge monotone dont time.sleep() avance sans attendre"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, delay):
+        self.slept.append(delay)
+        self.now += delay
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock)
+    monkeypatch.setattr(rate_limiter.time, 'sleep', clock.sleep)
+    return clock
+
+def test_bucket_sends_a_burst_then_waits_for_its_rate(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    
+    # Réserve remplie au débit, jamais au-delà de la rafale
+    clock.now += 10
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+
+def test_failures_halve_the_rate_down_to_the_floor(clock):
+    bucket = AdaptiveTokenBucket(rate=1.6, burst=1)
+    
+    bucket.record(False)
+    assert bucket.rate == pytest.approx(0.8)
+    bucket.record(True, slow=True)
+    assert bucket.rate == pytest.approx(0.4)
+    
+    for _ in range(10):
+        bucket.record(False)
+    assert bucket.rate == pytest.approx(0.1)   # plancher: rate / 16
+
+def test_successes_raise_the_rate_additively_up_to_the_ceiling(clock):
+    bucket = AdaptiveTokenBucket(rate=1.0, burst=1)
+    bucket.record(False)
+    
+    bucket.record(True)
+    assert bucket.rate == pytest.approx(0.6)
+    for _ in range(3):
+        bucket.record(True)
+    assert bucket.rate == pytest.approx(0.9)
+    
+    for _ in range(5):
+        bucket.record(True)
+    assert bucket.rate == pytest.approx(1.0)   # plafond: débit nominal
+
+def test_modem_errors_slow_down_only_that_modem(clock):
+    limiter = SendRateLimiter(rate=1.0, burst=1, operator_rates={'orange': (0.5, 2)}, slow_threshold=10)
+    limiter.acquire('0')
+    limiter.acquire('1', 'Orange')
+    
+    limiter.record('0', False, 1.0)
+    limiter.record('1', True, 12.0)
+    limiter.record('2', False, 1.0)   # modem sans seau: ignoré
+    
+    assert limiter.snapshot() == {
+        '0': {'rate': 0.5, 'max_rate': 1.0, 'burst': 1.0},
+        '1': {'rate': 0.25, 'max_rate': 0.5, 'burst': 2.0},
+    }
+    
+    # Débit réduit: le jeton suivant du modem 0 arrive en 2s
+    assert limiter.acquire('0') == pytest.approx(2.0)
+
+@pytest.mark.parametrize('rate', [0, -1.0])
+def test_non_positive_rates_are_rejected(rate):
+    with pytest.raises(ValueError):
+        TokenBucket(rate, 1)
+    with pytest.raises(ValueError):
+        SendRateLimiter(rate=rate)
+    with pytest.raises(ValueError):
+        SendRateLimiter(rate=1.0, operator_rates={'orange': (rate, None)})
+    with pytest.raises(ValueError):
+        parse_operator_rates(f"Orange={rate}:2")
+
+def test_operator_rates_are_parsed_case_insensitively():
+    assert parse_operator_rates("Orange=0.5:2, inwi=1,bogus=x") == {'orange': (0.5, 2.0), 'inwi': (1.0, None)}
@@ -0,0 +1,120 @@
+"""Réception: SMS longs restés en réception (receive_sms_mmcli)"""
+
+import json
+import time
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from mm_simulator.backend import SimulatorBackend
+
+@pytest.fixture
+def receiver(tmp_path, simulator, sqlite_db):
+    from receive_sms_mmcli import SMSReceiver
+    
+    receiver = SMSReceiver(sqlite_db, SimulatorBackend(simulator), workers=1,
+                           spool_dir=str(tmp_path / 'spool'), incomplete_timeout=60)
+    yield receiver
+    receiver.inventory.close()
+    receiver.db.close()
+
+def deliver_receiving(simulator, modem_id, number, text):
+    """SMS long dont ModemManager attend encore une partie (état receiving)"""
+    sms_id = simulator.deliver(modem_id, number, text)
+    with simulator._locked() as state:
+        state['sms'][sms_id]['state'] = 'receiving'
+    return sms_id
+
+def stored_rows(sqlite_db):
+    with sqlite3.connect(sqlite_db['database']) as db:
+        return db.execute("SELECT sender, message, is_incomplete FROM received_sms ORDER BY id").fetchall()
+
+def test_receiving_sms_is_left_on_the_modem_until_the_timeout(receiver, simulator, sqlite_db, monkeypatch):
+    import receive_sms_mmcli
+    
+    now = [1000.0]
+    monkeypatch.setattr(receive_sms_mmcli.time, 'monotonic', lambda: now[0])
+    sms_id = deliver_receiving(simulator, '0', '+212612345678', 'Première partie du message')
+    simulator.deliver('0', '+212612345679', 'Complet')
+    
+    assert receiver.run_receive_cycle()['processed'] == 1
+    assert simulator.list_sms('0') == [sms_id]
+    
+    now[0] += 59
+    assert receiver.run_receive_cycle()['processed'] == 0
+    assert simulator.list_sms('0') == [sms_id]
+    
+    now[0] += 1
+    assert receiver.run_receive_cycle()['processed'] == 1
+    assert simulator.list_sms('0') == []
+    assert stored_rows(sqlite_db) == [('+212612345679', 'Complet', 0),
+                                      ('+212612345678', 'Première partie du message', 1)]
+    assert receiver._receiving == {}
+
+def test_completed_sms_is_stored_whole_and_no_longer_tracked(receiver, simulator, sqlite_db):
+    sms_id = deliver_receiving(simulator, '0', '+212612345678', 'Début')
+    assert receiver.run_receive_cycle()['processed'] == 0
+    assert receiver._receiving
+    
+    with simulator._locked() as state:
+        state['sms'][sms_id].update(state='received', text='Début et fin')
+    assert receiver.run_receive_cycle()['processed'] == 1
+    assert stored_rows(sqlite_db) == [('+212612345678', 'Début et fin', 0)]
+    assert receiver._receiving == {}
+
+def test_sms_gone_from_the_modem_is_no_longer_tracked(receiver, simulator):
+    sms_id = deliver_receiving(simulator, '0', '+212612345678', 'Début')
+    receiver.run_receive_cycle()
+    assert ('0', sms_id) in receiver._receiving
+    
+    simulator.delete_sms('0', sms_id)
+    simulator.deliver('0', '+212612345679', 'Autre')
+    receiver.run_receive_cycle()
+    assert receiver._receiving == {}
+
+@pytest.fixture
+def database(tmp_path, sqlite_db):
+    from receive_sms_mmcli import DatabaseManager
+    
+    database = DatabaseManager(sqlite_db, batch_delay=0.01, spool_dir=str(tmp_path / 'spool'))
+    assert database.open_spool()
+    yield database
+    database.close()
+
+def test_replay_sets_corrupt_spool_records_aside(database, sqlite_db):
+    spool = database.spool
+    spool.append({'sender': '+212612345678', 'message': 'Avant', 'received_at': '2024-03-01T10:15:00', 'modem_id': 1})
+    spool.append({'sender': '+212612345679', 'received_at': '2024-03-01T10:16:00', 'modem_id': 1})
+    spool.append({'sender': '+212612345680', 'message': 'Date', 'received_at': 'hier', 'modem_id': 1})
+    spool.append(['ancien', 'format'])
+    spool.append({'sender': '+212612345681', 'message': 'Après', 'received_at': '2024-03-01T10:17:00', 'modem_id': 1})
+    
+    assert database.flush() == 2
+    assert spool.pending() == 0
+    assert database.stats['rejected'] == 3
+    assert stored_rows(sqlite_db) == [('+212612345678', 'Avant', 0), ('+212612345681', 'Après', 0)]
+    with open(f'{spool.directory}/rejected.log', encoding='utf-8') as f:
+        rejected = [json.loads(line) for line in f]
+    assert [record.get('sender') for record in rejected] == ['+212612345679', '+212612345680', None]
+    assert rejected[2]['record'] == ['ancien', 'format']
+
+def test_flush_loop_survives_an_unexpected_error(database, sqlite_db, monkeypatch):
+    flush = database.flush
+    calls = []
+    
+    def failing_flush(wait=True):
+        calls.append(wait)
+        if len(calls) == 1:
+            raise RuntimeError('panne inattendue')
+        return flush(wait)
+    
+    monkeypatch.setattr(database, 'flush', failing_flush)
+    database.store_received_sms('+212612345678', 'Bonjour', datetime(2024, 3, 1, 10, 15), 1)
+    database.start()
+    
+    deadline = time.monotonic() + 5
+    while database.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) >= 2
+    assert stored_rows(sqlite_db) == [('+212612345678', 'Bonjour', 0)]
@@ -0,0 +1,92 @@
+"""Démon d'envoi résident (SMSSendServer) sur un socket Unix, avec le simulateur"""
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+from mm_simulator.backend import SimulatorBackend
+
+@pytest.fixture
+def server(simulator):
+    from send_sms_mmcli import SMSSender, SMSSendServer
+    simulator.config.update({'failure_rate': 0.0, 'timeout_rate': 0.0})
+    
+    # Chemin court: un socket Unix est limité à ~100 caractères
+    socket_dir = tempfile.mkdtemp(prefix='sms-')
+    server = SMSSendServer(os.path.join(socket_dir, 'send.sock'), SMSSender(backend=SimulatorBackend(simulator)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.sender.close()
+    thread.join(5)
+    shutil.rmtree(socket_dir)
+
+def connect(server):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(5)
+    client.connect(server.socket_path)
+    return client
+
+def request(client, *payloads):
+    """Envoie des requêtes sur une connexion et lit une réponse JSON par requête"""
+    client.sendall(b''.join((payload if isinstance(payload, bytes) else json.dumps(payload).encode()) + b'\n'
+                            for payload in payloads))
+    reader = client.makefile('rb')
+    return [json.loads(reader.readline()) for _ in payloads]
+
+def test_requests_and_responses_are_json_lines_on_one_connection(server, simulator):
+    with connect(server) as client:
+        ping, modems, sent, invalid, unknown = request(
+            client,
+            {'action': 'ping'},
+            {'action': 'list_modems', 'refresh': True},
+            {'recipient': '+33612345678', 'message': 'Bonjour', 'id': 7},
+            b'[1, 2]',
+            {'action': 'reboot'}
+        )
+    
+    assert ping['success'] and ping['pid'] == os.getpid() and 'health' in ping
+    assert [modem['id'] for modem in modems['modems']] == ['0']
+    
+    assert sent['success'] and sent['modem_id'] == '0' and sent['recipient'] == '+33612345678'
+    assert set(sent['timings']) == {'discovery', 'selection', 'queue', 'create', 'send'}
+    assert simulator.snapshot()['stats']['sent'] == 1
+    
+    assert invalid['error_type'] == 'BAD_REQUEST' and not invalid['success']
+    assert unknown['error_type'] == 'BAD_REQUEST' and 'reboot' in unknown['error']
+
+def test_send_errors_are_answered_not_raised(server):
+    with connect(server) as client:
+        invalid_number, missing = request(
+            client,
+            {'recipient': 'abc', 'message': 'Bonjour'},
+            {'recipient': '+33612345678'}
+        )
+    
+    # Erreur de la requête: modem_error faux, le job n'est pas compté contre le modem
+    assert invalid_number == {'success': False, 'error': 'Numéro de téléphone invalide: abc',
+                              'error_type': 'SMS_ERROR', 'modem_error': False}
+    assert missing['error_type'] == 'SMS_ERROR' and not missing['modem_error']
+
+def test_send_completes_when_the_client_gives_up_before_the_response(server, simulator):
+    """Contrat delivery_unknown: une requête transmise peut avoir abouti sans réponse reçue"""
+    with connect(server) as client:
+        client.sendall(json.dumps({'recipient': '+33612345678', 'message': 'Bonjour'}).encode() + b'\n')
+    
+    deadline = time.monotonic() + 5
+    while simulator.snapshot()['stats']['sent'] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert simulator.snapshot()['stats']['sent'] == 1
+    
+    # Le démon survit à la connexion coupée et sert le client suivant
+    with connect(server) as client:
+        ping, = request(client, {'action': 'ping'})
+    assert ping['success']
@@ -0,0 +1,91 @@
+"""Répartiteur multi-modems (send_dispatcher) et mode lot parallèle, sur le simulateur"""
+
+import io
+import json
+import threading
+
+import pytest
+
+from mm_simulator.backend import SimulatorBackend
+from send_dispatcher import ModemDispatcher
+
+MODEMS = [{'id': '0', 'device_path': 'cdc-wdm0'}, {'id': '1', 'device_path': 'cdc-wdm1'}]
+
+class Recorder:
+    """send_fn qui note la voie de chaque job, callback qui collecte les résultats"""
+    
+    def __init__(self):
+        self.sent_on = {}
+        self.results = {}
+        self.lock = threading.Lock()
+    
+    def send(self, job, modem_id):
+        with self.lock:
+            self.sent_on[job['id']] = modem_id
+        return {'success': True, 'modem_id': modem_id}
+    
+    def callback(self, job, result):
+        with self.lock:
+            self.results[job['id']] = result
+
+def test_device_jobs_stay_on_their_lane_and_shared_jobs_are_all_sent():
+    recorder = Recorder()
+    dispatcher = ModemDispatcher(recorder.send, MODEMS).start()
+    
+    for job_id in range(40):
+        dispatcher.submit({'id': job_id}, recorder.callback)
+    for job_id in range(40, 50):
+        dispatcher.submit({'id': job_id, 'device': '/dev/cdc-wdm1'}, recorder.callback)
+    dispatcher.submit({'id': 'lost', 'device': 'ttyUSB9'}, recorder.callback)
+    dispatcher.close()
+    
+    assert len(recorder.results) == 51
+    assert all(recorder.sent_on[job_id] == '1' for job_id in range(40, 50))
+    assert recorder.results['lost']['modem_error'] and 'lost' not in recorder.sent_on
+    assert {lane['modem_id']: lane['sent'] for lane in dispatcher.stats()}['1'] >= 10
+    assert sum(lane['sent'] for lane in dispatcher.stats()) == 50
+
+def test_open_breaker_leaves_the_shared_queue_to_the_other_lanes():
+    recorder = Recorder()
+    dispatcher = ModemDispatcher(recorder.send, MODEMS, available_fn=lambda modem_id: modem_id != '1').start()
+    
+    for job_id in range(20):
+        dispatcher.submit({'id': job_id}, recorder.callback)
+    # Job imposé: servi sur son modem même écarté (l'envoi échoue alors aussitôt)
+    dispatcher.submit({'id': 'pinned', 'device': 'cdc-wdm1'}, recorder.callback)
+    dispatcher.close()
+    
+    assert all(recorder.sent_on[job_id] == '0' for job_id in range(20))
+    assert recorder.sent_on['pinned'] == '1'
+
+def test_last_available_lane_still_drains_the_shared_queue():
+    recorder = Recorder()
+    dispatcher = ModemDispatcher(recorder.send, MODEMS, available_fn=lambda modem_id: False).start()
+    
+    for job_id in range(10):
+        dispatcher.submit({'id': job_id}, recorder.callback)
+    dispatcher.close()
+    
+    assert len(recorder.results) == 10
+
+def test_parallel_batch_sends_on_every_modem(simulator):
+    from send_sms_mmcli import SMSSender, run_batch
+    simulator.config.update({'modems': 2, 'failure_rate': 0.0, 'timeout_rate': 0.0})
+    simulator.reset()
+    
+    sender = SMSSender(backend=SimulatorBackend(simulator))
+    jobs = [json.dumps({'id': index, 'recipient': '+33612345678', 'message': f'SMS {index}'})
+            for index in range(12)]
+    jobs.append(json.dumps({'id': 'pinned', 'recipient': '+33612345678', 'message': 'Modem 1',
+                            'device': 'cdc-wdm1'}))
+    output = io.StringIO()
+    try:
+        stats = run_batch(sender, io.StringIO('\n'.join(jobs)), output, parallel=True)
+    finally:
+        sender.close()
+    
+    results = {result['id']: result for result in map(json.loads, output.getvalue().splitlines())}
+    assert stats['total'] == stats['sent'] == 13 and stats['failed'] == 0
+    assert results['pinned']['modem_id'] == '1'
+    assert sorted(lane['modem_id'] for lane in stats['lanes']) == ['0', '1']
+    assert simulator.snapshot()['stats']['sent'] == 13
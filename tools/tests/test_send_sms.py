@@ -0,0 +1,77 @@
+"""Envoi de SMS sur le simulateur (send_sms_mmcli)"""
+
+import pytest
+
+from mm_backend import ModemBackendError, ModemBackendTimeout
+from mm_simulator.backend import SimulatorBackend
+
+class ProbeCountingBackend(SimulatorBackend):
+    """Backend du simulateur qui compte les lectures de capacités"""
+    
+    def __init__(self, simulator):
+        super().__init__(simulator)
+        self.probes = 0
+    
+    def get_messaging_capabilities(self, modem_id):
+        self.probes += 1
+        return super().get_messaging_capabilities(modem_id)
+
+@pytest.fixture
+def backend(simulator):
+    return ProbeCountingBackend(simulator)
+
+@pytest.fixture
+def sender(backend):
+    from send_sms_mmcli import SMSSender
+    sender = SMSSender(backend=backend)
+    yield sender
+    sender.close()
+
+def test_one_shot_send_is_create_then_send_only(sender, backend):
+    result = sender.send('+33612345678', 'Bonjour')
+    
+    assert result['success']
+    assert backend.probes == 0
+    assert list(result['timings']) == ['discovery', 'selection', 'queue', 'create', 'send']
+
+def test_resident_sender_reads_capabilities_on_inventory_refresh(sender, backend):
+    manager = sender.modem_manager
+    manager.watch_capabilities()
+    
+    sender.send('+33612345678', 'Bonjour')
+    sender.send('+33612345678', 'Encore')
+    assert backend.probes == 1
+    assert manager.capabilities.peek('0')['messaging_ready']
+    
+    # Même état au rechargement suivant: pas de nouvelle lecture
+    manager.find_modems(force=True)
+    assert backend.probes == 1
+
+class FailingBackend(ProbeCountingBackend):
+    """Backend du simulateur dont la création de SMS lève l'erreur donnée"""
+    
+    def __init__(self, simulator, error):
+        super().__init__(simulator)
+        self.error = error
+    
+    def create_sms(self, modem_id, number, text, timeout=30):
+        raise self.error
+
+@pytest.mark.parametrize('error, counted', [
+    (ModemBackendError("modem injoignable"), True),
+    (ModemBackendTimeout("create"), True),
+    (RuntimeError("bogue"), False),
+])
+def test_only_modem_failures_count_against_the_modem(simulator, error, counted):
+    from send_sms_mmcli import SMSError, SMSSender
+    sender = SMSSender(backend=FailingBackend(simulator, error))
+    try:
+        with pytest.raises(SMSError):
+            sender.send('+33612345678', 'Bonjour')
+        
+        state = sender.modem_manager.health.snapshot()['0']
+        assert state['in_flight'] == 0
+        assert state['samples'] == (1 if counted else 0)
+        assert state['consecutive_failures'] == (1 if counted else 0)
+    finally:
+        sender.close()
@@ -0,0 +1,58 @@
+"""Encodage GSM-7 / UCS-2 et découpage en segments (sms_encoding)"""
+
+import sms_encoding
+from sms_encoding import GSM7, UCS2
+
+def test_gsm7_single_segment_limit():
+    assert sms_encoding.analyze('a' * 160)['parts'] == 1
+    result = sms_encoding.analyze('a' * 161)
+    assert result['encoding'] == GSM7
+    assert result['parts'] == 2
+    assert result['per_part'] == 153
+    assert result['remaining'] == 2 * 153 - 161
+
+def test_gsm7_extension_characters_count_two_septets():
+    assert sms_encoding.septet_count('€[]') == 6
+    # 80 caractères mais 160 septets: tient encore dans un SMS
+    assert sms_encoding.analyze('€' * 80)['parts'] == 1
+    assert sms_encoding.analyze('€' * 81)['parts'] == 2
+
+def test_unicode_switches_to_ucs2():
+    assert sms_encoding.is_gsm7('Bonjour à tous, ça va ?') is False
+    assert sms_encoding.is_gsm7('Bonjour à tous')
+    result = sms_encoding.analyze('مرحبا' * 14)
+    assert result['encoding'] == UCS2 and result['is_unicode']
+    assert result['units'] == 70 and result['parts'] == 1
+    assert sms_encoding.count_parts('ش' * 71) == 2
+    assert sms_encoding.count_parts('ش' * 134) == 2
+    assert sms_encoding.count_parts('ش' * 135) == 3
+
+def test_characters_outside_bmp_use_two_units():
+    assert sms_encoding.ucs2_units('😀') == 2
+    assert sms_encoding.analyze('😀' * 35)['parts'] == 1
+    assert sms_encoding.analyze('😀' * 36)['parts'] == 2
+
+def test_split_never_cuts_a_two_unit_character():
+    # 66 unités puis un emoji: le segment de 67 unités ne peut pas le contenir
+    text = 'ش' * 66 + '😀' + 'ش' * 10
+    segments = sms_encoding.split_segments(text)
+    assert segments == ['ش' * 66, '😀' + 'ش' * 10]
+    assert sms_encoding.count_parts(text) == len(segments)
+    
+    text = 'a' * 152 + '€' + 'a' * 10
+    assert sms_encoding.split_segments(text) == ['a' * 152, '€' + 'a' * 10]
+
+def test_split_segments_rebuilds_the_message():
+    text = ''.join(chr(ord('a') + i % 26) for i in range(500))
+    segments = sms_encoding.split_segments(text)
+    assert ''.join(segments) == text
+    assert [len(segment) for segment in segments] == [153, 153, 153, 41]
+    assert sms_encoding.split_segments('court') == ['court']
+
+def test_summarize_batch_flags_messages_over_the_limit():
+    summary = sms_encoding.summarize_batch(['ok', 'é' * 10, 'ش' * 200, 'a' * 161], max_segments=2)
+    assert summary['messages'] == 4
+    assert summary['parts'] == 1 + 1 + 3 + 2
+    assert summary['unicode'] == 1
+    assert summary['too_long'] == [2]
+    assert summary['max_segments'] == 2
@@ -0,0 +1,92 @@
+"""Suppression en arrière-plan des SMS envoyés (sms_reaper), sur le simulateur"""
+
+import threading
+
+import pytest
+
+from mm_simulator.backend import SimulatorBackend
+from sms_reaper import SMSReaper
+
+class Locks(dict):
+    def __missing__(self, modem_id):
+        lock = self[modem_id] = threading.Lock()
+        return lock
+
+@pytest.fixture
+def locks():
+    return Locks()
+
+@pytest.fixture
+def reaper(simulator, locks):
+    return SMSReaper(SimulatorBackend(simulator), locks.__getitem__, batch_size=2, sweep_interval=0)
+
+def outbound(simulator, state='sent'):
+    sms_id = simulator.create_sms('0', '+33612345678', 'Bonjour')
+    with simulator._locked() as world:
+        world['sms'][sms_id]['state'] = state
+    return sms_id
+
+def test_sent_sms_are_deleted_in_batches(reaper, simulator):
+    sms_ids = [outbound(simulator) for _ in range(5)]
+    for sms_id in sms_ids:
+        reaper.schedule('0', sms_id)
+    
+    assert reaper._reap_batch('0')
+    assert simulator.list_sms('0') == sms_ids[2:]
+    assert reaper._reap_batch('0')
+    assert not reaper._reap_batch('0')
+    
+    assert simulator.list_sms('0') == []
+    assert reaper.pending() == 0
+    assert reaper.stats == {'deleted': 5, 'failed': 0, 'swept': 0}
+    assert reaper.delete_ms('0') is not None
+
+def test_busy_modem_is_left_alone_until_idle(simulator, locks):
+    busy = True
+    reaper = SMSReaper(SimulatorBackend(simulator), locks.__getitem__, is_busy=lambda modem_id: busy,
+                       batch_size=2, sweep_interval=0)
+    reaper.schedule('0', outbound(simulator))
+    
+    reaper._reap_when_idle('0')
+    assert reaper.pending() == 1
+    
+    # Verrou d'envoi tenu: pas de suppression au milieu d'un envoi
+    busy = False
+    with locks['0']:
+        reaper._reap_when_idle('0')
+    assert reaper.pending() == 1
+    
+    reaper._reap_when_idle('0')
+    assert reaper.pending() == 0 and simulator.list_sms('0') == []
+
+def test_failed_delete_is_retried_then_left_to_the_sweep(reaper):
+    reaper.schedule('0', '999')
+    
+    while reaper._reap_batch('0'):
+        pass
+    assert reaper.pending() == 0
+    assert reaper.stats['failed'] == 1
+
+def test_sweep_deletes_outbound_orphans_only(reaper, simulator):
+    sent = outbound(simulator, 'sent')
+    draft = outbound(simulator, 'unknown')
+    queued = outbound(simulator, 'sent')
+    received = simulator.deliver('0', '+33698765432', 'Réponse')
+    reaper.schedule('0', queued)
+    
+    reaper.sweep()
+    assert sorted(simulator.list_sms('0')) == sorted([draft, queued, received])
+    
+    # Brouillon encore là au balayage suivant: abandonné, supprimé
+    reaper.sweep()
+    assert sorted(simulator.list_sms('0')) == sorted([queued, received])
+    assert reaper.stats['swept'] == 2
+
+def test_stop_leaves_nothing_queued(reaper, simulator):
+    reaper.start()
+    for _ in range(3):
+        reaper.schedule('0', outbound(simulator))
+    reaper.stop(flush_timeout=5)
+    
+    assert reaper.pending() == 0 and simulator.list_sms('0') == []
+    assert reaper.stats['deleted'] == 3
@@ -0,0 +1,106 @@
+"""Journal local des SMS reçus: ajout, rejeu et réparation (sms_spool)"""
+
+import os
+import json
+
+import pytest
+
+from sms_spool import Spool, SpoolError
+
+def record(index):
+    return {'sender': '+212612345678', 'message': f'SMS {index} é', 'modem_id': 1}
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('spool-'))
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = Spool(str(tmp_path)).open()
+    yield spool
+    spool.close()
+
+def test_append_then_read_and_commit(spool):
+    for index in range(5):
+        spool.append(record(index))
+    assert spool.pending() == 5
+    
+    records, position, lines = spool.read(3)
+    assert records == [record(0), record(1), record(2)]
+    assert lines == 3
+    # Lu mais pas encore écrit en base: toujours à rejouer
+    assert spool.read(3)[0] == records
+    
+    spool.commit(position, lines)
+    assert spool.pending() == 2
+    records, position, lines = spool.read(10)
+    assert records == [record(3), record(4)]
+    spool.commit(position, lines)
+    assert spool.pending() == 0
+    assert spool.read(10) == ([], position, 0)
+
+def test_uncommitted_records_are_replayed_after_restart(tmp_path):
+    spool = Spool(str(tmp_path)).open()
+    for index in range(4):
+        spool.append(record(index))
+    records, position, lines = spool.read(1)
+    spool.commit(position, lines)
+    spool.close()
+    
+    spool = Spool(str(tmp_path)).open()
+    try:
+        assert spool.pending() == 3
+        assert spool.read(10)[0] == [record(1), record(2), record(3)]
+    finally:
+        spool.close()
+
+def test_torn_last_record_is_truncated_on_open(tmp_path):
+    spool = Spool(str(tmp_path)).open()
+    spool.append(record(0))
+    spool.append(record(1))
+    spool.close()
+    
+    path = os.path.join(str(tmp_path), segment_files(str(tmp_path))[-1])
+    with open(path, 'ab') as f:
+        f.write(b'{"sender":"+2126')
+    
+    spool = Spool(str(tmp_path)).open()
+    try:
+        assert spool.pending() == 2
+        spool.append(record(2))
+        assert spool.read(10)[0] == [record(0), record(1), record(2)]
+    finally:
+        spool.close()
+
+def test_unreadable_line_is_skipped_but_consumed(spool):
+    spool.append(record(0))
+    with open(os.path.join(spool.directory, segment_files(spool.directory)[-1]), 'ab') as f:
+        f.write(b'not json\n')
+    spool.append(record(1))
+    
+    records, position, lines = spool.read(10)
+    assert records == [record(0), record(1)]
+    assert lines == 3
+
+def test_segments_rotate_and_are_removed_once_replayed(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=200).open()
+    try:
+        for index in range(10):
+            spool.append(record(index))
+        assert len(segment_files(str(tmp_path))) > 1
+        
+        records, position, lines = spool.read(100)
+        assert records == [record(index) for index in range(10)]
+        spool.commit(position, lines)
+        assert len(segment_files(str(tmp_path))) == 1
+        assert spool.pending() == 0
+    finally:
+        spool.close()
+
+def test_directory_is_locked_by_one_process(spool):
+    with pytest.raises(SpoolError):
+        Spool(spool.directory).open()
+
+def test_reject_keeps_the_record_with_its_error(spool):
+    spool.reject(record(0), 'Data too long for column')
+    with open(os.path.join(spool.directory, 'rejected.log'), encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [dict(record(0), error='Data too long for column')]
@@ -0,0 +1,89 @@
+"""Détection des SMS entrants (sms_watcher), sur le simulateur"""
+
+import pytest
+
+import sms_watcher
+from mm_simulator.backend import SimulatorBackend
+from sms_watcher import SMSWatcher, MAX_RETRIES
+
+class SignalingBackend(SimulatorBackend):
+    """Backend du simulateur qui signale les SMS reçus comme Messaging.Added"""
+    
+    def __init__(self, simulator):
+        super().__init__(simulator)
+        self.callback = None
+        self.stopped = False
+    
+    def watch_sms(self, callback):
+        self.callback = callback
+        return True
+    
+    def stop_watch(self):
+        self.stopped = True
+    
+    def deliver(self, modem_id, number, text):
+        sms_id = self.simulator.deliver(modem_id, number, text)
+        self.callback(modem_id, sms_id)
+        return sms_id
+
+def test_added_signal_queues_the_sms_without_polling(simulator):
+    backend = SignalingBackend(simulator)
+    watcher = SMSWatcher(backend, lambda: pytest.fail("pas d'interrogation avec les signaux")).start()
+    try:
+        assert watcher.mode == 'signal'
+        sms_id = backend.deliver('0', '+33612345678', 'Bonjour')
+        assert watcher.get(timeout=1) == ('0', sms_id)
+        assert watcher.get(timeout=0) is None
+    finally:
+        watcher.stop()
+    assert backend.stopped
+
+def test_poll_fallback_signals_only_new_sms(simulator):
+    stored = simulator.deliver('0', '+33612345678', 'Déjà là')
+    watcher = SMSWatcher(SimulatorBackend(simulator), lambda: ['0'], poll_interval=0.01)
+    
+    # Premier passage: les SMS déjà stockés sont laissés au balayage complet
+    watcher.poll()
+    watcher.start()
+    try:
+        assert watcher.mode == 'poll'
+        sms_id = simulator.deliver('0', '+33612345678', 'Nouveau')
+        assert watcher.get(timeout=2) == ('0', sms_id)
+        assert watcher.get(timeout=0.1) is None
+        assert stored != sms_id
+    finally:
+        watcher.stop()
+
+def test_poll_forgets_modems_that_are_gone(simulator):
+    modems = ['0']
+    watcher = SMSWatcher(SimulatorBackend(simulator), lambda: modems)
+    watcher.poll()
+    
+    modems.clear()
+    watcher.poll()
+    assert watcher._seen == {}
+    
+    # Modem revenu (rebranché): nouveau premier passage, ses SMS reviennent au balayage
+    simulator.deliver('0', '+33612345678', 'Pendant l\'absence')
+    modems.append('0')
+    watcher.poll()
+    assert watcher.get(timeout=0) is None
+
+def test_sms_still_receiving_is_signalled_again_then_left_to_the_sweep(simulator, monkeypatch):
+    monkeypatch.setattr(sms_watcher, 'RETRY_DELAY', 0.0)
+    watcher = SMSWatcher(SimulatorBackend(simulator), lambda: ['0'])
+    
+    for _ in range(MAX_RETRIES):
+        watcher.retry('0', '7')
+        assert watcher.get(timeout=1) == ('0', '7')
+    
+    assert MAX_RETRIES == 12
+    watcher.retry('0', '7')
+    assert watcher.get(timeout=0.1) is None
+    assert watcher._retries == {}
+    
+    # Réception terminée: le compteur repart de zéro pour ce SMS
+    watcher.retry('0', '8')
+    watcher.get(timeout=1)
+    watcher.done('0', '8')
+    assert watcher._retries == {}